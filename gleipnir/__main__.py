@@ -0,0 +1,49 @@
+"""Command line interface of Gleipnir.
+
+Usage:
+    python -m gleipnir run config.yaml [config2.json ...]
+
+Runs the PySB model calibration jobs described by the configuration files;
+see gleipnir.pysb_utilities.job_runner for the configuration settings.
+Re-running a configuration skips its complete jobs and resumes interrupted
+ones.
+
+"""
+
+import argparse
+import os.path
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m gleipnir',
+                                     description='Gleipnir command line tools.')
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help='Run the Nested Sampling '
+                                       'jobs of configuration files.')
+    run_parser.add_argument('config_files', nargs='+', metavar='config',
+                            help='JSON or YAML job configuration files.')
+    run_parser.add_argument('--n-workers', type=int, default=None,
+                            help='Override the n_workers setting.')
+    run_parser.add_argument('--quiet', action='store_true',
+                            help="Don't print the job progress.")
+    args = parser.parse_args(argv)
+    if args.command != 'run':
+        parser.print_help()
+        return 1
+    from gleipnir.pysb_utilities.job_runner import load_config, run_jobs
+    failed = False
+    for config_file in args.config_files:
+        config = load_config(config_file)
+        if args.n_workers is not None:
+            config['n_workers'] = args.n_workers
+        base_dir = os.path.dirname(os.path.abspath(config_file))
+        records = run_jobs(config, base_dir=base_dir, verbose=not args.quiet)
+        print(records[['model_name', 'status', 'log_evidence',
+                       'log_evidence_error', 'aic', 'bic']].to_string(index=False))
+        failed = failed or (records['status'] != 'complete').any()
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
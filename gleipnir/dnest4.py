@@ -20,6 +20,7 @@ import numpy as np
 import pandas as pd
 import warnings
 from .nsbase import NestedSamplingBase
+from .nsresult import NSResult
 try:
     import dnest4
 except ImportError as err:
@@ -130,18 +131,13 @@ class DNest4NestedSampling(NestedSamplingBase):
         self._log_evidence = None
         self._information = None
         self._output = None
-        self._post_eval = False
+        self._result = None
         #if self.population_size is None:
         #    self.population_size = 25*self._n_dims
         # Change the default value of num_steps so that DNest4 will
         # terminate.
         if 'num_steps' not in list(self.dnest4_kwargs.keys()):
             self.dnest4_kwargs['num_steps'] = 1000
-        # Make the from_prior function for DNest4
-        def from_prior():
-            return np.array([sampled_parameter.rvs(1)[0] for sampled_parameter in self.sampled_parameters])
-
-        self._from_prior = from_prior
         # Get the estimates of the prior distributions' widths and centers.
         widths = []
         centers = []
@@ -161,6 +157,10 @@ class DNest4NestedSampling(NestedSamplingBase):
 
         return
 
+    def _from_prior(self):
+        """The from_prior function for DNest4."""
+        return np.array([sampled_parameter.rvs(1)[0] for sampled_parameter in self.sampled_parameters])
+
 
     def run(self, verbose=False):
         """Initiate the DNest4 Nested Sampling run."""
@@ -176,12 +176,14 @@ class DNest4NestedSampling(NestedSamplingBase):
         output = sampler.sample(self.n_diffusive_levels,
                                 num_particles=self.population_size,
                                 **self.dnest4_kwargs)
-        self._output = output
         for i, sample in enumerate(output):
             if verbose and ((i + 1) % 100 == 0):
                 stats = sampler.postprocess()
                 print("Iteration: {0} log(Z): {1}".format(i+1,stats['log_Z']))
         stats = sampler.postprocess(resample=1)
+        # Keep the postprocessed output rather than the sample generator,
+        # which can't be pickled.
+        self._output = stats
         self._log_evidence = stats['log_Z']
         self._information = stats['H']
         logZ_err = np.sqrt(self._information/self.population_size)
@@ -203,6 +205,7 @@ class DNest4NestedSampling(NestedSamplingBase):
         self._last_live_sample = sampler.backend.samples[-1]
         self._last_live_sample_weights = sampler.backend.weights[-1]
         self._last_live_sample_info = pd.DataFrame(sampler.backend.sample_info[-1])
+        self._result = None
         return self.log_evidence, self.log_evidence_error
 
     @property
@@ -260,73 +263,19 @@ class DNest4NestedSampling(NestedSamplingBase):
         self._file_root = value
         return
 
-    def posteriors(self, nbins=None):
-        """Estimates of the posterior marginal probability distributions of each parameter.
-        Returns:
-            dict of tuple of (numpy.ndarray, numpy.ndarray, numpy.ndarray): The
-                histogram estimates of the posterior marginal probability
-                distributions. The returned dict is keyed by the sampled
-                parameter names and each element is a tuple with
-                (marginal_weights, bin_edges, bin_centers).
-        """
-        # Lazy evaluation at first call of the function and store results
-        # so that subsequent calls don't have to recompute.
-        if not self._post_eval:
-            # Here the samples are samples directly from the posterior
-            # (i.e. equal weights)
-            samples = self._samples
-            # Rice bin count selection
-            if nbins is None:
-                nbins = 2 * int(np.cbrt(len(samples)))
-            nd = samples.shape[1]
-            self._posteriors = dict()
-            for ii in range(nd):
-                marginal, edge = np.histogram(samples[:,ii], density=True, bins=nbins)
-                center = (edge[:-1] + edge[1:])/2.
-                self._posteriors[self.sampled_parameters[ii].name] = (marginal, edge, center)
-
-            self._post_eval = True
-
-        return self._posteriors
-
-    def max_loglikelihood(self):
-        mx = self._last_live_sample_info.max()
-        ml = mx['log_likelihood']
-        return ml
-
-
-    def deviance_ic(self):
-        """Estimate Deviance Information Criterion.
-        This function estimates the Deviance Information Criterion (DIC) for the
-        model simulated with Nested Sampling (NS). It does so by using the
-        posterior distribution estimates computed from the NS outputs.
-        The DIC formula is given by:
-            DIC = p_D + D_bar,
-        where p_D = D_bar - D(theta_bar), D_bar is the posterior average of
-        the deviance D(theta)= -2*ln(L(theta)) with L(theta) the likelihood
-        of parameter set theta, and theta_bar is posterior average parameter set.
-
-        Returns:
-            float: The DIC estimate.
-        """
-        params = self._last_live_sample
-        log_likelihoods = self._last_live_sample_info['log_likelihood']
-        weights = self._last_live_sample_weights
-        D_of_theta = -2.*log_likelihoods
-        D_bar = np.average(D_of_theta, weights=weights)
-        print(D_bar)
-        theta_bar = np.average(params, axis=0, weights=weights)
-        print(theta_bar)
-        D_of_theta_bar = -2. * self.loglikelihood(theta_bar)
-        p_D = D_bar - D_of_theta_bar
-        return p_D + D_bar
-
-    def best_fit_likelihood(self):
-        """Parameter vector with the maximum likelihood.
-        Returns:
-            numpy.array: The parameter vector.
-        """
-        # mx = self._last_live_sample_info.max()
-        midx = np.argmax(self._last_live_sample_info['log_likelihood'].values)
-        ml = self._last_live_sample[midx]
-        return ml
+    def _make_result(self):
+        # Equally weighted posterior samples.
+        return NSResult([sp.name for sp in self.sampled_parameters],
+                        self._samples, log_evidence=self._log_evidence,
+                        log_evidence_error=self._logZ_err,
+                        information=self._information)
+
+    def _likelihood_result(self):
+        # The posterior samples don't carry their log-likelihoods, so use
+        # the particles of the last saved state instead.
+        with np.errstate(divide='ignore'):
+            log_weights = np.log(self._last_live_sample_weights)
+        return NSResult([sp.name for sp in self.sampled_parameters],
+                        self._last_live_sample,
+                        log_likelihoods=self._last_live_sample_info['log_likelihood'].to_numpy(),
+                        log_weights=log_weights)
@@ -40,6 +40,7 @@ References:
 import numpy as np
 import warnings
 from .nsbase import NestedSamplingBase
+from .nsresult import NSResult
 
 try:
     import pypolychord
@@ -109,20 +110,9 @@ class dyPolyChordNestedSampling(NestedSamplingBase):
 
         self._nDims = len(sampled_parameters)
         self._nDerived = 0
-        self._post_eval = False
-        self._posteriors = None
+        self._result = None
         #if self.population_size is None:
         #    self.population_size = 25*self._nDims
-        # make the likelihood function for polychord
-        def likelihood(theta):
-            r2 = 0
-            return loglikelihood(theta), [r2]
-        self._likelihood = likelihood
-        # make the prior for polychord
-        def prior(hypercube):
-            return np.array([self.sampled_parameters[i].invcdf(value) for i,value in enumerate(hypercube)])
-
-        self._prior = prior
         # PolyChord settings object
         #self._settings = PolyChordSettings(self._nDims, self._nDerived,
         #                                   nlive=self.population_size)
@@ -143,6 +133,15 @@ class dyPolyChordNestedSampling(NestedSamplingBase):
         #self._dumper = dumper
         return
 
+    def _likelihood(self, theta):
+        """The likelihood function for polychord."""
+        r2 = 0
+        return self.loglikelihood(theta), [r2]
+
+    def _prior(self, hypercube):
+        """The prior for polychord."""
+        return np.array([self.sampled_parameters[i].invcdf(value) for i,value in enumerate(hypercube)])
+
 
     def run(self, verbose=False):
         """Initiate the dyPolyChord Nested Sampling run."""
@@ -162,6 +161,7 @@ class dyPolyChordNestedSampling(NestedSamplingBase):
         run = nestcheck.data_processing.process_polychord_run(self._settings_dict['file_root'],  # = settings['file_root']
                                                               self._settings_dict['base_dir'])    # = settings['base_dir']
         self._run = run
+        self._result = None
         self._logZ = ncheck_e.logz(run)
         self._Z = ncheck_e.evidence(run)
         return self._logZ, None
@@ -224,75 +224,10 @@ class dyPolyChordNestedSampling(NestedSamplingBase):
         self._settings_dict['file_root'] = value
         return
 
-    def posteriors(self, nbins=None):
-        """Estimates of the posterior marginal probability distributions of each parameter.
-        Returns:
-            dict of tuple of (numpy.ndarray, numpy.ndarray, numpy.ndarray): The
-                histogram estimates of the posterior marginal probability
-                distributions. The returned dict is keyed by the sampled
-                parameter names and each element is a tuple with
-                (marginal_weights, bin_edges, bin_centers).
-        """
-        # Lazy evaluation at first call of the function and store results
-        # so that subsequent calls don't have to recompute.
-        if not self._post_eval:
-            # Here the samples are samples directly from the posterior
-            # (i.e. equal weights). - The samples from the PolyChord output
-            # is a pandas DataFrame.
-            #samples = self._run['theta']
-            #log_likelihoods = self._run['logl']
-            parms = self._run['theta']
-            # The log posterior weight
-            logpw = nestcheck.ns_run_utils.get_logw(self._run)
-            # Rice bin count selection
-            if nbins is None:
-                nbins = 2 * int(np.cbrt(len(logpw)))
-            self._posteriors = dict()
-            for ii,parm in enumerate(parms[0]):
-                marginal, edge = np.histogram(parms[:,ii], weights=logpw, density=True, bins=nbins)
-                center = (edge[:-1] + edge[1:])/2.
-                self._posteriors[self.sampled_parameters[ii].name] = (marginal, edge, center)
-            self._post_eval = True
-
-        return self._posteriors
-
-    def max_loglikelihood(self):
-        log_likelihoods = self._run['logl']
-        ml = log_likelihoods.max()
-        return ml
-
-    def deviance_ic(self):
-        """Estimate Deviance Information Criterion.
-        This function estimates the Deviance Information Criterion (DIC) for the
-        model simulated with Nested Sampling (NS). It does so by using the
-        posterior distribution estimates computed from the NS outputs.
-        The DIC formula is given by:
-            DIC = p_D + D_bar,
-        where p_D = D_bar - D(theta_bar), D_bar is the posterior average of
-        the deviance D(theta)= -2*ln(L(theta)) with L(theta) the likelihood
-        of parameter set theta, and theta_bar is posterior average parameter set.
-
-        Returns:
-            float: The DIC estimate.
-        """
-        params = self._run['theta']
-        log_likelihoods = self._run['logl']
-        weights = nestcheck.ns_run_utils.get_logw(self._run)
-        D_of_theta = -2.*log_likelihoods
-        D_bar = np.average(D_of_theta, weights=weights)
-        theta_bar = np.average(params, axis=0, weights=weights)
-        print(theta_bar)
-        D_of_theta_bar = -2. * self.loglikelihood(theta_bar)
-        p_D = D_bar - D_of_theta_bar
-        return p_D + D_bar
-
-
-    def best_fit_likelihood(self):
-        """Parameter vector with the maximum likelihood.
-        Returns:
-            numpy.array: The parameter vector.
-        """
-        samples = self._run['theta']
-        midx = np.argmax(self._run['logl'])
-        ml = samples[midx][:]
-        return ml
+    def _make_result(self):
+        # The samples with their log posterior weights.
+        run = self._run
+        return NSResult([sp.name for sp in self.sampled_parameters],
+                        run['theta'], log_likelihoods=run['logl'],
+                        log_weights=nestcheck.ns_run_utils.get_logw(run),
+                        log_evidence=self._logZ)
@@ -27,9 +27,14 @@ References:
 
 """
 
-import numpy as np
+import os
+import shutil
+import tempfile
 import warnings
+
+import numpy as np
 from .nsbase import NestedSamplingBase
+from .nsresult import NSResult
 
 try:
     import pymultinest
@@ -52,6 +57,14 @@ class MultiNestNestedSampling(NestedSamplingBase):
             assigning a likelihood to parameter vectors during the sampling.
         population_size (int): The number of points to use in the Nested
             Sampling active population.
+        in_memory (bool): Run without keeping any output files. The
+            posterior samples, live points, and evidence estimates are
+            captured in memory through the PyMultiNest dump callback, and
+            any files MultiNest writes go to a temporary directory (on tmpfs
+            if available) that is removed after the run. The evidence
+            estimates are the same (vanilla) ones as for runs with output
+            files, and the Importance Nested Sampling estimate of the log
+            evidence is kept separately as output['INSlogZ']. Default: False
         multinest_kwargs (dict): Additional keyword arguments that should be
             passed to the PyMultiNest MultiNest solver. Available options are:
                 importance_nested_sampling (bool): Should MultiNest use
@@ -113,39 +126,98 @@ class MultiNestNestedSampling(NestedSamplingBase):
     """
 
     def __init__(self, sampled_parameters, loglikelihood, population_size,
-                 **multinest_kwargs):
+                 in_memory=False, **multinest_kwargs):
         """Initialize the MultiNest Nested Sampler."""
         self.sampled_parameters = sampled_parameters
         self.loglikelihood = loglikelihood
         self.population_size = population_size
+        self.in_memory = in_memory
         self.multinest_kwargs = multinest_kwargs
 
         self._nDims = len(sampled_parameters)
         self._nDerived = 0
         self._output = None
-        self._post_eval = False
+        self._result = None
+        self._mode_stats = None
+        self._dump = None
         #if self.population_size is None:
         #    self.population_size = 25*self._nDims
 
-        # Make the prior function for PyMultiNest.
-        def prior(hypercube):
-            return np.array([self.sampled_parameters[i].invcdf(value) for i,value in enumerate(hypercube)])
-
-        self._prior = prior
         # multinest settings
         self._file_root = 'multinest_run_' #string
 
         return
 
+    def _prior(self, hypercube):
+        """The prior function for PyMultiNest."""
+        return np.array([self.sampled_parameters[i].invcdf(value) for i,value in enumerate(hypercube)])
+
+
+    def _cube_prior(self, cube, ndim, nparams):
+        """The in-place prior transform for pymultinest.run."""
+        theta = self._prior(np.array([cube[i] for i in range(ndim)]))
+        for i in range(ndim):
+            cube[i] = theta[i]
+
+    def _cube_loglikelihood(self, cube, ndim, nparams, lnew):
+        """The log-likelihood function for pymultinest.run."""
+        logl = float(self.loglikelihood(np.array([cube[i] for i in range(ndim)])))
+        if not np.isfinite(logl):
+            # Same substitute value as pymultinest.solve.
+            logl = -1e100
+        return logl
+
+    def _dumper(self, n_samples, n_live, n_par, live_points, posterior,
+                param_constraints, max_loglikelihood, log_evidence,
+                ins_log_evidence, log_evidence_error, context):
+        """The dump callback for pymultinest.run."""
+        # The arrays are views of MultiNest's buffers, so copy them.
+        self._dump = {'posterior': np.array(posterior),
+                      'live_points': np.array(live_points),
+                      'max_loglikelihood': max_loglikelihood,
+                      'logZ': log_evidence,
+                      'INSlogZ': ins_log_evidence,
+                      'logZerr': log_evidence_error}
+        return
+
+    def _run_in_memory(self, verbose=False):
+        """Run MultiNest in a temporary directory and capture its output."""
+        run_dir = _temporary_directory()
+        file_root = os.path.join(run_dir, os.path.basename(self._file_root))
+        self._dump = None
+        try:
+            pymultinest.run(self._cube_loglikelihood, self._cube_prior,
+                            self._nDims,
+                            n_live_points=self.population_size,
+                            outputfiles_basename=file_root,
+                            verbose=verbose,
+                            dump_callback=self._dumper,
+                            **self.multinest_kwargs)
+            if (self.multinest_kwargs.get('multimodal', True)
+                    and self.multinest_kwargs.get('write_output', True)):
+                analyzer = Analyzer(self._nDims, file_root, verbose=False)
+                self._mode_stats = analyzer.get_mode_stats()['modes']
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        output = self._dump
+        self._dump = None
+        if output is None:
+            raise RuntimeError("MultiNest didn't call the dump callback.")
+        return output
 
     def run(self, verbose=False):
         """Initiate the MultiNest Nested Sampling run."""
-        output = solve(LogLikelihood=self.loglikelihood, Prior=self._prior,
-                       n_dims = self._nDims,
-                       n_live_points=self.population_size,
-                       outputfiles_basename=self._file_root,
-                       verbose=verbose,
-                       **self.multinest_kwargs)
+        self._result = None
+        self._mode_stats = None
+        if self.in_memory:
+            output = self._run_in_memory(verbose=verbose)
+        else:
+            output = solve(LogLikelihood=self.loglikelihood, Prior=self._prior,
+                           n_dims = self._nDims,
+                           n_live_points=self.population_size,
+                           outputfiles_basename=self._file_root,
+                           verbose=verbose,
+                           **self.multinest_kwargs)
         self._output = output
         return self.log_evidence, self.log_evidence_error
 
@@ -200,78 +272,72 @@ class MultiNestNestedSampling(NestedSamplingBase):
         self._file_root = value
         return
 
-    def posteriors(self, nbins=None):
-        """Estimates of the posterior marginal probability distributions of each parameter.
-        Returns:
-            dict of tuple of (numpy.ndarray, numpy.ndarray, numpy.ndarray): The
-                histogram estimates of the posterior marginal probability
-                distributions. The returned dict is keyed by the sampled
-                parameter names and each element is a tuple with
-                (marginal_weights, bin_edges, bin_centers).
-        """
-        # Lazy evaluation at first call of the function and store results
-        # so that subsequent calls don't have to recompute.
-        #print('nbins', nbins)
-        if not self._post_eval:
-            # Here the samples are samples directly from the posterior
-            # (i.e. equal weights).
-            samples = self._output['samples']
-            # Rice bin count selection
-            if nbins is None:
-                nbins = 2 * int(np.cbrt(len(samples)))
-            # print('nbins', nbins)
-            nd = samples.shape[1]
-            self._posteriors = dict()
-            for ii in range(nd):
-                marginal, edge = np.histogram(samples[:,ii], density=True, bins=nbins)
-                center = (edge[:-1] + edge[1:])/2.
-                self._posteriors[self.sampled_parameters[ii].name] = (marginal, edge, center)
-            self._post_eval = True
-
-        return self._posteriors
-
-    def max_loglikelihood(self):
-        mn_data = Analyzer(len(self.sampled_parameters), self._file_root, verbose=False).get_data()
-        log_ls = -0.5*mn_data[:,1]
-        ml = log_ls.max()
-        return ml
-
-    def deviance_ic(self):
-        """Estimate Deviance Information Criterion.
-        This function estimates the Deviance Information Criterion (DIC) for the
-        model simulated with Nested Sampling (NS). It does so by using the
-        posterior distribution estimates computed from the NS outputs.
-        The DIC formula is given by:
-            DIC = p_D + D_bar,
-        where p_D = D_bar - D(theta_bar), D_bar is the posterior average of
-        the deviance D(theta)= -2*ln(L(theta)) with L(theta) the likelihood
-        of parameter set theta, and theta_bar is posterior average parameter set.
+    def _load_data(self):
+        """Load the weighted posterior samples from the MultiNest output.
+        The text file (columns: weight, -2*ln(L), parameters) is parsed once
+        and converted to a binary .npy file next to it, which this and any
+        later loads (e.g., by other processes) memory-map.
 
         Returns:
-            float: The DIC estimate.
+            numpy.ndarray: The (n, ndim+2) data array.
         """
-        mn_data = Analyzer(len(self.sampled_parameters), self._file_root, verbose=False).get_data()
-        params = mn_data[:,2:]
-        log_likelihoods = -0.5*mn_data[:,1]
-        prior_mass = mn_data[:,0]
-        norm_weights = (prior_mass*np.exp(log_likelihoods))/self.evidence
-        nw_mask = np.isnan(norm_weights)
-        if  np.any(nw_mask):
-            return np.inf
-        D_of_theta = -2.*log_likelihoods
-        D_bar = np.average(D_of_theta, weights=norm_weights)
-        theta_bar = np.average(params, axis=0, weights=norm_weights)
-        D_of_theta_bar = -2. * self.loglikelihood(theta_bar)
-        p_D = D_bar - D_of_theta_bar
-        return p_D + D_bar
-
-    def best_fit_likelihood(self):
-        """Parameter vector with the maximum likelihood.
-        Returns:
-            numpy.array: The parameter vector.
+        text_file = self._file_root + '.txt'
+        npy_file = self._file_root + 'data.npy'
+        if (not os.path.exists(npy_file)) or (os.path.getmtime(npy_file) < os.path.getmtime(text_file)):
+            data = np.loadtxt(text_file, ndmin=2)
+            try:
+                np.save(npy_file, data)
+            except OSError:
+                return data
+        return np.load(npy_file, mmap_mode='r')
+
+    @property
+    def mode_stats(self):
+        """list of dict: The statistics of each mode found by MultiNest's
+        mode separation (if multimodal=True); e.g., the local log-evidence
+        and the mean, sigma, and maximum likelihood parameter vector of each
+        mode. None if the run wasn't multimodal. The stats file is parsed
+        on the first access and cached; in_memory runs parse it before
+        their files are removed.
         """
-        mn_data = Analyzer(len(self.sampled_parameters), self._file_root, verbose=False).get_data()
-        log_ls = -0.5*mn_data[:,1]
-        midx = np.argmax(log_ls)
-        ml = mn_data[midx][2:]
-        return ml
+        if self.in_memory or not self.multinest_kwargs.get('multimodal', True):
+            return self._mode_stats
+        if self._mode_stats is None:
+            analyzer = Analyzer(self._nDims, self._file_root, verbose=False)
+            self._mode_stats = analyzer.get_mode_stats()['modes']
+        return self._mode_stats
+    @mode_stats.setter
+    def mode_stats(self, value):
+        warnings.warn("mode_stats is not settable")
+
+    def _make_result(self):
+        if self.in_memory:
+            # The posterior samples followed by their ln(L) and weights.
+            posterior = self._output['posterior']
+            samples = posterior[:,:self._nDims]
+            log_likelihoods = posterior[:,self._nDims]
+            weights = posterior[:,self._nDims+1]
+        else:
+            # The posterior samples with their weights, and their -2*ln(L).
+            mn_data = self._load_data()
+            samples = mn_data[:,2:]
+            log_likelihoods = -0.5*mn_data[:,1]
+            weights = mn_data[:,0]
+        with np.errstate(divide='ignore'):
+            log_weights = np.log(weights)
+        stats = dict()
+        if self.mode_stats is not None:
+            stats['n_modes'] = len(self.mode_stats)
+        return NSResult([sp.name for sp in self.sampled_parameters],
+                        samples, log_likelihoods=log_likelihoods,
+                        log_weights=log_weights,
+                        log_evidence=self._output['logZ'],
+                        log_evidence_error=self._output['logZerr'],
+                        stats=stats)
+
+
+def _temporary_directory():
+    """Make a temporary directory, on tmpfs (/dev/shm) if it is available."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return tempfile.mkdtemp(prefix='gleipnir_multinest_', dir='/dev/shm')
+    return tempfile.mkdtemp(prefix='gleipnir_multinest_')
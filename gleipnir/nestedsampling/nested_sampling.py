@@ -15,6 +15,7 @@ import numpy as np
 import pandas as pd
 import warnings
 from ..nsbase import NestedSamplingBase
+from ..nsresult import NSResult
 from .samplers import MetropolisComponentWiseHardNSRejection
 from .stopping_criterion import NumberOfIterations
 
@@ -38,6 +39,16 @@ class NestedSampling(NestedSamplingBase):
         stopping_criterion (obj from gleipnir.stopping_criterion, optional):
             The criterion that should be used to determine when to stop the
             Nested Sampling run. Default: NumberOfIterations(1000)
+        batch_loglikelihood (function, optional): A function that computes
+            the log-likelihoods of an (n, ndim) array of parameter vectors at
+            once. If given, it is used to evaluate the initial live points.
+            Default: None
+        bounded_loglikelihood (function, optional): A function,
+            f(parameter_vector, ns_boundary), which returns the log-likelihood
+            if it is above ns_boundary but may otherwise stop early and return
+            any value less than or equal to ns_boundary. If given, it is
+            passed to the sampler (as the bounded_loglikelihood keyword
+            argument) to evaluate the trial moves. Default: None
     References:
         1. Skilling, John. "Nested sampling." AIP Conference Proceedings. Vol.
             735. No. 1. AIP, 2004.
@@ -49,7 +60,8 @@ class NestedSampling(NestedSamplingBase):
 
     def __init__(self, sampled_parameters, loglikelihood, population_size,
                  sampler=MetropolisComponentWiseHardNSRejection(10, tuning_cycles=1),
-                 stopping_criterion=NumberOfIterations(1000)):
+                 stopping_criterion=NumberOfIterations(1000),
+                 batch_loglikelihood=None, bounded_loglikelihood=None):
         """Initialize the Nested Sampler."""
         # stor inputs
         self.sampled_parameters = sampled_parameters
@@ -59,6 +71,8 @@ class NestedSampling(NestedSamplingBase):
         self.sampler = sampler
         self.population_size = population_size
         self.stopping_criterion = stopping_criterion
+        self.batch_loglikelihood = batch_loglikelihood
+        self.bounded_loglikelihood = bounded_loglikelihood
 
         # estimate of NS constriction factor
         self._alpha = population_size/(population_size+1)
@@ -76,8 +90,10 @@ class NestedSampling(NestedSamplingBase):
         self._n_iterations = 0
         self._dead_points = list()
         self._live_points = None
-        self._post_eval = False
-        self._posteriors = None
+        self._log_likelihoods = None
+        self._ndx = None
+        self._finished = False
+        self._result = None
         return
 
     def run(self, verbose=False):
@@ -87,6 +103,55 @@ class NestedSampling(NestedSamplingBase):
             of the evidence and its error estimate as computed from the
             Nested Sampling run: (log_evidence, log_evidence_error)
         """
+        if self._finished:
+            return self._log_evidence, self._logZ_err
+        if self._live_points is None:
+            self._initialize(verbose=verbose)
+        # subseqent iterations
+        while not self._stopping_criterion():
+            self._iterate(verbose=verbose)
+        return self.finalize()
+
+    def advance(self, n_iterations, verbose=False):
+        """Advance the Nested Sampling run by a number of iterations.
+        The run can be advanced in steps this way and then completed with
+        either the run or finalize functions.
+
+        Args:
+            n_iterations (int): The maximum number of iterations to run. Fewer
+                are run if the stopping criterion is reached first.
+
+        Returns:
+            bool: True if the stopping criterion has been reached.
+        """
+        if self._live_points is None:
+            self._initialize(verbose=verbose)
+        for i in range(n_iterations):
+            if self._stopping_criterion():
+                break
+            self._iterate(verbose=verbose)
+        return self._stopping_criterion()
+
+    def log_evidence_bounds(self):
+        """Bounds on the final log evidence of an unfinished run.
+        The lower bound is the log of the evidence accumulated so far, while
+        the upper bound assumes all of the remaining prior mass sits at the
+        largest likelihood of the current live points:
+            ln(Z + X_remaining*L_max).
+
+        Returns:
+            tuple of (float, float): The (lower, upper) bounds.
+        """
+        if self._finished:
+            return self._log_evidence, self._log_evidence
+        with np.errstate(divide='ignore'):
+            lower = np.log(self._evidence)
+        log_x_remaining = self._n_iterations*np.log(self._alpha)
+        upper = np.logaddexp(lower, np.max(self._log_likelihoods) + log_x_remaining)
+        return lower, upper
+
+    def _initialize(self, verbose=False):
+        """Generate the initial live points and do the first iteration."""
         # Zeroth iteration -- generate all the random samples
         if verbose:
             print("Generating the initial set of live points with population size {}...".format(self.population_size))
@@ -105,7 +170,11 @@ class NestedSampling(NestedSamplingBase):
         # Evaulate the log likelihood function for each live point
         if verbose:
             print("Evaluating the loglikelihood function for each live point...")
-        log_likelihoods = np.array([self.loglikelihood(sampled_parameter_vector) for sampled_parameter_vector in self._live_points.values])
+        if self.batch_loglikelihood is not None:
+            log_likelihoods = np.asarray(self.batch_loglikelihood(self._live_points.values), dtype=float)
+        else:
+            log_likelihoods = np.array([self.loglikelihood(sampled_parameter_vector) for sampled_parameter_vector in self._live_points.values])
+        self._log_likelihoods = log_likelihoods
 
         # first iteration
         self._n_iterations += 1
@@ -131,55 +200,83 @@ class NestedSampling(NestedSamplingBase):
         for k,val in enumerate(param_vec):
             dpd[self.sampled_parameters[k].name] = val
         self._dead_points.append(dpd)
+        self._ndx = ndx
 
         if verbose:
             print("Iteration: {} Evidence estimate: {} Remaining prior mass: {}".format(self._n_iterations, self._evidence, self._alpha**self._n_iterations))
             print("Dead Point:")
             print(self._dead_points[-1])
+        return
 
-        # subseqent iterations
-        while not self._stopping_criterion():
-            self._n_iterations += 1
-            self._current_weights = self._alpha**(self._n_iterations-1.0) - self._alpha**self._n_iterations
+    def _iterate(self, verbose=False):
+        """Do a single Nested Sampling iteration."""
+        log_likelihoods = self._log_likelihoods
+        ndx = self._ndx
+        log_l = log_likelihoods[ndx]
+        self._n_iterations += 1
+        self._current_weights = self._alpha**(self._n_iterations-1.0) - self._alpha**self._n_iterations
 
-            # Replace the dead point with a modified survivor.
-            # Choose at random from the survivors.
+        # Replace the dead point with a modified survivor.
+        # Choose at random from the survivors.
+        r_p_ndx = int(np.random.random(1)*self.population_size)
+        while r_p_ndx == ndx:
             r_p_ndx = int(np.random.random(1)*self.population_size)
-            while r_p_ndx == ndx:
-                r_p_ndx = int(np.random.random(1)*self.population_size)
-            # Now make a new point from the survivor via the sampler.
-            r_p_param_vec = self._live_points.values[r_p_ndx]
+        # Now make a new point from the survivor via the sampler.
+        r_p_param_vec = self._live_points.values[r_p_ndx]
+        if self.bounded_loglikelihood is not None:
+            updated_point_param_vec, u_log_l = self.sampler(self.sampled_parameters, self.loglikelihood, r_p_param_vec, log_l,
+                                                            bounded_loglikelihood=self.bounded_loglikelihood)
+        else:
             updated_point_param_vec, u_log_l = self.sampler(self.sampled_parameters, self.loglikelihood, r_p_param_vec, log_l)
-            log_likelihoods[ndx] = u_log_l
-            self._live_points.values[ndx] = updated_point_param_vec
-            # Get the lowest likelihood live point.
-            ndx = np.argmin(log_likelihoods)
-            log_l = log_likelihoods[ndx]
-            param_vec = self._live_points.values[ndx]
-            # Accumulate the evidence.
-            dZ = self._current_weights*np.exp(log_l)
-            self._evidence += dZ
-            # Accumulate the information.
-            dH = dZ*log_l
-            if np.isnan(dH): dH = 0.0
-            self._H += dH
-            if self._evidence > 0.0:
-                self._information = -np.log(self._evidence)+self._H/self._evidence
-
-            # Add the lowest likelihood live point to dead points
-            dpd = dict({'log_l': log_l, 'weight':self._current_weights})
-            for k,val in enumerate(param_vec):
-                dpd[self.sampled_parameters[k].name] = val
-            self._dead_points.append(dpd)
-
-            self._previous_weight = self._current_weights
-            if verbose and (self._n_iterations%10==0):
-                logZ_err = np.sqrt(self._information/self.population_size)
-                ev_err = np.exp(logZ_err)
-                print("Iteration: {} Evidence estimate: {} +- {} Remaining prior mass: {}".format(self._n_iterations, self._evidence, ev_err, self._alpha**self._n_iterations))
-                print("Dead Point:")
-                print(self._dead_points[-1])
+        log_likelihoods[ndx] = u_log_l
+        self._live_points.values[ndx] = updated_point_param_vec
+        # Get the lowest likelihood live point.
+        ndx = np.argmin(log_likelihoods)
+        log_l = log_likelihoods[ndx]
+        param_vec = self._live_points.values[ndx]
+        # Accumulate the evidence.
+        dZ = self._current_weights*np.exp(log_l)
+        self._evidence += dZ
+        # Accumulate the information.
+        dH = dZ*log_l
+        if np.isnan(dH): dH = 0.0
+        self._H += dH
+        if self._evidence > 0.0:
+            self._information = -np.log(self._evidence)+self._H/self._evidence
 
+        # Add the lowest likelihood live point to dead points
+        dpd = dict({'log_l': log_l, 'weight':self._current_weights})
+        for k,val in enumerate(param_vec):
+            dpd[self.sampled_parameters[k].name] = val
+        self._dead_points.append(dpd)
+        self._ndx = ndx
+
+        self._previous_weight = self._current_weights
+        if verbose and (self._n_iterations%10==0):
+            logZ_err = np.sqrt(self._information/self.population_size)
+            ev_err = np.exp(logZ_err)
+            print("Iteration: {} Evidence estimate: {} +- {} Remaining prior mass: {}".format(self._n_iterations, self._evidence, ev_err, self._alpha**self._n_iterations))
+            print("Dead Point:")
+            print(self._dead_points[-1])
+        return
+
+    def finalize(self):
+        """Finish the Nested Sampling run.
+        Adds the contribution of the remaining live points to the evidence
+        and converts the dead points to a pandas DataFrame. This is called
+        by the run function, but can also be called directly to stop a run
+        that is being advanced in steps before the stopping criterion is
+        reached.
+
+        Returns:
+            tuple of (float, float): Tuple containing the natural logarithm
+            of the evidence and its error estimate as computed from the
+            Nested Sampling run: (log_evidence, log_evidence_error)
+        """
+        if self._finished:
+            return self._log_evidence, self._logZ_err
+        log_likelihoods = self._log_likelihoods
+        ndx = self._ndx
         # Accumulate the final bit for remaining surviving points.
         weight = self._alpha**(self._n_iterations)
         likelihoods = np.exp(log_likelihoods)
@@ -209,6 +306,7 @@ class NestedSampling(NestedSamplingBase):
         self._log_evidence = np.log(self._evidence)
         # Convert the dead points dict to a pandas DataFrame.
         self._dead_points = pd.DataFrame(self._dead_points)
+        self._finished = True
 
         return self._log_evidence, logZ_err
 
@@ -263,77 +361,20 @@ class NestedSampling(NestedSamplingBase):
     def information(self, value):
         warnings.warn("information is not settable")
 
-    def posteriors(self, nbins=None):
-        """Estimates of the posterior marginal probability distributions of each parameter.
-        Returns:
-            dict of tuple of (numpy.ndarray, numpy.ndarray, numpy.ndarray): The
-                histogram estimates of the posterior marginal probability
-                distributions. The returned dict is keyed by the sampled
-                parameter names and each element is a tuple with
-                (marginal_weights, bin_edges, bin_centers).
-        """
-        # Lazy evaluation at first call of the function and store results
-        # so that subsequent calls don't have to recompute.
-        if not self._post_eval:
-            log_likelihoods = self._dead_points['log_l'].to_numpy()
-            weights = self._dead_points['weight'].to_numpy()
-            likelihoods = np.exp(log_likelihoods)
-            norm_weights = (weights*likelihoods)/self.evidence
-            gt_mask = norm_weights > 0.0
-            parms = self._dead_points.columns[2:]
-            # Rice bin count selection
-            if nbins is None:
-                nbins = 2 * int(np.cbrt(len(norm_weights[gt_mask])))
-            self._posteriors = dict()
-            for parm in parms:
-                marginal, edge = np.histogram(self._dead_points[parm][gt_mask], weights=norm_weights[gt_mask], density=True, bins=nbins)
-                center = (edge[:-1] + edge[1:])/2.
-                self._posteriors[parm] = (marginal, edge, center)
-            self._post_eval = True
-        return self._posteriors
-
-    def max_loglikelihood(self):
-        mx = self._dead_points.max()
-        ml = mx['log_l']
-        return ml
-
-    def deviance_ic(self):
-        """Estimate Deviance Information Criterion.
-        This function estimates the Deviance Information Criterion (DIC) for the
-        model simulated with Nested Sampling (NS). It does so by using the
-        posterior distribution estimates computed from the NS outputs.
-        The DIC formula is given by:
-            DIC = p_D + D_bar,
-        where p_D = D_bar - D(theta_bar), D_bar is the posterior average of
-        the deviance D(theta)= -2*ln(L(theta)) with L(theta) the likelihood
-        of parameter set theta, and theta_bar is posterior average parameter set.
-
-        Returns:
-            float: The DIC estimate.
-        """
+    def _make_result(self):
+        # The dead points with their posterior weights, w_i*L_i.
         log_likelihoods = self._dead_points['log_l'].to_numpy()
-        weights = self._dead_points['weight'].to_numpy()
-        likelihoods = np.exp(log_likelihoods)
-        norm_weights = (weights*likelihoods)/self.evidence
-        gt_mask = norm_weights > 0.0
-        parms = self._dead_points.columns[2:]
-        params = self._dead_points[parms]
-        D_of_theta = -2.*log_likelihoods[gt_mask]
-        D_bar = np.average(D_of_theta, weights=norm_weights[gt_mask])
-        theta_bar = np.average(params[gt_mask], weights=norm_weights[gt_mask], axis=0)
-        D_of_theta_bar = -2. * self.loglikelihood(theta_bar)
-        p_D = D_bar - D_of_theta_bar
-        return p_D + D_bar
-
-    def best_fit_likelihood(self):
-        """Parameter vector with the maximum likelihood.
-        Returns:
-            numpy.array: The parameter vector.
-        """
-        midx = np.argmax(self._dead_points.values[:,0])
-        # print(mx)
-        ml = self._dead_points.values[midx][2:]
-        return ml
+        with np.errstate(divide='ignore'):
+            log_weights = np.log(self._dead_points['weight'].to_numpy()) + log_likelihoods
+        samples = self._dead_points[[sp.name for sp in self.sampled_parameters]].to_numpy()
+        stats = {'n_iterations': self._n_iterations,
+                 'population_size': self.population_size}
+        return NSResult([sp.name for sp in self.sampled_parameters], samples,
+                        log_likelihoods=log_likelihoods,
+                        log_weights=log_weights,
+                        log_evidence=self._log_evidence,
+                        log_evidence_error=self._logZ_err,
+                        information=self._information, stats=stats)
 
     @property
     def dead_points(self):
@@ -66,6 +66,10 @@ class MetropolisComponentWiseHardNSRejection(object):
             ns_boundary (float): The current lower likelihood bound from the
             Nested Sampling routine.
             kwargs (dict): Pass in any other method specific keyword arguments.
+                If kwargs has a bounded_loglikelihood function,
+                f(parameter_vector, ns_boundary), it is used to evaluate the
+                trial moves, since only whether they are above ns_boundary
+                matters.
         """
         if self._first:
             self._ndim = len(sampled_parameters)
@@ -81,6 +85,11 @@ class MetropolisComponentWiseHardNSRejection(object):
             self._first = False
 
         start_likelihood = loglikelihood(start_param_vec)
+        bounded_loglikelihood = kwargs.get('bounded_loglikelihood', None)
+        if bounded_loglikelihood is None:
+            trial_loglikelihood = loglikelihood
+        else:
+            trial_loglikelihood = lambda point: bounded_loglikelihood(point, ns_boundary)
 
         # Tuning cycles
         steps = self._widths.copy()
@@ -105,7 +114,7 @@ class MetropolisComponentWiseHardNSRejection(object):
                     cur_priorj = sampled_parameters[j].prior(cur_pointj)
                     new_priorj = sampled_parameters[j].prior(new_point[j])
                     ratio = new_priorj/cur_priorj
-                    new_likelihood = loglikelihood(new_point)
+                    new_likelihood = trial_loglikelihood(new_point)
                     # Metropolis criterion with NS boundary
                     if (u[j] < ratio) and (new_likelihood > ns_boundary):
                         # accept the new point and update
@@ -141,7 +150,7 @@ class MetropolisComponentWiseHardNSRejection(object):
                     new_priorj = sampled_parameters[j].prior(new_point[j])
                     ratio = new_priorj/cur_priorj
                     #print("ratio",ratio, "cur_priorj", cur_priorj, "new_priorj", new_priorj, "cur_pointj", cur_pointj, "new_pointj", new_pointj, "rstepj", rsteps[j])
-                    new_likelihood = loglikelihood(new_point)
+                    new_likelihood = trial_loglikelihood(new_point)
                     # Metropolis criterion with NS boundary
                     if (u[j] < ratio) and (new_likelihood > ns_boundary):
                         # accept the new point and update
@@ -11,9 +11,14 @@ References:
 
 """
 
-import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import time
 import warnings
+
+import numpy as np
 from .nsbase import NestedSamplingBase
+from .nsresult import NSResult
 
 try:
     import nestle
@@ -21,6 +26,75 @@ except ImportError as err:
     #print(err)
     raise err
 
+# State of the worker processes.
+_worker = dict()
+
+def _init_worker(loglikelihood):
+    """Store the loglikelihood function in the worker process."""
+    _worker['loglikelihood'] = loglikelihood
+    return
+
+def _worker_loglikelihood(position):
+    return _worker['loglikelihood'](position)
+
+def _timed_call(function, position):
+    """Evaluate the function and time the evaluation."""
+    start_time = time.time()
+    value = function(position)
+    return value, time.time() - start_time
+
+
+class _PriorTransform(object):
+    """The (picklable) prior_transform function for Nestle."""
+
+    def __init__(self, sampled_parameters):
+        self.sampled_parameters = sampled_parameters
+
+    def __call__(self, hypercube):
+        return np.array([self.sampled_parameters[i].invcdf(value) for i,value in enumerate(hypercube)])
+
+
+class _TimingFuture(object):
+    """Wraps a Future of a _timed_call to return just the value."""
+
+    def __init__(self, future, pool):
+        self._future = future
+        self._pool = pool
+
+    def result(self):
+        value, run_time = self._future.result()
+        self._pool.n_used += 1
+        self._pool.evaluation_time += run_time
+        return value
+
+    def cancel(self):
+        return self._future.cancel()
+
+
+class _TimingPool(object):
+    """Adapts an executor to the pool interface used by Nestle (submit and
+    map), recording the time spent in the evaluations.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.n_submitted = 0
+        self.n_used = 0
+        self.evaluation_time = 0.
+
+    def submit(self, fn, *args):
+        self.n_submitted += 1
+        return _TimingFuture(self.executor.submit(_timed_call, fn, *args), self)
+
+    def map(self, func, *iterables):
+        results = list(self.executor.map(functools.partial(_timed_call, func),
+                                         *iterables))
+        self.n_submitted += len(results)
+        self.n_used += len(results)
+        self.evaluation_time += sum(run_time for _, run_time in results)
+        return [value for value, _ in results]
+
+
 class NestleNestedSampling(NestedSamplingBase):
     """Nested Sampling using Nestle.
     Nestle: https://github.com/kbarbary/nestle
@@ -33,6 +107,15 @@ class NestleNestedSampling(NestedSamplingBase):
             assigning a likelihood to parameter vectors during the sampling.
         population_size (int): The number of points to use in the Nested
             Sampling active population.
+        n_workers (int): The number of worker processes evaluating the
+            loglikelihood in parallel. When an executor is given, this is
+            the number of workers of that executor and is required.
+            Default: None -> serial evaluation
+        executor (concurrent.futures.Executor): An existing executor to
+            submit the loglikelihood evaluations to. Default: None
+        queue_size (int): The number of candidate points that are evaluated
+            concurrently. Requires an executor or n_workers > 1.
+            Default: None -> n_workers
         nestle_kwargs (dict): Additional keyword arguments that should be
             passed to the to nestle.sample. Available options are:
                 method (str): Method to use to generate new sample points.
@@ -68,44 +151,83 @@ class NestleNestedSampling(NestedSamplingBase):
     """
 
     def __init__(self, sampled_parameters, loglikelihood, population_size,
+                 n_workers=None, executor=None, queue_size=None,
                  **nestle_kwargs):
         """Initialize the Nestle Nested Sampler."""
         self.sampled_parameters = sampled_parameters
         self.loglikelihood = loglikelihood
         self.population_size = population_size
+        self.n_workers = n_workers
+        self.executor = executor
+        self.queue_size = queue_size
         self.nestle_kwargs = nestle_kwargs
+        if (executor is not None) and (n_workers is None):
+            raise ValueError("n_workers is required when an executor is given")
+        if ((queue_size is not None) and (executor is None)
+                and ((n_workers is None) or (n_workers < 2))):
+            raise ValueError("queue_size requires an executor or n_workers > 1")
 
         self._nDims = len(sampled_parameters)
         self._nDerived = 0
         self._output = None
-        self._post_eval = False
+        self._result = None
+        self._run_stats = dict()
+        self._prior_transform = _PriorTransform(sampled_parameters)
         #if self.population_size is None:
         #    self.population_size = 25*self._nDims
 
-        # Make the prior_transform function for Nest.
-        def prior_transform(hypercube):
-            return np.array([self.sampled_parameters[i].invcdf(value) for i,value in enumerate(hypercube)])
-
-        self._prior_transform = prior_transform
         # multinest settings
         #self._file_root = 'multinest_run_' #string
 
         return
 
-
     def run(self, verbose=False):
         """Initiate the Nestle Nested Sampling run."""
         callback = None
         if verbose:
             callback = nestle.print_progress
-        output = nestle.sample(self.loglikelihood, self._prior_transform,
-                               self._nDims,
-                               npoints=self.population_size,
-                               callback = callback,
-                               **self.nestle_kwargs)
+        nestle_kwargs = dict(self.nestle_kwargs)
+        loglikelihood = self.loglikelihood
+        pool = None
+        own_executor = None
+        if self.executor is not None:
+            n_workers = self.n_workers
+            pool = _TimingPool(self.executor)
+        elif (self.n_workers is not None) and (self.n_workers > 1):
+            n_workers = self.n_workers
+            own_executor = ProcessPoolExecutor(max_workers=n_workers,
+                                               initializer=_init_worker,
+                                               initargs=(self.loglikelihood,))
+            loglikelihood = _worker_loglikelihood
+            pool = _TimingPool(own_executor)
+        if pool is not None:
+            queue_size = self.queue_size
+            if queue_size is None:
+                queue_size = n_workers
+            nestle_kwargs['pool'] = pool
+            nestle_kwargs['queue_size'] = queue_size
+        start_time = time.time()
+        try:
+            output = nestle.sample(loglikelihood, self._prior_transform,
+                                   self._nDims,
+                                   npoints=self.population_size,
+                                   callback = callback,
+                                   **nestle_kwargs)
+        finally:
+            if own_executor is not None:
+                own_executor.shutdown()
+        wall_time = time.time() - start_time
+        self._run_stats = {'wall_time': wall_time}
+        if pool is not None:
+            self._run_stats.update({'n_workers': n_workers,
+                                    'queue_size': queue_size,
+                                    'evaluation_time': pool.evaluation_time,
+                                    'parallel_efficiency': pool.evaluation_time/(n_workers*wall_time),
+                                    'n_unused': pool.n_submitted - pool.n_used})
         if verbose:
             output.summary()
         self._output = output
+        self._result = None
         return self.log_evidence, self.log_evidence_error
 
     @property
@@ -151,76 +273,14 @@ class NestleNestedSampling(NestedSamplingBase):
         warnings.warn("information is not settable")
 
 
-    def posteriors(self, nbins=None):
-        """Estimates of the posterior marginal probability distributions of each parameter.
-        Returns:
-            dict of tuple of (numpy.ndarray, numpy.ndarray, numpy.ndarray): The
-                histogram estimates of the posterior marginal probability
-                distributions. The returned dict is keyed by the sampled
-                parameter names and each element is a tuple with
-                (marginal_weights, bin_edges, bin_centers).
-        """
-        # Lazy evaluation at first call of the function and store results
-        # so that subsequent calls don't have to recompute.
-        #print('nbins', nbins)
-        if not self._post_eval:
-            # Here the samples are samples directly from the posterior
-            # (i.e. equal weights).
-            samples = self._output.samples
-            weights = self._output.weights
-            # Rice bin count selection
-            if nbins is None:
-                nbins = 2 * int(np.cbrt(len(samples)))
-            # print('nbins', nbins)
-            nd = samples.shape[1]
-            self._posteriors = dict()
-            for ii in range(nd):
-                marginal, edge = np.histogram(samples[:,ii], density=True, bins=nbins, weights=weights)
-                center = (edge[:-1] + edge[1:])/2.
-                self._posteriors[self.sampled_parameters[ii].name] = (marginal, edge, center)
-            self._post_eval = True
-
-        return self._posteriors
-
-    def max_loglikelihood(self):
-        log_ls = self._output.logl
-        ml = log_ls.max()
-        return ml
-
-    def deviance_ic(self):
-        """Estimate Deviance Information Criterion.
-        This function estimates the Deviance Information Criterion (DIC) for the
-        model simulated with Nested Sampling (NS). It does so by using the
-        posterior distribution estimates computed from the NS outputs.
-        The DIC formula is given by:
-            DIC = p_D + D_bar,
-        where p_D = D_bar - D(theta_bar), D_bar is the posterior average of
-        the deviance D(theta)= -2*ln(L(theta)) with L(theta) the likelihood
-        of parameter set theta, and theta_bar is posterior average parameter set.
-
-        Returns:
-            float: The DIC estimate.
-        """
-        params = self._output.samples
-        log_likelihoods = self._output.logl
-        norm_weights = self._output.weights
-        nw_mask = np.isnan(norm_weights)
-        if  np.any(nw_mask):
-            return np.inf
-        D_of_theta = -2.*log_likelihoods
-        D_bar = np.average(D_of_theta, weights=norm_weights)
-        theta_bar = np.average(params, axis=0, weights=norm_weights)
-        D_of_theta_bar = -2. * self.loglikelihood(theta_bar)
-        p_D = D_bar - D_of_theta_bar
-        return p_D + D_bar
-
-    def best_fit_likelihood(self):
-        """Parameter vector with the maximum likelihood.
-        Returns:
-            numpy.array: The parameter vector.
-        """
-        samples = self._output.samples
-        log_ls = self._output.logl
-        midx = np.argmax(log_ls)
-        ml = samples[midx][:]
-        return ml
+    def _make_result(self):
+        output = self._output
+        with np.errstate(divide='ignore'):
+            log_weights = np.log(output.weights)
+        stats = {'n_iterations': output.niter, 'n_calls': output.ncall}
+        stats.update(self._run_stats)
+        return NSResult([sp.name for sp in self.sampled_parameters],
+                        output.samples, log_likelihoods=output.logl,
+                        log_weights=log_weights, log_evidence=output.logz,
+                        log_evidence_error=output.logzerr,
+                        information=output.h, stats=stats)
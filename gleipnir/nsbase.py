@@ -1,5 +1,4 @@
 import numpy as np
-import scipy
 from abc import ABC, abstractmethod
 
 class NestedSamplingBase(ABC):
@@ -11,8 +10,7 @@ class NestedSamplingBase(ABC):
         self.loglikelihood = loglikelihood
         self.population_size = population_size
 
-        self._post_eval = False
-        self._posteriors = None
+        self._result = None
         return
 
     @abstractmethod
@@ -52,6 +50,34 @@ class NestedSamplingBase(ABC):
         pass
 
     @abstractmethod
+    def _make_result(self):
+        """Convert the output of the run to an NSResult.
+        Backends convert their outputs once; e.g., the dead points with
+        their posterior weights, or equally weighted posterior samples.
+
+        Returns:
+            :obj:gleipnir.nsresult.NSResult: The samples and evidence
+                estimates of the run.
+        """
+        pass
+
+    @property
+    def result(self):
+        """:obj:gleipnir.nsresult.NSResult: The columnar samples and evidence
+        estimates of the run. It is built from the backend's output on the
+        first access after the run and cached.
+        """
+        if getattr(self, '_result', None) is None:
+            self._result = self._make_result()
+        return self._result
+
+    def _likelihood_result(self):
+        """The NSResult used for the log-likelihood based estimates; i.e.,
+        max_loglikelihood, best_fit_likelihood, and deviance_ic. Defaults
+        to the result of the run.
+        """
+        return self.result
+
     def posteriors(self, nbins=None):
         """Estimates of the posterior marginal probability distributions of each parameter.
         Returns:
@@ -61,34 +87,27 @@ class NestedSamplingBase(ABC):
                 parameter names and each element is a tuple with
                 (marginal_weights, bin_edges, bin_centers).
         """
-        pass
+        return self.result.posteriors(nbins=nbins)
 
     def posterior_moments(self):
         """Get the first 4 moments of each marginal distribution.
+        The moments are computed directly from the weighted posterior samples
+        of the run for all the parameters at once, and cached.
+
         Returns:
             dict of tuple of (float, float, float, float): The first 4 moments
                 (mean, var, skew, kurtosis) for each parameter's marginal
                 posterior distribution. The dict is keyed to parameter names.
+                The skew and kurtosis are the (biased) Fisher-Pearson
+                coefficient and the excess kurtosis, as given by
+                scipy.stats.skew and scipy.stats.kurtosis.
         """
-        post = self.posteriors()
-        moments = dict()
-        for parm in post.keys():
-            marginal, edges, centers = post[parm]
-            width = edges[1] - edges[0]
-            # resample from the distribution
-            samples = np.random.choice(centers, size=1000000, p=marginal/(marginal.sum())) + (width*(np.random.random(1000000)-0.5))
-            mean = np.mean(samples)
-            var = np.var(samples)
-            skew = scipy.stats.skew(samples)
-            kurtosis = scipy.stats.kurtosis(samples)
-            moments[parm] = tuple((mean, var, skew, kurtosis))
-        return moments
+        return self.result.posterior_moments()
 
-    @abstractmethod
     def max_loglikelihood(self):
         """Get the maximum likelihood value found during the NS run.
         """
-        pass
+        return self._likelihood_result().max_loglikelihood()
 
     def akaike_ic(self):
         """Estimate Akaike Information Criterion.
@@ -129,7 +148,6 @@ class NestedSamplingBase(ABC):
         k = len(self.sampled_parameters)
         return  np.log(n_data)*k - 2.*ml
 
-    @abstractmethod
     def deviance_ic(self):
         """Estimate Deviance Information Criterion.
         This function estimates the Deviance Information Criterion (DIC) for the
@@ -144,15 +162,21 @@ class NestedSamplingBase(ABC):
         Returns:
             float: The DIC estimate.
         """
-        pass
+        result = self._likelihood_result()
+        if np.any(np.isnan(result.weights)):
+            return np.inf
+        D_bar = result.mean_deviance()
+        theta_bar = result.posterior_mean()
+        D_of_theta_bar = -2. * self.loglikelihood(theta_bar)
+        p_D = D_bar - D_of_theta_bar
+        return p_D + D_bar
 
-    @abstractmethod
     def best_fit_likelihood(self):
         """Parameter vector with the maximum likelihood.
         Returns:
             numpy.array: The parameter vector.
         """
-        pass
+        return self._likelihood_result().best_fit_likelihood()
 
     def best_fit_posterior(self):
         """Parameter vector with the maximum posterior weight.
@@ -0,0 +1,196 @@
+"""Backend-independent representation of Nested Sampling run outputs.
+
+This module defines the NSResult class, a columnar container for the
+samples (and their log-likelihoods and posterior weights) and the evidence
+estimates of a Nested Sampling run. Each of the Nested Sampling backends
+converts its output to an NSResult once, and the posterior analysis
+functions of NestedSamplingBase (posteriors, posterior_moments,
+max_loglikelihood, best_fit_likelihood, deviance_ic) are computed from it.
+
+"""
+
+import numpy as np
+
+class NSResult(object):
+    """The samples and evidence estimates of a Nested Sampling run.
+
+    Args:
+        parameter_names (list): The names of the sampled parameters.
+        samples (numpy.ndarray): The (n, ndim) parameter vectors of the
+            samples.
+        log_likelihoods (numpy.ndarray): The n log-likelihoods of the
+            samples. Defaults to None, for backends whose posterior samples
+            don't carry their log-likelihoods.
+        log_weights (numpy.ndarray): The n (unnormalized) natural
+            logarithms of the posterior weights of the samples. Defaults to
+            None, which gives the samples equal weights.
+        log_evidence (float): Estimate of the natural logarithm of the
+            evidence. Default: None
+        log_evidence_error (float): Estimate of the error in the natural
+            logarithm of the evidence. Default: None
+        information (float): Estimate of the Bayesian information, or H.
+            Default: None
+        stats (dict): Additional statistics of the run; e.g., the number of
+            iterations and likelihood calls. Default: None
+
+    Attributes:
+        parameter_names
+        samples
+        log_likelihoods
+        log_weights
+        log_evidence
+        log_evidence_error
+        information
+        stats
+
+    """
+
+    def __init__(self, parameter_names, samples, log_likelihoods=None,
+                 log_weights=None, log_evidence=None, log_evidence_error=None,
+                 information=None, stats=None):
+        """Inits NSResult."""
+        self.parameter_names = list(parameter_names)
+        self.samples = np.asarray(samples, dtype=float).reshape(-1, len(self.parameter_names))
+        n_samples = len(self.samples)
+        if log_likelihoods is not None:
+            log_likelihoods = np.asarray(log_likelihoods, dtype=float)
+        self.log_likelihoods = log_likelihoods
+        if log_weights is None:
+            log_weights = np.zeros(n_samples)
+        self.log_weights = np.asarray(log_weights, dtype=float)
+        self.log_evidence = log_evidence
+        self.log_evidence_error = log_evidence_error
+        self.information = information
+        if stats is None:
+            stats = dict()
+        self.stats = stats
+        self._weights = None
+        self._posteriors = dict()
+        self._moments = None
+        return
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def weights(self):
+        """numpy.ndarray: The normalized posterior weights of the samples."""
+        if self._weights is None:
+            with np.errstate(invalid='ignore'):
+                weights = np.exp(self.log_weights - np.max(self.log_weights))
+            self._weights = weights/np.sum(weights)
+        return self._weights
+
+    @property
+    def effective_sample_size(self):
+        """float: The (Kish) effective number of posterior samples."""
+        return 1./np.sum(self.weights**2)
+
+    def posteriors(self, nbins=None):
+        """Histogram estimates of the posterior marginal distributions.
+        The histograms are computed for all the parameters at once from the
+        samples with non-zero weight, and cached for each nbins.
+
+        Args:
+            nbins (int): The number of histogram bins. Defaults to None,
+                which uses the Rice rule.
+
+        Returns:
+            dict of tuple of (numpy.ndarray, numpy.ndarray, numpy.ndarray): The
+                histogram estimates of the posterior marginal probability
+                distributions, keyed by the parameter names; each element
+                is a tuple with (marginal_weights, bin_edges, bin_centers).
+        """
+        if nbins not in self._posteriors:
+            mask = self.weights > 0.
+            samples = self.samples[mask]
+            weights = self.weights[mask]
+            # Rice bin count selection
+            n_bins = nbins
+            if n_bins is None:
+                n_bins = 2 * int(np.cbrt(len(weights)))
+            posteriors = dict()
+            for i, name in enumerate(self.parameter_names):
+                marginal, edge = np.histogram(samples[:, i], weights=weights,
+                                              density=True, bins=n_bins)
+                center = (edge[:-1] + edge[1:])/2.
+                posteriors[name] = (marginal, edge, center)
+            self._posteriors[nbins] = posteriors
+        return self._posteriors[nbins]
+
+    def posterior_mean(self):
+        """The posterior average parameter vector.
+
+        Returns:
+            numpy.ndarray: The parameter vector.
+        """
+        return np.dot(self.weights, self.samples)
+
+    def posterior_moments(self):
+        """The first 4 moments of each marginal posterior distribution.
+        The moments are computed from the weighted samples for all the
+        parameters at once, and cached.
+
+        Returns:
+            dict of tuple of (float, float, float, float): The (mean, var,
+                skew, kurtosis) of each parameter, keyed by the parameter
+                names. The skew and kurtosis are the (biased) Fisher-Pearson
+                coefficient and the excess kurtosis, as given by
+                scipy.stats.skew and scipy.stats.kurtosis.
+        """
+        if self._moments is None:
+            moments = _weighted_moments(self.samples, self.weights)
+            self._moments = {name: tuple(moments[:, i])
+                             for i, name in enumerate(self.parameter_names)}
+        return self._moments
+
+    def _require_log_likelihoods(self):
+        if self.log_likelihoods is None:
+            raise ValueError("The samples of this result don't have log-likelihoods.")
+        return self.log_likelihoods
+
+    def max_loglikelihood(self):
+        """The maximum log-likelihood of the samples.
+
+        Returns:
+            float: The log-likelihood.
+        """
+        return np.max(self._require_log_likelihoods())
+
+    def best_fit_likelihood(self):
+        """The parameter vector of the sample with the maximum likelihood.
+
+        Returns:
+            numpy.ndarray: The parameter vector.
+        """
+        return self.samples[np.argmax(self._require_log_likelihoods())]
+
+    def mean_deviance(self):
+        """The posterior average of the deviance, D(theta) = -2*ln(L(theta)).
+
+        Returns:
+            float: The average deviance.
+        """
+        log_likelihoods = self._require_log_likelihoods()
+        mask = self.weights > 0.
+        return -2.*np.dot(self.weights[mask], log_likelihoods[mask])
+
+
+def _weighted_moments(samples, weights):
+    """The (mean, var, skew, kurtosis) of each column of weighted samples.
+
+    Args:
+        samples (numpy.ndarray): The (n, ndim) samples.
+        weights (numpy.ndarray): The n (unnormalized) sample weights.
+
+    Returns:
+        numpy.ndarray: The (4, ndim) moments.
+    """
+    weights = weights/np.sum(weights)
+    mean = np.dot(weights, samples)
+    deviations = samples - mean
+    squared = deviations**2
+    var = np.dot(weights, squared)
+    skew = np.dot(weights, squared*deviations)/var**1.5
+    kurtosis = np.dot(weights, squared**2)/var**2 - 3.
+    return np.array([mean, var, skew, kurtosis])
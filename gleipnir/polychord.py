@@ -21,6 +21,7 @@ import numpy as np
 import scipy
 import warnings
 from .nsbase import NestedSamplingBase
+from .nsresult import NSResult
 
 try:
     import pypolychord
@@ -57,34 +58,31 @@ class PolyChordNestedSampling(NestedSamplingBase):
 
         self._nDims = len(sampled_parameters)
         self._nDerived = 0
-        self._post_eval = False
-        self._posteriors = None
+        self._result = None
         #if self.population_size is None:
         #    self.population_size = 25*self._nDims
-        # make the likelihood function for polychord
-        def likelihood(theta):
-            r2 = 0
-            return loglikelihood(theta), [r2]
-        self._likelihood = likelihood
-        # make the prior for polychord
-        def prior(hypercube):
-            return np.array([self.sampled_parameters[i].invcdf(value) for i,value in enumerate(hypercube)])
-
-        self._prior = prior
         # PolyChord settings object
         self._settings = PolyChordSettings(self._nDims, self._nDerived,
                                            nlive=self.population_size)
         self._settings.file_root = 'polychord_run' #string
         self._settings.do_clustering = True
         self._settings.read_resume = False
-        # Make the polychord dumper function
-        # param : array, array, array, float, float
-        def dumper(live, dead, logweights, logZ, logZerr):
-            print("Last dead point:", dead[-1]) # prints last element of dead (wich is an array)
-
-        self._dumper = dumper
         return
 
+    def _likelihood(self, theta):
+        """The likelihood function for polychord."""
+        r2 = 0
+        return self.loglikelihood(theta), [r2]
+
+    def _prior(self, hypercube):
+        """The prior for polychord."""
+        return np.array([self.sampled_parameters[i].invcdf(value) for i,value in enumerate(hypercube)])
+
+    def _dumper(self, live, dead, logweights, logZ, logZerr):
+        """The polychord dumper function."""
+        # param : array, array, array, float, float
+        print("Last dead point:", dead[-1]) # prints last element of dead (wich is an array)
+
 
     def run(self, verbose=False):
         """Initiate the PolyChord Nested Sampling run."""
@@ -92,6 +90,7 @@ class PolyChordNestedSampling(NestedSamplingBase):
                                            self._nDerived, self._settings,
                                            self._prior, self._dumper)
         self._output = output
+        self._result = None
         return output.logZ, output.logZerr
 
     @property
@@ -145,75 +144,16 @@ class PolyChordNestedSampling(NestedSamplingBase):
         self._settings.file_root = value
         return
 
-    def posteriors(self, nbins=None):
-        """Estimates of the posterior marginal probability distributions of each parameter.
-        Returns:
-            dict of tuple of (numpy.ndarray, numpy.ndarray, numpy.ndarray): The
-                histogram estimates of the posterior marginal probability
-                distributions. The returned dict is keyed by the sampled
-                parameter names and each element is a tuple with
-                (marginal_weights, bin_edges, bin_centers).
-        """
-        # Lazy evaluation at first call of the function and store results
-        # so that subsequent calls don't have to recompute.
-        if not self._post_eval:
-            # Here the samples are samples directly from the posterior
-            # (i.e. equal weights). - The samples from the PolyChord output
-            # is a pandas DataFrame.
-            samples = self._output.samples
-            log_likelihoods = samples['loglike'].to_numpy()
-            parms = samples.columns[2:]
-            # Rice bin count selection
-            if nbins is None:
-                nbins = 2 * int(np.cbrt(len(log_likelihoods)))
-            self._posteriors = dict()
-            for ii,parm in enumerate(parms):
-                marginal, edge = np.histogram(samples[parm], density=True, bins=nbins)
-                center = (edge[:-1] + edge[1:])/2.
-                self._posteriors[self.sampled_parameters[ii].name] = (marginal, edge, center)
-            self._post_eval = True
-
-        return self._posteriors
-
-    def max_loglikelihood(self):
-        samples = self._output.samples
-        mx = samples.max()
-        ml = mx['loglike']
-        return ml
-
-    def deviance_ic(self):
-        """Estimate Deviance Information Criterion.
-        This function estimates the Deviance Information Criterion (DIC) for the
-        model simulated with Nested Sampling (NS). It does so by using the
-        posterior distribution estimates computed from the NS outputs.
-        The DIC formula is given by:
-            DIC = p_D + D_bar,
-        where p_D = D_bar - D(theta_bar), D_bar is the posterior average of
-        the deviance D(theta)= -2*ln(L(theta)) with L(theta) the likelihood
-        of parameter set theta, and theta_bar is posterior average parameter set.
-
-        Returns:
-            float: The DIC estimate.
-        """
-        samples = self._output.samples
-        log_likelihoods = samples['loglike'].to_numpy()
-        # likelihoods = np.exp(log_likelihoods)
-        parms = samples.columns[2:]
-        params = samples[parms]
-        D_of_theta = -2.*log_likelihoods
-        D_bar = np.average(D_of_theta)
-        theta_bar = np.average(params, axis=0)
-        print(theta_bar)
-        D_of_theta_bar = -2. * self.loglikelihood(theta_bar)
-        p_D = D_bar - D_of_theta_bar
-        return p_D + D_bar
-
-    def best_fit_likelihood(self):
-        """Parameter vector with the maximum likelihood.
-        Returns:
-            numpy.array: The parameter vector.
-        """
-        samples = self._output.samples
-        midx = np.argmax(samples['loglike'].values)
-        ml = samples.values[midx][2:]
-        return ml
+    def _make_result(self):
+        # The samples from the PolyChord output is a pandas DataFrame with
+        # the weight and loglike columns followed by the parameters.
+        output = self._output
+        samples = output.samples
+        with np.errstate(divide='ignore'):
+            log_weights = np.log(samples['weight'].to_numpy())
+        stats = {'n_dead': output.ndead, 'n_calls': output.nlike}
+        return NSResult([sp.name for sp in self.sampled_parameters],
+                        samples[samples.columns[2:]].to_numpy(),
+                        log_likelihoods=samples['loglike'].to_numpy(),
+                        log_weights=log_weights, log_evidence=output.logZ,
+                        log_evidence_error=output.logZerr, stats=stats)
@@ -2,6 +2,8 @@ import warnings
 import pysb
 from pysb.simulator import ScipyOdeSimulator
 from .nestedsample_it import NestedSampleIt, NestIt
+from .result_store import ResultStore
+from .evaluation_pool import EvaluationPool
 try:
     from .hyp_selector import HypSelector
     from .model_selector import ModelSelector
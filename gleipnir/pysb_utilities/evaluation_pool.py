@@ -0,0 +1,188 @@
+"""Defines the EvaluationPool class for multi-process likelihood evaluation.
+
+PySB solver instances can't be shared across processes, so an EvaluationPool
+ships its NestedSampleIt to a set of worker processes, each of which builds
+its own solver for the model on start up. The flattened observable data are
+placed in shared memory (when available; Python >= 3.8) rather than copied to
+every worker. The pool can then be plugged into any of the Nested Sampling
+backends as the loglikelihood function, and additionally provides map and
+batch_loglikelihood functions for evaluating many points at once.
+
+"""
+
+import copy
+from multiprocessing import Pool
+
+import numpy as np
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from .nestedsample_it import _loglikelihood_methods
+
+# The flattened data arrays of NestedSampleIt that are shared.
+_shared_attributes = ['_flat_data', '_flat_counts', '_flat_mean_weights',
+                      '_flat_norm_data', '_flat_inv_vars']
+
+# State of the worker processes.
+_worker = dict()
+
+def _init_worker(sample_it, shared_specs, method_name):
+    """Attach the shared data and build the worker's solver."""
+    blocks = list()
+    for name, (shm_name, shape) in shared_specs.items():
+        block = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(block)
+        setattr(sample_it, name, np.ndarray(shape, dtype=float, buffer=block.buf))
+    # Build the solver now, rather than on the first evaluation.
+    sample_it._ensure_solver()
+    _worker['sample_it'] = sample_it
+    _worker['loglikelihood'] = getattr(sample_it, method_name)
+    _worker['blocks'] = blocks
+    return
+
+def _worker_loglikelihood(position):
+    return _worker['loglikelihood'](position)
+
+def _worker_bounded_loglikelihood(position, ns_boundary):
+    return _worker['sample_it'].bounded_loglikelihood(position, ns_boundary)
+
+def _worker_batch_loglikelihood(positions):
+    return _worker['sample_it'].batch_loglikelihood(positions, num_processors=1)
+
+
+class EvaluationPool(object):
+    """A pool of worker processes for evaluating the loglikelihood of a PySB model.
+
+    Args:
+        sample_it (:obj:gleipnir.pysb_utilities.NestedSampleIt): The
+            NestedSampleIt defining the model, data, and loglikelihood.
+        n_workers (int): The number of worker processes. Defaults to None,
+            which uses the number of CPUs.
+        log_likelihood_type (str): The loglikelihood estimator to use; i.e.,
+            'snlpdf', 'mse', 'sse', or 'custom'. Defaults to None, which uses
+            the estimator set by the last call of the sample_it.
+
+    Attributes:
+        n_workers
+        log_likelihood_type
+        custom_loglikelihood (function): The custom loglikelihood function
+            evaluated by the workers when log_likelihood_type is 'custom',
+            or None.
+
+    Example:
+        sample_it = NestedSampleIt(model, observable_data, timespan)
+        with EvaluationPool(sample_it, n_workers=4) as pool:
+            nested_sampler = sample_it(ns_population_size=1000,
+                                       evaluation_pool=pool)
+            nested_sampler.run()
+
+    """
+
+    def __init__(self, sample_it, n_workers=None, log_likelihood_type=None):
+        """Inits EvaluationPool."""
+        if log_likelihood_type is None:
+            log_likelihood_type = sample_it._log_likelihood_type
+        self.log_likelihood_type = log_likelihood_type
+        self.custom_loglikelihood = None
+        if log_likelihood_type == 'custom':
+            self.custom_loglikelihood = sample_it._custom_loglikelihood
+        worker_sample_it = copy.copy(sample_it)
+        worker_sample_it._solver_instance = None
+        worker_sample_it._log_likelihood_type = log_likelihood_type
+        self._blocks = list()
+        shared_specs = dict()
+        if shared_memory is not None:
+            # Only the flattened data are needed after construction.
+            worker_sample_it.observable_data = None
+            worker_sample_it.conditions = None
+            worker_sample_it._data = None
+            worker_sample_it._conditions = [(overrides, None) for overrides, _
+                                            in sample_it._conditions]
+            for name in _shared_attributes:
+                array = getattr(sample_it, name)
+                if array is None:
+                    continue
+                block = shared_memory.SharedMemory(create=True,
+                                                   size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=float, buffer=block.buf)[:] = array
+                self._blocks.append(block)
+                shared_specs[name] = (block.name, array.shape)
+                setattr(worker_sample_it, name, None)
+        self._pool = Pool(processes=n_workers, initializer=_init_worker,
+                          initargs=(worker_sample_it, shared_specs,
+                                    _loglikelihood_methods[log_likelihood_type]))
+        self.n_workers = self._pool._processes
+        return
+
+    def __call__(self, position):
+        """Compute the loglikelihood of a single parameter vector.
+
+        Args:
+            position (numpy.array): The parameter vector.
+
+        Returns:
+            float: The natural logarithm of the likelihood estimate.
+        """
+        return self._pool.apply(_worker_loglikelihood, (position,))
+
+    def bounded_loglikelihood(self, position, ns_boundary):
+        """Compute the loglikelihood of a single parameter vector, stopping
+        early if it is below ns_boundary; see
+        NestedSampleIt.bounded_loglikelihood.
+        """
+        return self._pool.apply(_worker_bounded_loglikelihood,
+                                (position, ns_boundary))
+
+    def map(self, positions):
+        """Compute the loglikelihoods of a set of parameter vectors.
+        Each worker evaluates its share of the parameter vectors one by one.
+
+        Args:
+            positions (numpy.array): The (n, ndim) array of parameter vectors.
+
+        Returns:
+            numpy.array: The n loglikelihoods.
+        """
+        chunksize = max(1, len(positions) // (4*self.n_workers))
+        return np.array(self._pool.map(_worker_loglikelihood, list(positions),
+                                       chunksize=chunksize))
+
+    def batch_loglikelihood(self, positions):
+        """Compute the loglikelihoods of a set of parameter vectors.
+        The parameter vectors are split between the workers, which each
+        evaluate their chunk with a batched simulation; see
+        NestedSampleIt.batch_loglikelihood.
+
+        Args:
+            positions (numpy.array): The (n, ndim) array of parameter vectors.
+
+        Returns:
+            numpy.array: The n loglikelihoods.
+        """
+        positions = np.atleast_2d(positions)
+        n_chunks = min(self.n_workers, len(positions))
+        chunks = np.array_split(positions, n_chunks)
+        return np.concatenate(self._pool.map(_worker_batch_loglikelihood, chunks))
+
+    def close(self):
+        """Shut down the worker processes and free the shared memory."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = list()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        raise TypeError("EvaluationPool instances can't be pickled.")
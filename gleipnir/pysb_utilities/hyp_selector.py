@@ -1,10 +1,16 @@
 import numpy as np
 import pandas as pd
+from scipy.special import logsumexp
 import os
+import sys
+import gc
 import shutil
 import glob
+import hashlib
 import importlib
+import time
 import warnings
+from multiprocessing import Pool
 try:
     import HypBuilder
     from HypBuilder import ModelAssembler
@@ -13,7 +19,8 @@ except ImportError as err:
 import pysb
 
 
-from .nestedsample_it import NestedSampleIt
+from .nestedsample_it import NestedSampleIt, load_observations
+from .result_store import ResultStore, hash_config, hash_data, hash_file, summarize_run
 
 _hypb_dir = os.path.dirname(HypBuilder.__file__)
 library_file = os.path.join(_hypb_dir, "HB_library.txt")
@@ -26,6 +33,11 @@ class HypSelector(object):
         hb_library (str): Filename of the input HypBuilder library file.
             Defaults to None. If None then the default library from HypBuilder
             will be used; i.e., HypBuilder/HB_library.txt
+        cache_dir (str): A directory in which to cache the assembled models,
+            keyed on the contents of the model csv and library files, and the
+            generated reaction networks of the models. When the same csv and
+            library are used again the cached model files are reused instead
+            of rerunning HypBuilder. Defaults to None.
 
     Attributes:
         nested_samplers (list of :obj:): A list containing the Nested Sampler
@@ -40,10 +52,11 @@ class HypSelector(object):
             created by HypBuilder. Must call the load_models function
         model_csv
         hb_library
+        cache_dir
 
     """
 
-    def __init__(self, model_csv, hb_library=None):
+    def __init__(self, model_csv, hb_library=None, cache_dir=None):
         """Inits HypSelector."""
         #self.model_csv = os.path.abspath(model_csv)
         self.model_csv = model_csv
@@ -54,14 +67,11 @@ class HypSelector(object):
         self.nested_samplers = None
         self._nested_sample_its = None
         self.selection = None
+        self._summaries = dict()
         self._mod_basename = os.path.basename(self.model_csv).split('.')[0]
         self._hypb_outputdir = os.path.join('./output',self._mod_basename)
+        self.cache_dir = cache_dir
 
-        # Assemble the models
-        ModelAssembler(self.hb_library, self.model_csv)
-        # get the output models
-        self._model_files = glob.glob(os.path.join(self._hypb_outputdir,'model_*.py'))
-        print(self._model_files)
         # Now lets make a new models dir with an __init__.py, so we can easily
         # import all the models
         try:
@@ -71,17 +81,18 @@ class HypSelector(object):
         with open('hb_models/__init__.py','w') as init:
             pass
 
-        for model_file in self._model_files:
-            mbase = os.path.basename(model_file)
-            new_path = os.path.join('./hb_models', mbase)
-            os.rename(model_file, new_path)
+        assembly_dir = None
+        if cache_dir is not None:
+            assembly_dir = os.path.join(cache_dir, 'hypbuilder',
+                                        self._assembly_key())
+        if assembly_dir is not None and os.path.isdir(assembly_dir):
+            # Reuse the models assembled for the same csv and library.
+            for model_file in glob.glob(os.path.join(assembly_dir, 'model_*.py')):
+                shutil.copy(model_file, './hb_models')
+        else:
+            self._assemble_models(assembly_dir)
         self._model_files = glob.glob(os.path.join('hb_models','model_*.py'))
         print(self._model_files)
-        # Remove the old outputs dir
-        try:
-            shutil.rmtree('./output')
-        except OSError:
-            pass
         # Load the models
         self.models = None
         # self.load_models()
@@ -91,6 +102,48 @@ class HypSelector(object):
         #         self.models.append(model)
         return
 
+    def _assembly_key(self):
+        """Hash of the model csv and library files."""
+        sha = hashlib.sha1()
+        for filename in (self.model_csv, self.hb_library):
+            with open(filename, 'rb') as f:
+                sha.update(f.read())
+        return sha.hexdigest()
+
+    def _assemble_models(self, assembly_dir=None):
+        """Run HypBuilder and move the models it creates into hb_models.
+        If assembly_dir is given, the model files are also copied into it.
+        """
+        # Assemble the models
+        ModelAssembler(self.hb_library, self.model_csv)
+        # get the output models
+        model_files = glob.glob(os.path.join(self._hypb_outputdir,'model_*.py'))
+        print(model_files)
+        if assembly_dir is not None:
+            # Fill a temporary dir, then rename it so that the cache never
+            # holds a partial set of models.
+            tmp_dir = "{}.{}.tmp".format(assembly_dir, os.getpid())
+            try:
+                os.makedirs(tmp_dir)
+            except OSError:
+                pass
+            for model_file in model_files:
+                shutil.copy(model_file, tmp_dir)
+            try:
+                os.rename(tmp_dir, assembly_dir)
+            except OSError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        for model_file in model_files:
+            mbase = os.path.basename(model_file)
+            new_path = os.path.join('./hb_models', mbase)
+            os.rename(model_file, new_path)
+        # Remove the old outputs dir
+        try:
+            shutil.rmtree('./output')
+        except OSError:
+            pass
+        return
+
     def load_models(self):
         """Loads instances of the models (pysb.Model) created by HypBuilder.
 
@@ -100,9 +153,27 @@ class HypSelector(object):
         # Load the models
         self.models = list()
         for i in range(len(self._model_files)):
-                model_module = importlib.import_module("hb_models.model_{}".format(i))
-                model = getattr(model_module, 'model')
-                self.models.append(model)
+                self.models.append(self._load_model(i))
+        return
+
+    def _load_model(self, i):
+        """Import the i-th model."""
+        model_module = importlib.import_module("hb_models.model_{}".format(i))
+        return getattr(model_module, 'model')
+
+    def _release_model(self, i):
+        """Drop the references to the i-th model's module so that it (and its
+        model) can be garbage collected."""
+        module_name = "model_{}".format(i)
+        module = sys.modules.pop("hb_models." + module_name, None)
+        package = sys.modules.get('hb_models')
+        if (package is not None) and hasattr(package, module_name):
+            delattr(package, module_name)
+        # PySB's SelfExporter keeps the last model that was defined.
+        if (module is not None) and (pysb.SelfExporter.target_module is module):
+            pysb.SelfExporter.default_model = None
+            pysb.SelfExporter.target_module = None
+            pysb.SelfExporter.target_globals = None
         return
 
     def number_of_models(self):
@@ -175,77 +246,372 @@ class HypSelector(object):
         Returns:
             None
         """
-        if solver_kwargs is None:
-            solver_kwargs = dict()
-        if ns_kwargs is None:
-            ns_kwargs = dict()
+        self._set_ns_settings(timespan, observable_data, solver, solver_kwargs,
+                              ns_version, ns_population_size, ns_kwargs,
+                              log_likelihood_type)
         print(ns_version)
         if self.models is None:
             self.load_models()
-        if ns_version == 'multinest':
-            if 'sampling_efficiency' not in list(ns_kwargs.keys()):
-                ns_kwargs['sampling_efficiency'] = 0.3
         ns_sample_its = list()
         ns_samplers = list()
         for i,model in enumerate(self.models):
-            sample_it = NestedSampleIt(model, observable_data, timespan,
-                                       solver=solver,
-                                       solver_kwargs=solver_kwargs)
-            ns_sampler = sample_it(ns_version,
-                                   ns_population_size=ns_population_size,
-                                   ns_kwargs=ns_kwargs,
-                                   log_likelihood_type=log_likelihood_type)
-            # Guard patch for multinest and polychord file outputs, so
-            # each model run has its own file names.
-            if ns_version == 'multinest':
-                ns_sampler._file_root="multinest_run_model_{}_".format(i)
-                # print(ns_sampler._file_root)
-            elif ns_version == 'polychord':
-                ns_sampler._settings.file_root="polychord_run_model_{}_".format(i)
-            #elif ns_sampler:
-            # if ns_version == 'multinest':
-            #     print(ns_sampler._file_root)
-            # quit()
+            sample_it, ns_sampler = self._gen_nested_sampler(i, model)
             ns_sample_its.append(sample_it)
             ns_samplers.append(ns_sampler)
         self._nested_sample_its = ns_sample_its
         self.nested_samplers = ns_samplers
         return
 
-    def run_nested_sampling(self):
+    def _set_ns_settings(self, timespan, observable_data, solver, solver_kwargs,
+                         ns_version, ns_population_size, ns_kwargs,
+                         log_likelihood_type):
+        """Record the settings used to build the Nested Samplers."""
+        if solver_kwargs is None:
+            solver_kwargs = dict()
+        if ns_kwargs is None:
+            ns_kwargs = dict()
+        if ns_version == 'multinest':
+            if 'sampling_efficiency' not in list(ns_kwargs.keys()):
+                ns_kwargs['sampling_efficiency'] = 0.3
+        self._timespan = timespan
+        self._observable_data = observable_data
+        self._solver = solver
+        # These settings are also used to key any stored results.
+        self._ns_config = {'ns_version': ns_version,
+                           'ns_population_size': ns_population_size,
+                           'ns_kwargs': ns_kwargs,
+                           'log_likelihood_type': log_likelihood_type,
+                           'solver': getattr(solver, '__name__', repr(solver)),
+                           'solver_kwargs': solver_kwargs}
+        return
+
+    def _gen_nested_sampler(self, i, model):
+        """Build the NestedSampleIt and Nested Sampler for the i-th model."""
+        config = self._ns_config
+        ns_version = config['ns_version']
+        sample_it = NestedSampleIt(model, self._observable_data, self._timespan,
+                                   solver=self._solver,
+                                   solver_kwargs=config['solver_kwargs'],
+                                   cache_dir=self.cache_dir)
+        ns_sampler = sample_it(ns_version,
+                               ns_population_size=config['ns_population_size'],
+                               ns_kwargs=config['ns_kwargs'],
+                               log_likelihood_type=config['log_likelihood_type'])
+        # Guard patch for multinest and polychord file outputs, so
+        # each model run has its own file names.
+        if ns_version == 'multinest':
+            ns_sampler._file_root="multinest_run_model_{}_".format(i)
+            # print(ns_sampler._file_root)
+        elif ns_version == 'polychord':
+            ns_sampler._settings.file_root="polychord_run_model_{}_".format(i)
+        return sample_it, ns_sampler
+
+    def run_nested_sampling(self, n_workers=1, run_dir=None, store=None,
+                            checkpoint_interval=None):
         """Run Nested Sampling on each model.
 
+        Args:
+            n_workers (int): The number of worker processes to use. If
+                greater than 1, the models are run in parallel on a process
+                pool, with each worker building its own solver instances from
+                the models it receives. Results are collected as they finish
+                and the selection table is updated as each one comes in.
+                Defaults to 1.
+            run_dir (str): A directory in which each model run gets its own
+                scratch sub-directory (i.e., run_dir/model_i) for any output
+                files written by the Nested Sampler. Defaults to None. If None,
+                serial runs are done in the current working directory and
+                parallel runs use './hypselector_runs'.
+            store (:obj:gleipnir.pysb_utilities.result_store.ResultStore or str):
+                A ResultStore (or the directory of one) in which to keep the
+                results of each model's run. Models that already have
+                complete results in the store for the same data and Nested
+                Sampling settings are skipped, and models whose runs were
+                interrupted are resumed. When given, each model run is done
+                in its own directory inside the store. Defaults to None.
+            checkpoint_interval (int): If a store is given, the number of
+                iterations between checkpoints of the built-in Nested
+                Sampler, from which interrupted runs can be resumed.
+                Defaults to None. If None, runs aren't checkpointed; backends
+                with their own resume support (e.g., MultiNest) are still
+                resumed from their output files.
+
         Returns:
             pandas.DataFrame: The sorted models with their log_evidence and
                 log_evidence_error estimates. The DataFrame is sorted in descending
                 order by the log_evidence.
 
         """
-        # nprocs = 1
         if self.nested_samplers is None:
             warnings.warn("Unable to run. Must call the 'gen_nested_samplers' function first!")
             return
-        # ns_samplers = self.nested_samplers
-        # if nprocs > 1:
-        #
-        #     p = Pool(nprocs)
-        #     ns_runs = p.map(_run_ns, ns_samplers)
-        #     p.close()
-        #     self.nested_samplers = ns_runs
-        # else:
-        for i in range(len(self.nested_samplers)):
-            self.nested_samplers[i].run()
-        frame = list()
+        self.selection = None
+        self._summaries = dict()
+        self._run_batch(list(enumerate(self.nested_samplers)), n_workers,
+                        run_dir, store, checkpoint_interval)
+        return self.selection.reset_index(drop=True)
+
+    def run_nested_sampling_streaming(self, timespan, observable_data,
+                                      batch_size=10,
+                                      solver=pysb.simulator.ScipyOdeSimulator,
+                                      solver_kwargs=None, ns_version='built-in',
+                                      ns_population_size=1000, ns_kwargs=None,
+                                      log_likelihood_type='snlpdf',
+                                      n_workers=1, run_dir=None, store=None,
+                                      checkpoint_interval=None):
+        """Build, run, and summarize the models one batch at a time.
+        Rather than loading every model and generating all of the Nested
+        Samplers up front (i.e., load_models and gen_nested_samplers followed
+        by run_nested_sampling), the models are imported, sampled, summarized
+        and then released in batches, so the peak memory use is set by the
+        batch size instead of the total number of models. The summaries of
+        each model run are kept, so the selection, bayes_factors, summary, and
+        information criteria functions can be used afterwards, but the
+        nested_samplers and models attributes are not retained.
+
+        Args:
+            timespan, observable_data, solver, solver_kwargs, ns_version,
+            ns_population_size, ns_kwargs, log_likelihood_type: See
+                gen_nested_samplers.
+            batch_size (int): The number of models to load and run at a time.
+                Defaults to 10.
+            n_workers, run_dir, store, checkpoint_interval: See
+                run_nested_sampling.
+
+        Returns:
+            pandas.DataFrame: The sorted models with their log_evidence and
+                log_evidence_error estimates. The DataFrame is sorted in descending
+                order by the log_evidence.
+
+        """
+        self._set_ns_settings(timespan, observable_data, solver, solver_kwargs,
+                              ns_version, ns_population_size, ns_kwargs,
+                              log_likelihood_type)
+        self.nested_samplers = None
+        self._nested_sample_its = None
+        self.selection = None
+        self._summaries = dict()
+        n_models = self.number_of_models()
+        for first in range(0, n_models, batch_size):
+            batch = list()
+            for i in range(first, min(first+batch_size, n_models)):
+                model = self._load_model(i)
+                batch.append((i, self._gen_nested_sampler(i, model)[1]))
+            self._run_batch(batch, n_workers, run_dir, store, checkpoint_interval)
+            del batch, model
+            for i in range(first, min(first+batch_size, n_models)):
+                self._release_model(i)
+            gc.collect()
+        return self.selection.reset_index(drop=True)
+
+    def _run_batch(self, batch, n_workers, run_dir, store, checkpoint_interval):
+        """Run Nested Sampling on a batch of models.
+
+        Args:
+            batch (list of tuple): The (model index, nested sampler) pairs to
+                run.
+            n_workers, run_dir, store, checkpoint_interval: See
+                run_nested_sampling.
+
+        Returns:
+            None
+        """
+        if (n_workers > 1) and (run_dir is None):
+            run_dir = './hypselector_runs'
+        if (store is not None) and (not isinstance(store, ResultStore)):
+            store = ResultStore(store)
+        if store is not None:
+            data_hash = hash_data(self._observable_data, self._timespan)
+            config_hash = hash_config(self._ns_config)
+        n_data = self._n_data()
+        jobs = list()
+        keys = dict()
+        for i,ns in batch:
+            if run_dir is None:
+                model_dir = None
+            else:
+                model_dir = os.path.abspath(os.path.join(run_dir, "model_{}".format(i)))
+            checkpoint = None
+            if store is not None:
+                model_hash = self._model_hash(i)
+                key = store.run_key(model_hash, data_hash, config_hash)
+                record = store.get(key)
+                if (record is not None) and (record['status'] == 'complete'):
+                    self._update_selection(i, record)
+                    continue
+                if record is not None:
+                    resumed = store.load_checkpoint(key)
+                    if resumed is not None:
+                        ns = resumed
+                else:
+                    store.mark_running(key, "model_{}".format(i), model_hash,
+                                       data_hash, config_hash)
+                model_dir = store.run_dir(key)
+                checkpoint = (store, key, checkpoint_interval)
+                keys[i] = key
+            jobs.append((i, ns, model_dir, n_data, checkpoint))
+        if n_workers > 1:
+            pool = Pool(n_workers, initializer=_init_worker)
+            try:
+                for i, ns, summary in pool.imap_unordered(_run_ns_in_dir, jobs):
+                    self._record_run(i, ns, summary, store, keys.get(i))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for job in jobs:
+                i, ns, summary = _run_ns_in_dir(job)
+                self._record_run(i, ns, summary, store, keys.get(i))
+        return
+
+    def _record_run(self, i, ns, summary, store, key):
+        """Update the selection and the store with a finished model run."""
+        if self.nested_samplers is not None:
+            self.nested_samplers[i] = ns
+        self._update_selection(i, summary)
+        if store is not None:
+            dead_points = getattr(ns, 'dead_points', None)
+            if not isinstance(dead_points, pd.DataFrame):
+                dead_points = None
+            store.record(key, summary, dead_points=dead_points)
+        return
+
+    def _model_hash(self, i):
+        """Hash of the i-th model, used to key stored results."""
+        return hash_file(os.path.join('hb_models', "model_{}.py".format(i)))
+
+    def run_nested_sampling_racing(self, round_iterations=100,
+                                   bayes_factor_threshold=100.):
+        """Run Nested Sampling on each model as a race between the models.
+        All of the models' Nested Sampling runs are advanced together in
+        rounds. After each round, bounds on each model's final log evidence
+        are computed, with the upper bound given by
+            ln(Z_current + X_remaining*L_max),
+        where Z_current is the evidence accumulated so far, X_remaining is the
+        remaining prior mass, and L_max is the largest likelihood among the
+        current live points. Any model whose upper bound falls more than
+        ln(bayes_factor_threshold) below the current leader's lower bound is
+        dropped from the race and its run is stopped early. Racing requires
+        Nested Samplers that can be advanced in steps, i.e. ns_version='built-in'.
+
+        Args:
+            round_iterations (int): The number of Nested Sampling iterations
+                each model is advanced by per round. Defaults to 100.
+            bayes_factor_threshold (float): The Bayes factor relative to the
+                current leader beyond which a model is dropped from the race.
+                Defaults to 100.
+
+        Returns:
+            pandas.DataFrame: The sorted models with their log_evidence and
+                log_evidence_error estimates and whether or not the model was
+                stopped early (raced_out). The log_evidence values of models
+                that were raced out come from their truncated runs. The
+                DataFrame is sorted in descending order by the log_evidence.
+
+        """
+        if self.nested_samplers is None:
+            warnings.warn("Unable to run. Must call the 'gen_nested_samplers' function first!")
+            return
+        if not all(hasattr(ns, 'advance') for ns in self.nested_samplers):
+            warnings.warn("Unable to race. The Nested Samplers must support stepwise runs (i.e., ns_version='built-in').")
+            return
+        n_models = len(self.nested_samplers)
+        log_threshold = np.log(bayes_factor_threshold)
+        active = list(range(n_models))
+        raced_out = np.zeros(n_models, dtype=bool)
+        lower = np.full(n_models, -np.inf)
+        upper = np.full(n_models, np.inf)
+        while len(active) > 0:
+            for i in list(active):
+                ns = self.nested_samplers[i]
+                if ns.advance(round_iterations):
+                    ns.finalize()
+                    active.remove(i)
+                lower[i], upper[i] = ns.log_evidence_bounds()
+            leader = lower.max()
+            for i in list(active):
+                if upper[i] < (leader - log_threshold):
+                    self.nested_samplers[i].finalize()
+                    raced_out[i] = True
+                    active.remove(i)
+        self.selection = None
+        self._summaries = dict()
+        n_data = self._n_data()
         for i,ns in enumerate(self.nested_samplers):
-            data_d = dict()
-            data_d['model'] = "model_{}".format(i)
-            data_d['log_evidence'] = ns.log_evidence
-            data_d['log_evidence_error'] = ns.log_evidence_error
-            frame.append(data_d)
-        selection = pd.DataFrame(frame)
+            self._update_selection(i, summarize_run(ns, n_data))
+        self.selection['raced_out'] = raced_out[self.selection.index]
+        return self.selection.reset_index(drop=True)
+
+    def _update_selection(self, i, summary):
+        """Add a finished model run to the sorted selection DataFrame."""
+        self._summaries[i] = summary
+        data_d = dict()
+        data_d['model'] = "model_{}".format(i)
+        data_d['log_evidence'] = summary['log_evidence']
+        data_d['log_evidence_error'] = summary['log_evidence_error']
+        row = pd.DataFrame([data_d], index=[i])
+        if self.selection is None:
+            selection = row
+        else:
+            selection = pd.concat([self.selection, row])
         selection.sort_values(by=['log_evidence'], ascending=False, inplace=True)
         self.selection = selection
-        return selection.reset_index(drop=True)
+        return
+
+    def _summary_arrays(self):
+        """Gather the cached per-model run summaries into arrays.
+        Models without a run summary (e.g., runs that haven't finished) are
+        left out.
+
+        Returns:
+            dict of numpy.ndarray: The model names, log_evidence,
+                log_evidence_error, max_loglikelihood, n_params, n_data, and
+                dic values, in model order.
+        """
+        n_models = self.number_of_models()
+        indices = [i for i in range(n_models) if i in self._summaries]
+        if len(indices) < n_models:
+            missing = ["model_{}".format(i) for i in range(n_models) if i not in self._summaries]
+            warnings.warn("No run summaries for models {}; they are left "
+                          "out.".format(", ".join(missing)))
+        summaries = [self._summaries[i] for i in indices]
+        arrays = dict()
+        arrays['model'] = np.array(["model_{}".format(i) for i in indices])
+        for name in ['log_evidence', 'log_evidence_error', 'max_loglikelihood',
+                     'n_params', 'n_data', 'dic']:
+            values = [summary.get(name) for summary in summaries]
+            arrays[name] = np.array([np.nan if value is None else value for value in values], dtype=float)
+        return arrays
+
+    def log_bayes_factors(self, with_errors=False):
+        """Compute the natural logarithm of the Bayes factors of models.
+        The log Bayes factors are the differences of the log evidence
+        estimates, ln(Z_i) - ln(Z_j), so unlike the Bayes factors themselves
+        they don't overflow for large evidence gaps.
+
+        Args:
+            with_errors (bool): Also return the errors of the log Bayes
+                factors, propagated from the log evidence errors as
+                sqrt(err_i**2 + err_j**2). Defaults to False.
+
+        Returns:
+            pandas.DataFrame or tuple of (pandas.DataFrame, pandas.DataFrame):
+                The DataFrame of log Bayes factors of each model combination,
+                where element [j, i] is ln(Z_i) - ln(Z_j), and (if with_errors)
+                the DataFrame of their errors.
+
+        """
+        arrays = self._summary_arrays()
+        log_z = arrays['log_evidence']
+        mod_list = arrays['model']
+        log_bf = pd.DataFrame(log_z[np.newaxis,:] - log_z[:,np.newaxis],
+                              index=mod_list, columns=mod_list)
+        if not with_errors:
+            return log_bf
+        var = arrays['log_evidence_error']**2
+        log_bf_err = pd.DataFrame(np.sqrt(var[np.newaxis,:] + var[:,np.newaxis]),
+                                  index=mod_list, columns=mod_list)
+        return log_bf, log_bf_err
 
     def bayes_factors(self):
         """Compute the Bayes factors of models using evidence ratios.
@@ -255,62 +621,141 @@ class HypSelector(object):
                 factors of each model combination.
 
         """
-        n_models = self.number_of_models()
-        mod_list = []
-        for i in range(n_models):
-            mod_list.append("model_{}".format(i))
-        bayes_factors = np.ones((n_models,n_models))
-        for i,nsi in enumerate(self.nested_samplers):
-            loge_i = nsi.log_evidence
-            for j,nsj in enumerate(self.nested_samplers):
-                loge_j = nsj.log_evidence
-                if i != j:
-                    bf = np.exp(loge_i - loge_j)
-                    bayes_factors[j,i] = bf
-        return pd.DataFrame(bayes_factors, index=mod_list,
-                                columns=mod_list)
+        with np.errstate(over='ignore'):
+            return np.exp(self.log_bayes_factors())
+
+    def model_probabilities(self):
+        """Compute the posterior probabilities of the models.
+        Assumes equal prior probabilities for all the models, so that
+            p_i = Z_i / sum_k(Z_k).
+        The normalization is done in log space with logsumexp. The errors are
+        propagated from the log evidence errors, for which
+            var(ln(p_i)) = err_i**2 (1 - 2 p_i) + sum_k(p_k**2 err_k**2).
+
+        Returns:
+            pandas.DataFrame: The models with their probabilities, log
+                probabilities, and probability errors, sorted in descending
+                order by probability.
+
+        """
+        arrays = self._summary_arrays()
+        frame = pd.DataFrame({'model': arrays['model']})
+        frame = pd.concat([frame, self._probabilities(arrays)], axis=1)
+        frame.sort_values(by=['probability'], ascending=False, inplace=True)
+        return frame.reset_index(drop=True)
+
+    @staticmethod
+    def _probabilities(arrays):
+        log_z = arrays['log_evidence']
+        log_p = log_z - logsumexp(log_z)
+        p = np.exp(log_p)
+        var = arrays['log_evidence_error']**2
+        log_p_var = var*(1. - 2.*p) + np.sum(p**2 * var)
+        return pd.DataFrame({'probability': p,
+                             'log_probability': log_p,
+                             'probability_error': p*np.sqrt(log_p_var)})
+
+    def _information_criteria(self, arrays):
+        ml = arrays['max_loglikelihood']
+        k = arrays['n_params']
+        aic = 2.*k - 2.*ml
+        bic = np.log(arrays['n_data'])*k - 2.*ml
+        return pd.DataFrame({'AIC': aic, 'BIC': bic, 'DIC': arrays['dic']})
+
+    def summary(self):
+        """Summarize the model selection results in a single pass.
+        Computes the posterior model probabilities (see model_probabilities)
+        from the cached per-model run summaries, so no Nested Sampler
+        analysis or likelihood calls are needed. The information criteria
+        are given by the akaike_ic, bayesian_ic, and deviance_ic functions.
+
+        Returns:
+            pandas.DataFrame: The models with their log_evidence,
+                log_evidence_error, probability, log_probability,
+                probability_error, and max_loglikelihood values, sorted in
+                descending order by the log_evidence.
+
+        """
+        arrays = self._summary_arrays()
+        frame = pd.DataFrame({'model': arrays['model'],
+                              'log_evidence': arrays['log_evidence'],
+                              'log_evidence_error': arrays['log_evidence_error']})
+        frame = pd.concat([frame, self._probabilities(arrays)], axis=1)
+        frame['max_loglikelihood'] = arrays['max_loglikelihood']
+        frame.sort_values(by=['log_evidence'], ascending=False, inplace=True)
+        return frame.reset_index(drop=True)
+
+    def _ic_frame(self, column):
+        """Sorted DataFrame of an information criterion from the run summaries."""
+        arrays = self._summary_arrays()
+        ics = self._information_criteria(arrays)
+        ic_frame = pd.DataFrame({'model': arrays['model'], column: ics[column]})
+        ic_frame.sort_values(by=[column], ascending=True, inplace=True)
+        return ic_frame.reset_index(drop=True)
 
     def akaike_ic(self):
-        frame = list()
-        for i,ns in enumerate(self.nested_samplers):
-            data_d = dict()
-            data_d['model'] = "model_{}".format(i)
-            data_d['AIC'] = ns.akaike_ic()
-            frame.append(data_d)
-        aic_frame = pd.DataFrame(frame)
-        aic_frame.sort_values(by=['AIC'], ascending=True, inplace=True)
-        return aic_frame.reset_index(drop=True)
+        return self._ic_frame('AIC')
 
     def _n_data(self):
         n_dat = 0
-        obs_dat = self._nested_sample_its[0].observable_data
+        obs_dat = self._observable_data
         for item in obs_dat:
-            n_dat += len(obs_dat[item][0])
+            # The data can be the file names of .npy arrays.
+            n_dat += len(load_observations(obs_dat[item][0]))
         return n_dat
 
     def bayesian_ic(self):
-        n_data = self._n_data()
-        frame = list()
-        for i,ns in enumerate(self.nested_samplers):
-            data_d = dict()
-            data_d['model'] = "model_{}".format(i)
-            data_d['BIC'] = ns.bayesian_ic(n_data)
-            frame.append(data_d)
-        aic_frame = pd.DataFrame(frame)
-        aic_frame.sort_values(by=['BIC'], ascending=True, inplace=True)
-        return aic_frame.reset_index(drop=True)
+        return self._ic_frame('BIC')
 
     def deviance_ic(self):
-        frame = list()
-        for i,ns in enumerate(self.nested_samplers):
-            data_d = dict()
-            data_d['model'] = "model_{}".format(i)
-            data_d['DIC'] = ns.deviance_ic()
-            frame.append(data_d)
-        aic_frame = pd.DataFrame(frame)
-        aic_frame.sort_values(by=['DIC'], ascending=True, inplace=True)
-        return aic_frame.reset_index(drop=True)
+        return self._ic_frame('DIC')
 
 def _run_ns(nested_sampler):
     nested_sampler.run()
     return nested_sampler
+
+def _init_worker():
+    # Forked workers inherit the parent's random state, so reseed each one
+    # to keep the model runs independent.
+    np.random.seed()
+    return
+
+def _run_ns_in_dir(job):
+    """Run a Nested Sampler inside its own scratch directory.
+
+    Args:
+        job (tuple): Tuple of (model index, nested sampler, directory,
+            number of data points, checkpoint). If the directory is None the
+            run is done in the current working directory. The checkpoint is
+            either None or a tuple of (ResultStore, key, checkpoint interval).
+
+    Returns:
+        tuple of (int, :obj:, dict): The model index, the nested sampler after
+            the run, and the summary of the run.
+    """
+    i, nested_sampler, model_dir, n_data, checkpoint = job
+    cwd = os.getcwd()
+    if model_dir is not None:
+        try:
+            os.makedirs(model_dir)
+        except OSError:
+            pass
+        # MultiNest output files are re-read by the analysis functions after the
+        # run, so its file root has to be valid from any working directory.
+        if hasattr(nested_sampler, 'multinest_file_root'):
+            mn_root = os.path.basename(nested_sampler.multinest_file_root)
+            nested_sampler.multinest_file_root = os.path.join(model_dir, mn_root)
+        os.chdir(model_dir)
+    start_time = time.time()
+    try:
+        if checkpoint is None:
+            _run_ns(nested_sampler)
+        else:
+            store, key, checkpoint_interval = checkpoint
+            store.run_checkpointed(key, nested_sampler, checkpoint_interval)
+        run_time = time.time() - start_time
+        summary = summarize_run(nested_sampler, n_data)
+    finally:
+        os.chdir(cwd)
+    summary['run_time'] = run_time
+    return i, nested_sampler, summary
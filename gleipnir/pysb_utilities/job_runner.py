@@ -0,0 +1,329 @@
+"""Run batches of PySB model calibrations from configuration files.
+
+This module backs the 'python -m gleipnir run' command. A configuration file
+(JSON, or YAML if PyYAML is installed) describes one Nested Sampling job, or
+a batch of them under a 'jobs' list, in which case any other top-level
+settings are used as the defaults of every job. For example:
+
+    output_dir: calibrations
+    n_workers: 4
+    checkpoint_interval: 100
+    population_size: 500
+    stopping: {n_iterations: 5000}
+    jobs:
+      - name: model_a
+        model: models/model_a.py
+        data: data/experiment.csv
+      - name: model_b
+        model: models/model_b.py
+        data: data/experiment.csv
+        priors:
+          kf: {dist: norm, loc: -3.0, scale: 1.0}
+
+The job settings are:
+    name (str): The name of the job. Defaults to the model's name.
+    model (str): A Python file that defines a PySB model named 'model', or
+        the importable module name of one.
+    data (str): A CSV file with a 'time' column and one column of data per
+        model observable (or species name, e.g. '__s0'). The standard
+        deviations of an observable's data can be given in a
+        '<observable>_sd' column. Missing (NaN) values are skipped.
+    timespan (list or dict): The simulation timespan; either the list of
+        time points or the {start, stop, num} arguments of numpy.linspace.
+        Every data time point has to be in it. Defaults to the data time
+        points (with time zero added).
+    sample (list of str): The names of the model parameters to sample.
+        Defaults to the kinetic rate parameters, or the parameters in priors
+        if it is given.
+    priors (dict): Priors keyed to the parameter names, either as 'norm' or
+        'uniform' (the NestIt default priors around the parameter's value) or
+        as a dict of the log10-scale 'dist' ('norm' or 'uniform'), 'loc', and
+        'scale'.
+    backend (str): The Nested Sampling implementation; see the ns_version of
+        NestedSampleIt. Defaults to 'built-in'.
+    population_size (int): The size of the active population. Defaults to 1000.
+    stopping (dict): The stopping rule of the built-in Nested Sampler;
+        either {n_iterations: N} or {remaining_prior_mass: cutoff}. Defaults
+        to 10*population_size iterations.
+    log_likelihood (str): The loglikelihood estimator ('snlpdf', 'mse', or
+        'sse'). Defaults to 'snlpdf'.
+    solver_kwargs, sample_it_kwargs, ns_kwargs (dict): Additional keyword
+        arguments for the solver, the NestedSampleIt, and the Nested Sampler.
+    seed (int): Seed for numpy's random number generator.
+
+and the batch settings are:
+    output_dir (str): The directory for the ResultStore of the results.
+        Defaults to 'gleipnir_runs'.
+    n_workers (int): The number of jobs to run at once. Defaults to 1.
+    checkpoint_interval (int): The number of iterations between checkpoints
+        of the built-in Nested Sampler. Defaults to None.
+
+Results are kept in a ResultStore in the output directory, keyed on the model
+file, data file, and job settings. Re-running a configuration skips the jobs
+that are complete and resumes interrupted ones from their checkpoints.
+
+"""
+
+import copy
+import importlib
+import importlib.util
+import json
+import os
+import os.path
+import time
+import traceback
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm, uniform
+
+from .nestedsample_it import NestedSampleIt, NestIt
+from .result_store import ResultStore, hash_config, hash_file, summarize_run
+
+_batch_settings = ['output_dir', 'n_workers', 'checkpoint_interval', 'jobs']
+
+def load_config(config_file):
+    """Load a job configuration file.
+
+    Args:
+        config_file (str): A JSON file, or a YAML file (.yaml or .yml).
+
+    Returns:
+        dict: The configuration.
+    """
+    with open(config_file, 'r') as f:
+        if os.path.splitext(config_file)[1] in ['.yaml', '.yml']:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is needed to read the YAML "
+                                  "configuration file {}.".format(config_file))
+            return yaml.safe_load(f)
+        return json.load(f)
+
+def expand_jobs(config, base_dir='.'):
+    """Get the list of job settings of a configuration.
+    Relative model and data paths are resolved against base_dir.
+    """
+    defaults = {key: value for key, value in config.items()
+                if key not in _batch_settings}
+    jobs = list()
+    for job_config in config.get('jobs', [dict()]):
+        job = copy.deepcopy(defaults)
+        job.update(job_config)
+        for key in ['model', 'data']:
+            if key not in job:
+                raise ValueError("Each job needs a '{}' setting.".format(key))
+        if os.path.exists(os.path.join(base_dir, job['model'])):
+            job['model'] = os.path.abspath(os.path.join(base_dir, job['model']))
+        job['data'] = os.path.abspath(os.path.join(base_dir, job['data']))
+        if 'name' not in job:
+            job['name'] = os.path.splitext(os.path.basename(job['model']))[0]
+        jobs.append(job)
+    names = [job['name'] for job in jobs]
+    if len(set(names)) < len(names):
+        raise ValueError("The job names have to be unique.")
+    return jobs
+
+def _model_file(model):
+    if os.path.exists(model):
+        return model
+    return importlib.util.find_spec(model).origin
+
+def load_model(model):
+    """Import the PySB model named 'model' from a Python file or module."""
+    if os.path.exists(model):
+        module_name = os.path.splitext(os.path.basename(model))[0]
+        spec = importlib.util.spec_from_file_location(module_name, model)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(model)
+    return module.model
+
+def load_data(data_file, timespan=None):
+    """Read a CSV data file into NestedSampleIt observable_data.
+
+    Args:
+        data_file (str): The CSV file; see the module docstring.
+        timespan (list or dict): See the module docstring. Defaults to None.
+
+    Returns:
+        tuple of (numpy.array, dict): The timespan and the observable_data.
+    """
+    frame = pd.read_csv(data_file)
+    times = frame['time'].values
+    if timespan is None:
+        timespan = np.unique(np.concatenate([[0.], times]))
+    elif isinstance(timespan, dict):
+        timespan = np.linspace(**timespan)
+    timespan = np.asarray(timespan, dtype=float)
+    time_idx = np.argmin(np.abs(timespan[:, np.newaxis] - times), axis=0)
+    if not np.allclose(timespan[time_idx], times):
+        raise ValueError("The data time points of {} aren't all in the "
+                         "timespan.".format(data_file))
+    observable_data = dict()
+    for column in frame.columns:
+        if (column == 'time') or column.endswith('_sd'):
+            continue
+        observed = frame[column].notna().values
+        sigma = None
+        if column + '_sd' in frame.columns:
+            sigma = frame[column + '_sd'].values[observed]
+        observable_data[column] = (frame[column].values[observed], sigma,
+                                   list(time_idx[observed]))
+    return timespan, observable_data
+
+def _make_prior(prior, value):
+    if isinstance(prior, dict):
+        dist = {'norm': norm, 'uniform': uniform}[prior.get('dist', 'norm')]
+        return dist(loc=prior['loc'], scale=prior['scale'])
+    if prior == 'norm':
+        return norm(loc=np.log10(value), scale=2.0)
+    return uniform(loc=np.log10(value)-2.0, scale=4.0)
+
+def build_nested_sampler(job):
+    """Build the Nested Sampler for a job.
+
+    Returns:
+        tuple of (:obj:, int): The Nested Sampler and the number of data
+            points.
+    """
+    model = load_model(job['model'])
+    timespan, observable_data = load_data(job['data'], job.get('timespan'))
+    nest_it = None
+    priors = job.get('priors', dict())
+    sample = job.get('sample', list(priors.keys()))
+    if len(sample) > 0:
+        nest_it = NestIt()
+        for name in sample:
+            parameter = model.parameters[name]
+            nest_it(parameter, _make_prior(priors.get(name, 'uniform'),
+                                           parameter.value))
+    sample_it = NestedSampleIt(model, observable_data, timespan,
+                               solver_kwargs=job.get('solver_kwargs'),
+                               nest_it=nest_it,
+                               **job.get('sample_it_kwargs', dict()))
+    population_size = job.get('population_size', 1000)
+    nested_sampler = sample_it(ns_version=job.get('backend', 'built-in'),
+                               ns_population_size=population_size,
+                               ns_kwargs=job.get('ns_kwargs'),
+                               log_likelihood_type=job.get('log_likelihood', 'snlpdf'))
+    stopping = job.get('stopping')
+    if (stopping is not None) and hasattr(nested_sampler, 'stopping_criterion'):
+        from gleipnir.nestedsampling.stopping_criterion import NumberOfIterations, RemainingPriorMass
+        if 'n_iterations' in stopping:
+            nested_sampler.stopping_criterion = NumberOfIterations(stopping['n_iterations'])
+        else:
+            nested_sampler.stopping_criterion = RemainingPriorMass(stopping['remaining_prior_mass'])
+    return nested_sampler, _count_data(observable_data)
+
+def _count_data(observable_data):
+    return int(sum([len(data[0]) for data in observable_data.values()]))
+
+def job_hashes(job):
+    """The model, data, and configuration hashes of a job."""
+    settings = {key: value for key, value in job.items()
+                if key not in ['name', 'model', 'data']}
+    return (hash_file(_model_file(job['model'])), hash_file(job['data']),
+            hash_config(settings))
+
+def _run_job(args):
+    """Run (or resume) a job and record its results in the store.
+
+    Returns:
+        tuple of (str, dict or str): The job name and either the run summary
+            or the traceback of the error that stopped the job.
+    """
+    job, store_path, key, checkpoint_interval = args
+    np.random.seed(job.get('seed'))
+    store = ResultStore(store_path)
+    cwd = os.getcwd()
+    try:
+        nested_sampler = store.load_checkpoint(key)
+        if nested_sampler is None:
+            nested_sampler, n_data = build_nested_sampler(job)
+        else:
+            n_data = _count_data(load_data(job['data'], job.get('timespan'))[1])
+        run_dir = store.run_dir(key)
+        try:
+            os.makedirs(run_dir)
+        except OSError:
+            pass
+        # Backend output files (e.g., MultiNest's) go in the job's directory.
+        os.chdir(run_dir)
+        start_time = time.time()
+        store.run_checkpointed(key, nested_sampler, checkpoint_interval)
+        summary = summarize_run(nested_sampler, n_data)
+        summary['run_time'] = time.time() - start_time
+        dead_points = getattr(nested_sampler, 'dead_points', None)
+        if not isinstance(dead_points, pd.DataFrame):
+            dead_points = None
+        store.record(key, summary, dead_points=dead_points)
+    except Exception:
+        return job['name'], traceback.format_exc()
+    finally:
+        os.chdir(cwd)
+    return job['name'], summary
+
+def run_jobs(config, base_dir='.', verbose=True):
+    """Run the jobs of a configuration.
+    Jobs with complete results in the output directory's ResultStore are
+    skipped and interrupted ones are resumed from their checkpoints. The
+    remaining jobs are run on n_workers processes.
+
+    Args:
+        config (dict): The configuration; see the module docstring.
+        base_dir (str): The directory that relative paths in the
+            configuration are relative to. Defaults to '.'.
+        verbose (bool): Print the progress of the jobs. Defaults to True.
+
+    Returns:
+        pandas.DataFrame: The store records of the jobs, sorted in descending
+            order by the log_evidence.
+    """
+    jobs = expand_jobs(config, base_dir=base_dir)
+    output_dir = os.path.join(base_dir, config.get('output_dir', 'gleipnir_runs'))
+    store = ResultStore(output_dir)
+    n_workers = config.get('n_workers', 1)
+    checkpoint_interval = config.get('checkpoint_interval')
+    keys = list()
+    tasks = list()
+    for job in jobs:
+        hashes = job_hashes(job)
+        key = store.run_key(*hashes)
+        keys.append(key)
+        status = store.status(key)
+        if status == 'complete':
+            if verbose:
+                print("Skipping complete job {}.".format(job['name']))
+            continue
+        if status is None:
+            store.mark_running(key, job['name'], *hashes)
+        elif verbose:
+            print("Resuming job {}.".format(job['name']))
+        tasks.append((job, store.path, key, checkpoint_interval))
+    if n_workers > 1:
+        pool = Pool(min(n_workers, max(len(tasks), 1)))
+        try:
+            results = pool.imap_unordered(_run_job, tasks)
+            _report(results, verbose)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _report(map(_run_job, tasks), verbose)
+    records = store.query(status=None)
+    records = records[records['key'].isin(keys)]
+    return records.reset_index(drop=True)
+
+def _report(results, verbose):
+    for name, result in results:
+        if isinstance(result, dict):
+            if verbose:
+                print("Finished job {}: log_evidence = {} +- {}".format(name,
+                      result['log_evidence'], result['log_evidence_error']))
+        else:
+            print("Job {} failed:\n{}".format(name, result))
+    return
@@ -2,6 +2,7 @@
 """
 
 from .hyp_selector import HypSelector
+from .result_store import hash_model
 
 
 class ModelSelector(HypSelector):
@@ -25,12 +26,14 @@ class ModelSelector(HypSelector):
 
     """
 
-    def __init__(self, models):
+    def __init__(self, models, cache_dir=None):
         """Inits ModelSelector."""
         self.nested_samplers = None
         self._nested_sample_its = None
         self.selection = None
+        self._summaries = dict()
         self.models = models
+        self.cache_dir = cache_dir
         return
 
     def load_models(self):
@@ -38,6 +41,15 @@ class ModelSelector(HypSelector):
         """
         pass
 
+    def _load_model(self, i):
+        """Get the i-th model."""
+        return self.models[i]
+
+    def _release_model(self, i):
+        """Does nothing; the models are held by the caller.
+        """
+        pass
+
     def append_to_models(self, line):
         """Does nothing.
         """
@@ -51,3 +63,7 @@ class ModelSelector(HypSelector):
 
         """
         return len(self.models)
+
+    def _model_hash(self, i):
+        """Hash of the i-th model, used to key stored results."""
+        return hash_model(self.models[i])
@@ -1,16 +1,185 @@
+import collections
 import importlib
+import os
 import os.path
+import re
 import warnings
 
 import numpy as np
 import pysb
 from pysb.simulator import ScipyOdeSimulator
+import scipy.integrate
 from scipy.stats import norm, uniform
 
 from ..sampled_parameter import SampledParameter
+from .result_store import hash_model
 
 default_solver = ScipyOdeSimulator
 
+_loglikelihood_methods = {'snlpdf': 'sum_norm_logpdfs_loglikelihood',
+                          'mse': 'mse_loglikelihood',
+                          'sse': 'sse_loglikelihood',
+                          'custom': 'custom_loglikelihood'}
+
+# The number of measurements reduced at a time by reduce_observations.
+_reduction_chunk_size = 2**20
+
+def load_observations(item):
+    """Load an item of the observable data; file names of .npy files are
+    loaded memory-mapped (read-only), and anything else is passed through."""
+    if isinstance(item, str):
+        return np.load(item, mmap_mode='r')
+    return item
+
+def reduce_observations(data, sigma, time_idx, n_times,
+                        chunk_size=_reduction_chunk_size):
+    """Reduce the measurements of an observable to per time point sufficient
+    statistics.
+    The measurements are grouped by their time index and processed in chunks,
+    so the (possibly memory-mapped) data are never loaded all at once. The
+    sums of squared residuals of the measurements about a simulated value s
+    at a time point are then
+        sum_i (y_i - s)**2 = count*(s - mean)**2 + sum_sq
+        sum_i (y_i - s)**2/sigma_i**2 = inv_var_sum*(s - weighted_mean)**2 + weighted_sum_sq
+    so the loglikelihood estimators cost O(number of time points) rather than
+    O(number of measurements).
+
+    Args:
+        data (numpy.array): The measurements.
+        sigma (None, float or numpy.array): The standard deviations of the
+            measurements.
+        time_idx (numpy.array): The timespan index of each measurement; time
+            indices can repeat (e.g., replicates).
+        n_times (int): The length of the timespan.
+        chunk_size (int): The number of measurements to process at a time.
+
+    Returns:
+        dict of numpy.array: The observed 'times' and their 'counts', 'mean',
+            and 'sum_sq' values, along with the 'inv_var_sum',
+            'weighted_mean', 'weighted_sum_sq', and 'log_sigma_sum' values if
+            sigma is given.
+    """
+    n = len(data)
+    if len(time_idx) != n:
+        raise ValueError("The observable data and their time indices have "
+                         "different lengths.")
+    chunks = [slice(start, min(start+chunk_size, n)) for start in range(0, n, chunk_size)]
+
+    def chunk_of(chunk):
+        y = np.asarray(data[chunk], dtype=float)
+        t = np.asarray(time_idx[chunk], dtype=int)
+        if sigma is None:
+            return y, t, None
+        return y, t, np.broadcast_to(np.asarray(sigma[chunk] if np.ndim(sigma) else sigma,
+                                                dtype=float), y.shape)
+
+    counts = np.zeros(n_times)
+    sums = np.zeros(n_times)
+    inv_var_sum = np.zeros(n_times)
+    weighted_sums = np.zeros(n_times)
+    log_sigma_sum = np.zeros(n_times)
+    for chunk in chunks:
+        y, t, sig = chunk_of(chunk)
+        counts += np.bincount(t, minlength=n_times)
+        sums += np.bincount(t, weights=y, minlength=n_times)
+        if sig is not None:
+            w = 1./sig**2
+            inv_var_sum += np.bincount(t, weights=w, minlength=n_times)
+            weighted_sums += np.bincount(t, weights=w*y, minlength=n_times)
+            log_sigma_sum += np.bincount(t, weights=np.log(sig), minlength=n_times)
+    observed = counts > 0
+    mean = np.zeros(n_times)
+    mean[observed] = sums[observed]/counts[observed]
+    weighted_mean = np.zeros(n_times)
+    if sigma is not None:
+        weighted_mean[observed] = weighted_sums[observed]/inv_var_sum[observed]
+    # Second pass for the sums of squares about the means, which avoids the
+    # cancellation errors of accumulating raw sums of squares.
+    sum_sq = np.zeros(n_times)
+    weighted_sum_sq = np.zeros(n_times)
+    for chunk in chunks:
+        y, t, sig = chunk_of(chunk)
+        sum_sq += np.bincount(t, weights=(y - mean[t])**2, minlength=n_times)
+        if sig is not None:
+            weighted_sum_sq += np.bincount(t, weights=((y - weighted_mean[t])/sig)**2,
+                                           minlength=n_times)
+    stats = {'times': np.flatnonzero(observed),
+             'counts': counts[observed],
+             'mean': mean[observed],
+             'sum_sq': sum_sq[observed]}
+    if sigma is not None:
+        stats['inv_var_sum'] = inv_var_sum[observed]
+        stats['weighted_mean'] = weighted_mean[observed]
+        stats['weighted_sum_sq'] = weighted_sum_sq[observed]
+        stats['log_sigma_sum'] = log_sigma_sum[observed]
+    return stats
+
+def generate_equations_cached(model, cache_dir):
+    """Generate a model's reaction network, reusing a cached BNG network.
+    The BioNetGen .net file of the model is kept in cache_dir/networks under
+    the hash of the model definition (see result_store.hash_model), so
+    repeated sessions and worker processes only need to run BioNetGen once
+    per model.
+
+    Args:
+        model (pysb.Model): The model to generate the equations of.
+        cache_dir (str): The cache directory.
+    """
+    from pysb.bng import generate_network, load_equations
+    if model.reactions:
+        return
+    net_dir = os.path.join(cache_dir, 'networks')
+    net_file = os.path.join(net_dir, "{}.net".format(hash_model(model)))
+    if not os.path.exists(net_file):
+        network = generate_network(model)
+        try:
+            os.makedirs(net_dir)
+        except OSError:
+            pass
+        # Write then rename, since other processes may be reading the cache.
+        tmp_file = "{}.{}.tmp".format(net_file, os.getpid())
+        with open(tmp_file, 'w') as f:
+            f.write(network)
+        os.replace(tmp_file, net_file)
+    load_equations(model, net_file)
+    return
+
+def _ode_integrator(rhs_builder, integrator_name, integrator_opts, initials,
+                    t0, params):
+    """Set up a scipy.integrate.ode integrator for the right-hand side of a
+    ScipyOdeSimulator's model (see the simulator's rhs_builder)."""
+    extra_args = (params, rhs_builder.calc_expressions_constant(params))
+    integrator = scipy.integrate.ode(rhs_builder.rhs_fn, jac=rhs_builder.jacobian_fn)
+    integrator.set_integrator(integrator_name, **integrator_opts)
+    integrator.set_initial_value(initials, t0)
+    integrator.set_f_params(*extra_args)
+    if rhs_builder.with_jacobian:
+        integrator.set_jac_params(*extra_args)
+    return integrator
+
+def _integrate_trajectory(rhs_builder, initials, params, tspan, integrator_name,
+                          integrator_opts):
+    """Integrate the species trajectories of a ScipyOdeSimulator's model
+    over tspan, in the same way as ScipyOdeSimulator.run. Time points after
+    a failed integration step are NaN."""
+    initials = np.array(initials, dtype=float)
+    if integrator_name == 'lsoda':
+        extra_args = (params, rhs_builder.calc_expressions_constant(params))
+        return scipy.integrate.odeint(rhs_builder.rhs_fn, initials, tspan,
+                                      args=extra_args,
+                                      Dfun=rhs_builder.jacobian_fn,
+                                      tfirst=True, **integrator_opts)
+    integrator = _ode_integrator(rhs_builder, integrator_name, integrator_opts,
+                                 initials, tspan[0], params)
+    trajectory = np.empty((len(tspan), len(initials)))
+    trajectory[0] = initials
+    for i in range(1, len(tspan)):
+        trajectory[i] = integrator.integrate(tspan[i])
+        if not integrator.successful():
+            trajectory[i:] = np.nan
+            break
+    return trajectory
+
 def is_numbers(inputString):
     return all(char.isdigit() for char in inputString)
 
@@ -68,17 +237,34 @@ class NestIt(object):
     model definition for Nested Sampling. However, it could be used outside
     model definition.
 
+    Parameters that are fixed by thermodynamic constraints can be declared
+    with add_Keq and add_cycle, in which case they aren't sampled and are
+    instead derived from the sampled parameters.
+
     Attributes:
         parms (dict of :obj:): A dictionary keyed to the parameter names. The
             values are the parameter priors as given in the call function.
+        dependent (dict of dict): A dictionary keyed to the names of the
+            parameters that are derived from other parameters. Each value is
+            a dict of the coefficients, keyed to the parameter names, of a
+            linear combination in log10 space; e.g., {'k_f': 1., 'K_eq': -1.}
+            for log10(k_r) = log10(k_f) - log10(K_eq).
 
     """
 
     def __init__(self):
         self.parms = dict()
+        self.dependent = collections.OrderedDict()
         self._default_prior = 'uniform'
         return
 
+    def _make_default_prior(self, value):
+        if self._default_prior == 'norm':
+            # Default to norm distribution
+            return norm(loc=np.log10(value), scale=2.0)
+        # Default to uniform distribution
+        return uniform(loc=np.log10(value)-2.0, scale=4.0)
+
     def __call__(self, parameter, prior=None):
         """Add a parameter to the list.
 
@@ -91,15 +277,74 @@ class NestIt(object):
                 is used with a scale 4 orders of magnitude.
         """
         if prior is None:
-            if self._default_prior == 'norm':
-                # Default to norm distribution
-                prior = norm(loc=np.log10(parameter.value), scale=2.0)
-            else:
-                # Default to uniform distribution
-                prior = uniform(loc=np.log10(parameter.value)-2.0, scale=4.0)
+            prior = self._make_default_prior(parameter.value)
         self.parms[parameter.name] = prior
+        if parameter.name in self.dependent:
+            del self.dependent[parameter.name]
         return parameter
 
+    def add_Keq(self, k_f, k_r, K_eq, prior=None):
+        """Sample the equilibrium constant of a reversible reaction instead
+        of its reverse rate. The reverse rate is derived as k_r = k_f/K_eq.
+
+        Args:
+            k_f (:obj:pysb.Parameter): The forward rate parameter. It can be
+                sampled or have a fixed value.
+            k_r (:obj:pysb.Parameter): The reverse rate parameter, which is
+                no longer sampled.
+            K_eq (:obj:pysb.Parameter or str): The equilibrium constant. Either
+                a model parameter or the name to sample it under if the model
+                doesn't define one.
+            prior (:obj:scipy.stats.RVS): The prior for K_eq, defined using
+                log10 scale. Default: None
+                If None, the default prior centered on k_f.value/k_r.value is
+                used.
+        """
+        if isinstance(K_eq, pysb.Parameter):
+            K_eq = K_eq.name
+        if prior is None:
+            prior = self._make_default_prior(k_f.value/k_r.value)
+        self.parms[K_eq] = prior
+        self.parms.pop(k_r.name, None)
+        self.dependent[k_r.name] = {k_f.name: 1., K_eq: -1.}
+        return
+
+    def add_cycle(self, forward_rates, reverse_rates, dependent=None):
+        """Impose detailed balance on a thermodynamic cycle of reactions.
+        The product of the equilibrium constants (k_f/k_r) around the cycle
+        has to be one, so one of the rates is derived from the others.
+
+        Args:
+            forward_rates (list of :obj:pysb.Parameter): The forward rate
+                parameters of the reactions in the cycle.
+            reverse_rates (list of :obj:pysb.Parameter): The corresponding
+                reverse rate parameters.
+            dependent (:obj:pysb.Parameter): The rate parameter to derive from
+                the others; it has to be one of the cycle's rates. Default: None
+                If None, the last reverse rate is derived.
+        """
+        if dependent is None:
+            dependent = reverse_rates[-1]
+        forward_names = [rate.name for rate in forward_rates]
+        reverse_names = [rate.name for rate in reverse_rates]
+        if dependent.name in forward_names:
+            sign = 1.
+        elif dependent.name in reverse_names:
+            sign = -1.
+        else:
+            raise ValueError("The dependent rate {} isn't in the "
+                             "cycle.".format(dependent.name))
+        # sum(log10(k_f)) - sum(log10(k_r)) = 0, solved for the dependent rate.
+        terms = collections.defaultdict(float)
+        for name in forward_names:
+            terms[name] -= sign
+        for name in reverse_names:
+            terms[name] += sign
+        del terms[dependent.name]
+        self.parms.pop(dependent.name, None)
+        self.dependent[dependent.name] = dict(terms)
+        return
+
     def __getitem__(self, key):
         return self.parms[key]
 
@@ -134,6 +379,9 @@ class NestIt(object):
         names = self.names()
         return [(parm.name in names) for parm in model_parameters]
 
+    def dependent_mask(self, model_parameters):
+        return [(parm.name in self.dependent) for parm in model_parameters]
+
     def priors(self):
         return [self.parm[name] for name in self.parm.keys()]
 
@@ -197,6 +445,10 @@ class NestedSampleIt(object):
             data corresponds to. Each element is a 3 item tuple of format:
             (:numpy.array:data, None or :numpy.array:data_standard_deviations,
             None or :list like:time_idxs or :list like:time_mask).
+            The time_idxs can repeat for replicate measurements, and any of
+            the arrays can be given as the file name of a .npy file, which is
+            memory-mapped; large datasets are reduced to per time point
+            sufficient statistics once (see reduce_observations).
         timespan (numpy.array): The timespan for model simulations.
         solver (:obj:): The ODE solver to use when running model simulations.
             Defaults to pysb.simulator.ScipyOdeSimulator.
@@ -206,12 +458,62 @@ class NestedSampleIt(object):
             instance of the NestIt class with the data about the parameters to
             be sampled. If None (and builder is None), the default parameters to be sampled
             are the kinetic rate parameters with uniform priors of four orders of
-            magnitude. Default: None
+            magnitude. Parameters that the NestIt declares as dependent (e.g.,
+            reverse rates replaced by sampled equilibrium constants) are
+            derived from the sampled values in each evaluation. Default: None
         builder (:obj:pysb.builder.Builder): An instance of the Builder class
             with the data about the parameters to be sampled. If None
             (and nest_it is None), the default parameters to be sampled
             are the kinetic rate parameters with uniform priors of four orders
             of magnitude. Default: None
+        cache_dir (str): A directory in which to cache the model's generated
+            reaction network across sessions; see generate_equations_cached.
+            Default: None
+        num_processors (int): The number of processes the solver can use for
+            the batched simulations of batch_loglikelihood. Default: 1
+        loose_solver_opts (dict): Looser integrator options (e.g.,
+            {'rtol': 1e-3, 'atol': 1e-6}) used by bounded_loglikelihood to
+            screen out proposals that are clearly below the Nested Sampling
+            likelihood boundary before evaluating at the full accuracy. Only
+            used by built-in Nested Samplers made with bounded=True.
+            Default: None
+        fidelity_margin (float): How far (in log-likelihood units) below the
+            boundary a loose loglikelihood estimate has to be for the
+            proposal to be rejected without a full accuracy evaluation.
+            Default: 1.0
+        equilibration_timespan (numpy.array): If given, each simulation is
+            started from the state reached by first integrating the model over
+            this timespan (i.e., pre-equilibration). The equilibrium states are
+            cached, keyed on the values of just the sampled parameters that
+            the equilibration depends on (see _setup_pre_equilibration).
+            Default: None
+        equilibration_overrides (dict): Parameter values, keyed to the
+            parameter names, to use during the pre-equilibration; e.g., to
+            turn off catalytic reactions with zero rates. Default: None
+        equilibration_cache_size (int): The maximum number of cached
+            equilibrium states; the least recently used are evicted first.
+            Default: 256
+        conditions (list of dict): Additional experimental conditions to fit
+            the model to along with observable_data (the data for the model
+            as is). Each condition is a dict with the 'observable_data' for
+            the condition (same format as observable_data) and, optionally,
+            'parameters', a dict of parameter values keyed to the parameter
+            names that are used instead of the model/sampled values for the
+            condition; e.g., different initial amounts or knockouts (zero
+            amounts). All of the conditions are simulated together in each
+            loglikelihood evaluation, and a custom_loglikelihood gets the list
+            of their simulation results. observable_data can be an empty dict
+            if all of the data come from the conditions. Default: None
+        integrator_tiers (list of tuple): Faster integrators to try before
+            the solver's own; each a tuple of (integrator name, integrator
+            options), e.g. [('dopri5', {'nsteps': 1000})] to try the explicit
+            Runge-Kutta integrator with a step budget. A solve that fails or
+            runs out of steps on a tier is redone on the next one, and the
+            solver's integrator is always the last tier, so stiff parameter
+            sets still get solved. The number of solves attempted and
+            completed on each tier are reported by integrator_stats. Only
+            applies to the direct integration path (see _setup_lean_sim).
+            Default: None
 
     Attributes:
         model
@@ -223,7 +525,11 @@ class NestedSampleIt(object):
     """
     def __init__(self, model, observable_data, timespan,
                  solver=default_solver,
-                 solver_kwargs=None, nest_it=None, builder=None):
+                 solver_kwargs=None, nest_it=None, builder=None,
+                 cache_dir=None, num_processors=1, loose_solver_opts=None,
+                 fidelity_margin=1.0, equilibration_timespan=None,
+                 equilibration_overrides=None, equilibration_cache_size=256,
+                 conditions=None, integrator_tiers=None):
         """Inits the NestedSampleIt."""
         if solver_kwargs is None:
             solver_kwargs = dict()
@@ -232,23 +538,55 @@ class NestedSampleIt(object):
         self.timespan = timespan
         self.solver = solver
         self.solver_kwargs = solver_kwargs
+        self.cache_dir = cache_dir
+        self.num_processors = num_processors
+        self.loose_solver_opts = loose_solver_opts
+        self.fidelity_margin = fidelity_margin
+        if equilibration_overrides is None:
+            equilibration_overrides = dict()
+        self.equilibration_timespan = equilibration_timespan
+        self.equilibration_overrides = equilibration_overrides
+        self.equilibration_cache_size = equilibration_cache_size
+        self.conditions = conditions
+        if integrator_tiers is None:
+            integrator_tiers = list()
+        self.integrator_tiers = integrator_tiers
         # self.ns_version = None
         self._ns_kwargs = None
-        self._like_data = dict()
         self._data = dict()
         self._data_mask = dict()
         for observable_key in observable_data.keys():
-            self._like_data[observable_key] = norm(loc=observable_data[observable_key][0],
-                                               scale=observable_data[observable_key][1])
             self._data[observable_key] = observable_data[observable_key][0]
             self._data_mask[observable_key] = observable_data[observable_key][2]
             # print(observable_data[observable_key][2])
             if observable_data[observable_key][2] is None:
                 self._data_mask[observable_key] = range(len(self.timespan))
-        self._model_solver = solver(self.model, tspan=self.timespan, **solver_kwargs)
+        # Collect the (parameter overrides, observable data) of each
+        # simulated condition.
+        param_idx = {param.name: i for i, param in enumerate(model.parameters)}
+        self._conditions = list()
+        if (conditions is None) or (len(observable_data) > 0):
+            self._conditions.append((dict(), observable_data))
+        if conditions is not None:
+            for condition in conditions:
+                overrides = {param_idx[name]: value for name, value
+                             in condition.get('parameters', dict()).items()}
+                self._conditions.append((overrides, condition['observable_data']))
+        self._condition_override_idx = [np.array(list(overrides.keys()), dtype=int)
+                                        for overrides, _ in self._conditions]
+        self._condition_override_values = [np.array(list(overrides.values()), dtype=float)
+                                           for overrides, _ in self._conditions]
+        self._compile_data()
+        # The solver is built lazily (see _model_solver) so that instances
+        # can be pickled and shipped to worker processes, which then build
+        # their own solver on first use.
+        self._solver_instance = None
         if nest_it is not None:
             parm_mask = nest_it.mask(model.parameters)
             self._sampled_parameters = [SampledParameter(parm.name, nest_it[parm.name]) for i,parm in enumerate(model.parameters) if parm_mask[i]]
+            # Sampled quantities that aren't model parameters (e.g., K_eq
+            # values only used to derive dependent rates) come last.
+            self._sampled_parameters += [SampledParameter(name, nest_it[name]) for name in nest_it.keys() if name not in model.parameters.keys()]
             self._rate_mask = parm_mask
         elif builder is not None:
             pnames = [parm.name for parm in builder.estimate_params]
@@ -261,14 +599,564 @@ class NestedSampleIt(object):
                      params.append(rule.rate_forward)
                 if rule.rate_reverse:
                      params.append(rule.rate_reverse)
-            rate_mask = [model.parameters.index(param) for param in params]
+            # Sorted and without repeats, so that the order matches the
+            # sampled parameters (model parameter order).
+            rate_mask = sorted(set([model.parameters.index(param) for param in params]))
             self._sampled_parameters = [SampledParameter(param.name, uniform(loc=np.log10(param.value)-2.0, scale=4.0)) for i,param in enumerate(model.parameters) if i in rate_mask]
             self._rate_mask = rate_mask
 
         self._param_values = np.array([param.value for param in model.parameters])
+        # Reusable parameter vector for the loglikelihood calls.
+        self._param_buffer = self._param_values.copy()
+        rate_idx = np.arange(len(model.parameters))[self._rate_mask]
+        self._rate_idx = rate_idx
+        dependent = None
+        if nest_it is not None:
+            dependent = nest_it.dependent
+        self._setup_dependent(dependent)
+        self._lean_sim = False
+        self._eq_cache = None
         self._custom_loglikelihood = None
+        self._log_likelihood_type = 'snlpdf'
+        return
+
+    def _setup_dependent(self, dependent):
+        """Build the linear map from the sampled positions to the log10
+        values of the sampled and dependent model parameters.
+        Dependent parameters (see NestIt.add_Keq and NestIt.add_cycle) are
+        linear combinations in log10 space of sampled parameters, fixed model
+        parameters, and earlier dependent parameters, which are all expanded
+        here into terms of the sampled positions plus a constant offset.
+        """
+        self._target_idx = self._rate_idx
+        self._position_map = None
+        self._position_offset = None
+        if not dependent:
+            return
+        model = self.model
+        names = [sp.name for sp in self._sampled_parameters]
+        n_rates = len(self._rate_idx)
+        position_map = np.zeros((len(names), n_rates + len(dependent)))
+        position_map[np.arange(n_rates), np.arange(n_rates)] = 1.
+        offset = np.zeros(n_rates + len(dependent))
+        dep_idx = list()
+        for j, (name, terms) in enumerate(dependent.items(), start=n_rates):
+            if name not in model.parameters.keys():
+                raise ValueError("The dependent parameter {} isn't a model "
+                                 "parameter.".format(name))
+            dep_idx.append(model.parameters.index(model.parameters[name]))
+            for term, coefficient in terms.items():
+                if term in names:
+                    position_map[names.index(term), j] += coefficient
+                elif term in dependent:
+                    i = n_rates + list(dependent.keys()).index(term)
+                    if i >= j:
+                        raise ValueError("The dependent parameter {} has to be "
+                                         "declared before {}.".format(term, name))
+                    position_map[:, j] += coefficient*position_map[:, i]
+                    offset[j] += coefficient*offset[i]
+                elif term in model.parameters.keys():
+                    offset[j] += coefficient*np.log10(model.parameters[term].value)
+                else:
+                    raise ValueError("Unknown parameter {} in the constraint "
+                                     "on {}.".format(term, name))
+        self._target_idx = np.concatenate([self._rate_idx,
+                                           np.array(dep_idx, dtype=int)])
+        self._position_map = position_map
+        self._position_offset = offset
         return
 
+    def _compile_data(self):
+        """Flatten the observable data for the loglikelihood estimators.
+        The measurements of each condition and observable are reduced to
+        sufficient statistics per observed time point (see
+        reduce_observations), which are concatenated into single arrays along
+        with the weights and constants needed by each estimator, so that each
+        loglikelihood is a single reduction over the flattened simulated
+        values at the observed time points (see _estimator_terms).
+        """
+        n_times = len(self.timespan)
+        self._data_keys = list()
+        entries = list()
+        flat_time_idx = list()
+        flat_key_idx = list()
+        flat_cond_idx = list()
+        means = list()
+        counts = list()
+        mean_weights = list()
+        norm_means = list()
+        inv_vars = list()
+        log_norm = 0.
+        sse_offset = 0.
+        mse_offset = 0.
+        n_measurements = 0
+        for condition_idx, (_, observable_data) in enumerate(self._conditions):
+            for observable_key in observable_data.keys():
+                data, sigma, mask = [load_observations(item) for item
+                                     in observable_data[observable_key]]
+                if mask is None:
+                    mask = range(n_times)
+                if not hasattr(mask, 'dtype'):
+                    mask = np.asarray(mask)
+                if mask.dtype == bool:
+                    mask = np.flatnonzero(mask)
+                if not hasattr(data, 'dtype'):
+                    data = np.asarray(data, dtype=float)
+                if (sigma is not None) and (not hasattr(sigma, 'dtype')):
+                    sigma = np.asarray(sigma, dtype=float)
+                if (sigma is None) or (inv_vars is None):
+                    # The normal estimator isn't available without the
+                    # standard deviations.
+                    inv_vars = None
+                    sigma = None
+                stats = reduce_observations(data, sigma, mask, n_times)
+                if observable_key not in self._data_keys:
+                    self._data_keys.append(observable_key)
+                n_data = len(data)
+                n_measurements += n_data
+                n_points = len(stats['times'])
+                entries.append((condition_idx, observable_key))
+                flat_time_idx.append(stats['times'])
+                flat_key_idx.append(np.full(n_points, self._data_keys.index(observable_key)))
+                flat_cond_idx.append(np.full(n_points, condition_idx))
+                means.append(stats['mean'])
+                counts.append(stats['counts'])
+                mean_weights.append(stats['counts']/n_data)
+                sse_offset += np.sum(stats['sum_sq'])
+                mse_offset += np.sum(stats['sum_sq'])/n_data
+                if inv_vars is None:
+                    continue
+                norm_means.append(stats['weighted_mean'])
+                inv_vars.append(0.5*stats['inv_var_sum'])
+                log_norm -= (np.sum(stats['log_sigma_sum']) + 0.5*n_data*np.log(2.*np.pi)
+                             + 0.5*np.sum(stats['weighted_sum_sq']))
+        # The models are only simulated up to the last observed time point,
+        # with output at just the initial and observed time points; the time
+        # indices are remapped to this pruned timespan.
+        observed = np.unique(np.concatenate([[0]] + flat_time_idx))
+        self._sim_timespan = np.asarray(self.timespan)[observed]
+        self._entries = [(condition_idx, observable_key, np.searchsorted(observed, times))
+                         for (condition_idx, observable_key), times in zip(entries, flat_time_idx)]
+        self._n_measurements = n_measurements
+        self._flat_data = np.concatenate(means)
+        self._flat_counts = np.concatenate(counts)
+        self._flat_time_idx = np.searchsorted(observed, np.concatenate(flat_time_idx))
+        self._flat_key_idx = np.concatenate(flat_key_idx)
+        self._flat_cond_idx = np.concatenate(flat_cond_idx)
+        # Group the flattened data of each condition by time point for the
+        # segment-wise evaluation of bounded_loglikelihood.
+        self._segments = list()
+        for condition_idx in range(len(self._conditions)):
+            positions = np.flatnonzero(self._flat_cond_idx == condition_idx)
+            positions = positions[np.argsort(self._flat_time_idx[positions], kind='stable')]
+            segment_times, segment_starts = np.unique(self._flat_time_idx[positions],
+                                                      return_index=True)
+            self._segments.append(list(zip(segment_times,
+                                           np.split(positions, segment_starts[1:]))))
+        self._flat_mean_weights = np.concatenate(mean_weights)
+        if inv_vars is None:
+            self._flat_norm_data = None
+            self._flat_inv_vars = None
+        else:
+            self._flat_norm_data = np.concatenate(norm_means)
+            self._flat_inv_vars = np.concatenate(inv_vars)
+        self._log_norm = log_norm
+        self._sse_offset = sse_offset
+        self._mse_offset = mse_offset
+        return
+
+    def _estimator_terms(self, ll_type):
+        """Get the (data, weights, constant) of a loglikelihood estimator,
+        whose loglikelihood is then
+            constant - sum(weights*(simulated - data)**2)
+        over the flattened simulated values."""
+        if ll_type == 'mse':
+            return self._flat_data, self._flat_mean_weights, -self._mse_offset
+        elif ll_type == 'sse':
+            return self._flat_data, self._flat_counts, -self._sse_offset
+        if self._flat_inv_vars is None:
+            raise ValueError("The 'snlpdf' loglikelihood needs the standard "
+                             "deviations of all the observable data.")
+        return self._flat_norm_data, self._flat_inv_vars, self._log_norm
+
+    def _flat_simulation(self, sims):
+        """Concatenate the simulated values that correspond to the data.
+
+        Args:
+            sims (list): The simulation results (i.e., SimulationResult.all)
+                of each condition.
+        """
+        return np.concatenate([sims[condition_idx][observable_key][times]
+                               for condition_idx, observable_key, times in self._entries])
+
+    def _condition_params(self, params):
+        """Get the (n_conditions, n_parameters) parameter values of the
+        conditions."""
+        condition_params = np.tile(params, (len(self._conditions), 1))
+        for i in range(len(self._conditions)):
+            condition_params[i, self._condition_override_idx[i]] = self._condition_override_values[i]
+        return condition_params
+
+    def _setup_lean_sim(self, solver):
+        """Prepare the direct integration path for the solver, if possible.
+        For ScipyOdeSimulator solvers, the species trajectories can be
+        integrated directly and the data observables read from them through
+        a coefficient matrix, which avoids building a SimulationResult (with
+        every observable and expression) on each loglikelihood call. Other
+        solvers, and models whose initials, derived parameters, or data keys
+        need the full simulation machinery, use solver.run instead.
+        """
+        model = self.model
+        self._lean_sim = False
+        if (not isinstance(solver, ScipyOdeSimulator)) or (self.solver_kwargs.get('initials') is not None):
+            return
+        if len(model.parameters_all()) > len(model.parameters):
+            # The model has derived parameters (e.g., from energy patterns).
+            return
+        init_species = list()
+        init_params = list()
+        for initial in model.initials:
+            if not isinstance(initial.value, pysb.Parameter):
+                return
+            init_species.append(model.get_species_index(initial.pattern))
+            init_params.append(model.parameters.index(initial.value))
+        coeffs = np.zeros((len(self._data_keys), len(model.species)))
+        for i, observable_key in enumerate(self._data_keys):
+            species_name = re.match(r'__s(\d+)$', observable_key)
+            if observable_key in model.observables.keys():
+                observable = model.observables[observable_key]
+                coeffs[i, observable.species] = observable.coefficients
+            elif species_name is not None:
+                coeffs[i, int(species_name.group(1))] = 1.
+            else:
+                return
+        self._obs_coeffs = coeffs.T
+        self._init_species_idx = np.array(init_species, dtype=int)
+        self._init_param_idx = np.array(init_params, dtype=int)
+        self._initials_buffer = np.zeros((len(self._conditions), len(model.species)))
+        self._lean_sim = True
+        return
+
+    def _setup_pre_equilibration(self):
+        """Find the sampled parameters that the pre-equilibration of each
+        condition depends on.
+        Starting from the species with initial amounts that aren't fixed at
+        zero, reactions whose reactants can all be present and whose rates
+        aren't switched off (zero) by fixed parameter values are followed to
+        find the reachable species. The equilibrium state then depends only
+        on the initial amount parameters of the reachable species and the
+        rate parameters of those reactions, and the sampled ones among these
+        are used to key the cache of equilibrium states. The fixed values
+        include the condition's parameter overrides, so the dependencies are
+        found separately for each condition.
+        """
+        if self.equilibration_timespan is None:
+            self._eq_cache = None
+            return
+        model = self.model
+        param_idx = {param.name: i for i, param in enumerate(model.parameters)}
+        self._eq_override_idx = np.array([param_idx[name] for name in self.equilibration_overrides.keys()], dtype=int)
+        self._eq_override_values = np.array(list(self.equilibration_overrides.values()), dtype=float)
+        sampled = set(self._target_idx)
+        expansions = {expr: expr.expand_expr() for expr in model.expressions}
+
+        def parameters_of(expr):
+            expr = expr.xreplace(expansions)
+            params = [param_idx[symbol.name] for symbol in expr.free_symbols
+                      if isinstance(symbol, pysb.Parameter)]
+            return expr, params
+
+        self._eq_dep_idx = list()
+        eq_conditions = self._condition_params(self._param_values)
+        eq_conditions[:, self._eq_override_idx] = self._eq_override_values
+        for condition_idx, eq_values in enumerate(eq_conditions):
+            overridden = set(self._eq_override_idx) | set(self._condition_override_idx[condition_idx])
+            fixed_zero = [param for i, param in enumerate(model.parameters)
+                          if (eq_values[i] == 0.) and ((i not in sampled) or (i in overridden))]
+            zeros = {param: 0 for param in fixed_zero}
+            reached = set()
+            dependent = set()
+            for initial in model.initials:
+                value, params = parameters_of(initial.value)
+                if value.xreplace(zeros) != 0:
+                    reached.add(model.get_species_index(initial.pattern))
+                    dependent.update(params)
+            active = set()
+            changed = True
+            while changed:
+                changed = False
+                for i, reaction in enumerate(model.reactions):
+                    if (i in active) or (not set(reaction['reactants']) <= reached):
+                        continue
+                    rate, params = parameters_of(reaction['rate'])
+                    if rate.xreplace(zeros) == 0:
+                        continue
+                    active.add(i)
+                    reached.update(reaction['products'])
+                    dependent.update(params)
+                    changed = True
+            self._eq_dep_idx.append(np.array(sorted((dependent & sampled) - overridden), dtype=int))
+        self._eq_cache = collections.OrderedDict()
+        return
+
+    def _pre_equilibrate(self, params, condition_idx=0):
+        """Get the (cached) equilibrium species state for the parameter
+        vector of a condition."""
+        key = (condition_idx, params[self._eq_dep_idx[condition_idx]].tobytes())
+        cache = self._eq_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        eq_params = params.copy()
+        eq_params[self._eq_override_idx] = self._eq_override_values
+        solver = self._model_solver
+        if self._lean_sim:
+            initials = np.zeros(len(self.model.species))
+            initials[self._init_species_idx] = eq_params[self._init_param_idx]
+            trajectory = self._integrate(initials, eq_params,
+                                         self.equilibration_timespan)
+        else:
+            trajectory = solver.run(tspan=self.equilibration_timespan,
+                                    param_values=[eq_params]).species
+        state = np.reshape(trajectory, (len(self.equilibration_timespan), -1))[-1].copy()
+        cache[key] = state
+        if len(cache) > self.equilibration_cache_size:
+            cache.popitem(last=False)
+        return state
+
+    def _initial_states(self, condition_params):
+        """The (n_conditions, n_species) initial species states for the
+        simulations of the conditions, or None to let the solver compute them
+        from the parameters."""
+        if self._eq_cache is not None:
+            return np.array([self._pre_equilibrate(params, i)
+                             for i, params in enumerate(condition_params)])
+        if self._lean_sim:
+            initials = self._initials_buffer
+            initials[:, self._init_species_idx] = condition_params[:, self._init_param_idx]
+            return initials
+        return None
+
+    def _set_position(self, position):
+        """Load a sampled position into the parameter buffer."""
+        if self._position_map is None:
+            self._param_buffer[self._rate_idx] = np.power(10., position)
+        else:
+            self._param_buffer[self._target_idx] = np.power(10., np.dot(position, self._position_map)
+                                                                 + self._position_offset)
+        return self._param_buffer
+
+    def bounded_loglikelihood(self, position, ns_boundary):
+        """Compute the loglikelihood, or stop early once it is below a bound.
+        For the snlpdf, mse, and sse estimators the loglikelihood only
+        decreases as the contributions of each data time point are added, so
+        the model is integrated segment by segment between the data time
+        points and the evaluation stops as soon as the partial loglikelihood
+        drops to ns_boundary or below. This saves the remaining integration
+        for proposals that the Nested Sampler is going to reject anyway. The
+        full loglikelihood is computed for the custom estimator and when the
+        direct integration path isn't available (see _setup_lean_sim), as
+        well as for the 'lsoda' integrator.
+
+        If loose_solver_opts were given, the position is first integrated
+        with those (looser) tolerances, and is rejected if that estimate is
+        below ns_boundary by more than the fidelity_margin. The loose
+        estimate gives each residual the benefit of the doubt of the loose
+        rtol and atol (i.e., residuals are shrunk by rtol*|simulated| + atol
+        before being squared), so it is an upper bound of the full accuracy
+        loglikelihood as long as the loose integration errors are within its
+        tolerances. Positions that aren't clearly rejected are re-evaluated
+        at the full accuracy, so any loglikelihood returned above
+        ns_boundary is a full accuracy one.
+
+        Args:
+            position (numpy.array): The parameter vector the compute
+                loglikelihood of.
+            ns_boundary (float): The current lower likelihood bound of the
+                Nested Sampling run.
+
+        Returns:
+            float: The natural logarithm of the likelihood estimate if it is
+                above ns_boundary. Otherwise, a partial (upper bound) estimate
+                which is less than or equal to ns_boundary.
+
+        """
+        ll_type = self._log_likelihood_type
+        self._ensure_solver()
+        tier_names = [integrator_name for integrator_name, _ in self._tiers]
+        if (ll_type == 'custom') or (not self._lean_sim) or ('lsoda' in tier_names):
+            return getattr(self, _loglikelihood_methods[ll_type])(position)
+        if self.loose_solver_opts is not None:
+            loose_boundary = ns_boundary - self.fidelity_margin
+            logl = self._segmented_loglikelihood(position, loose_boundary,
+                                                 self.loose_solver_opts)
+            # Failed loose integrations are retried at full accuracy.
+            if np.isfinite(logl) and (logl <= loose_boundary):
+                return logl
+        return self._segmented_loglikelihood(position, ns_boundary)
+
+    def _segmented_loglikelihood(self, position, ns_boundary, opts_update=None):
+        """Integrate between the data time points, stopping once the partial
+        loglikelihood is at or below ns_boundary. opts_update are options
+        that override those of every integrator tier; their rtol and atol are
+        taken as the error allowance of an upper bound estimate."""
+        solver = self._model_solver
+        tolerance = None
+        if opts_update is not None:
+            tolerance = (opts_update.get('rtol', 0.), opts_update.get('atol', 0.))
+        data, weights, logl = self._estimator_terms(self._log_likelihood_type)
+        condition_params = self._condition_params(self._set_position(position))
+        initials = self._initial_states(condition_params)
+        rhs_builder = solver.rhs_builder
+        last_tier = len(self._tiers) - 1
+        for condition_idx, params in enumerate(condition_params):
+            condition_logl = logl
+            for tier, (integrator_name, integrator_opts) in enumerate(self._tiers):
+                if opts_update is not None:
+                    integrator_opts = dict(integrator_opts, **opts_update)
+                self._tier_attempts[tier] += 1
+                integrator = _ode_integrator(rhs_builder, integrator_name,
+                                             integrator_opts,
+                                             initials[condition_idx].copy(),
+                                             solver.tspan[0], params)
+                with warnings.catch_warnings():
+                    if tier < last_tier:
+                        # Failures are expected; the solve moves up a tier.
+                        warnings.simplefilter('ignore')
+                    logl = self._integrate_segments(integrator, condition_idx,
+                                                    condition_logl, data,
+                                                    weights, ns_boundary,
+                                                    tolerance)
+                if logl is not None:
+                    self._tier_successes[tier] += 1
+                    break
+            if logl is None:
+                return -np.inf
+            if logl <= ns_boundary:
+                return logl
+        return logl
+
+    def _integrate_segments(self, integrator, condition_idx, logl, data,
+                            weights, ns_boundary, tolerance=None):
+        """Add the contributions of a condition's data to the partial
+        loglikelihood segment by segment. If a (rtol, atol) tolerance is
+        given, the residuals are reduced by the simulated values' error
+        allowance. Returns None if the integration fails."""
+        tspan = self._solver_instance.tspan
+        state = integrator.y
+        for time_idx, segment_idx in self._segments[condition_idx]:
+            if time_idx > 0:
+                state = integrator.integrate(tspan[time_idx])
+                if not integrator.successful():
+                    return None
+            observables = np.dot(state, self._obs_coeffs)
+            key_idx = self._flat_key_idx[segment_idx]
+            residuals = observables[key_idx] - data[segment_idx]
+            if tolerance is not None:
+                rtol, atol = tolerance
+                errors = np.dot(rtol*np.abs(state) + atol, np.abs(self._obs_coeffs))
+                residuals = np.maximum(np.abs(residuals) - errors[key_idx], 0.)
+            logl -= np.dot(weights[segment_idx], residuals**2)
+            if np.isnan(logl):
+                return -np.inf
+            if logl <= ns_boundary:
+                return logl
+        return logl
+
+    def _integrate(self, initials, params, tspan):
+        """Integrate the species trajectories directly, moving up the
+        integrator tiers until a solve succeeds."""
+        rhs_builder = self._solver_instance.rhs_builder
+        last_tier = len(self._tiers) - 1
+        for tier, (integrator_name, integrator_opts) in enumerate(self._tiers):
+            self._tier_attempts[tier] += 1
+            with warnings.catch_warnings():
+                if tier < last_tier:
+                    warnings.simplefilter('ignore')
+                trajectory = _integrate_trajectory(rhs_builder, initials,
+                                                   params, tspan,
+                                                   integrator_name,
+                                                   integrator_opts)
+            if np.all(np.isfinite(trajectory)):
+                self._tier_successes[tier] += 1
+                break
+        return trajectory
+
+    def integrator_stats(self):
+        """Get the counts of the solves done on each integrator tier; see
+        integrator_tiers. Solves done by the worker processes of an
+        EvaluationPool are counted in the workers.
+
+        Returns:
+            list of dict: The 'integrator' name and number of solves
+                'attempted' and 'completed' on each tier, with the solver's
+                own integrator last. Empty if the solves aren't done on the
+                direct integration path.
+        """
+        self._ensure_solver()
+        return [{'integrator': integrator_name,
+                 'attempted': int(self._tier_attempts[tier]),
+                 'completed': int(self._tier_successes[tier])}
+                for tier, (integrator_name, _) in enumerate(self._tiers)]
+
+    def _simulate_flat(self, position):
+        """Simulate the model at a position and get the flattened values
+        corresponding to the data."""
+        solver = self._model_solver
+        condition_params = self._condition_params(self._set_position(position))
+        initials = self._initial_states(condition_params)
+        if not self._lean_sim:
+            # All of the conditions in one batched solver run.
+            sims = solver.run(param_values=condition_params, initials=initials).all
+            if len(condition_params) == 1:
+                sims = [sims]
+            return self._flat_simulation(sims)
+        trajectories = np.array([self._integrate(initials[i], params, solver.tspan)
+                                 for i, params in enumerate(condition_params)])
+        observables = np.dot(trajectories, self._obs_coeffs)
+        return observables[self._flat_cond_idx, self._flat_time_idx, self._flat_key_idx]
+
+    @property
+    def _model_solver(self):
+        """The solver instance used to run the model simulations."""
+        return self._ensure_solver()
+
+    def _ensure_solver(self):
+        """Build the solver instance (and the integration setup that goes
+        with it) if it hasn't been built yet.
+
+        Returns:
+            :obj: The solver instance.
+        """
+        if self._solver_instance is None:
+            if self.cache_dir is not None:
+                generate_equations_cached(self.model, self.cache_dir)
+            self._solver_instance = self.solver(self.model, tspan=self._sim_timespan,
+                                                **self.solver_kwargs)
+            self._setup_lean_sim(self._solver_instance)
+            self._tiers = list()
+            if self._lean_sim:
+                self._tiers = [(name, dict(opts)) for name, opts in self.integrator_tiers]
+                # The solver's own integrator (ScipyOdeSimulator's default is
+                # vode) is the last tier.
+                self._tiers.append((self.solver_kwargs.get('integrator', 'vode'),
+                                    self._solver_instance.opts))
+            elif len(self.integrator_tiers) > 0:
+                warnings.warn("integrator_tiers are ignored without the direct "
+                              "integration path (see _setup_lean_sim)")
+            self._tier_attempts = np.zeros(len(self._tiers), dtype=int)
+            self._tier_successes = np.zeros(len(self._tiers), dtype=int)
+            self._setup_pre_equilibration()
+        return self._solver_instance
+
+    def __getstate__(self):
+        # Solver instances can't be shared across processes, so drop it here
+        # and let the receiving process rebuild its own.
+        state = self.__dict__.copy()
+        state['_solver_instance'] = None
+        state['_eq_cache'] = None
+        return state
+
 
     def sum_norm_logpdfs_loglikelihood(self, position):
         """Compute the loglikelihood using the normal distribution estimator.
@@ -281,17 +1169,7 @@ class NestedSampleIt(object):
             float: The natural logarithm of the likelihood estimate.
 
         """
-        Y = np.copy(position)
-        params = self._param_values.copy()
-        params[self._rate_mask] = 10**Y
-        sim = self._model_solver.run(param_values=[params]).all
-        logl = 0.
-        for observable in self._like_data.keys():
-            sim_vals = sim[observable][self._data_mask[observable]]
-            logl += np.sum(self._like_data[observable].logpdf(sim_vals))
-        if np.isnan(logl):
-            return -np.inf
-        return logl
+        return self._flat_loglikelihood(position, 'snlpdf')
 
     def mse_loglikelihood(self, position):
         """Compute the loglikelihood using the negative mean squared error estimator.
@@ -303,17 +1181,7 @@ class NestedSampleIt(object):
             float: The natural logarithm of the likelihood estimate.
 
         """
-        Y = np.copy(position)
-        params = self._param_values.copy()
-        params[self._rate_mask] = 10**Y
-        sim = self._model_solver.run(param_values=[params]).all
-        logl = 0.0
-        for observable in self._like_data.keys():
-            sim_vals = sim[observable][self._data_mask[observable]]
-            logl -= np.mean((self._data[observable]-sim_vals)**2)
-        if np.isnan(logl):
-            return -np.inf
-        return logl
+        return self._flat_loglikelihood(position, 'mse')
 
     def sse_loglikelihood(self, position):
         """Compute the loglikelihood using the negative sum of squared errors estimator.
@@ -326,14 +1194,12 @@ class NestedSampleIt(object):
             float: The natural logarithm of the likelihood estimate.
 
         """
-        Y = np.copy(position)
-        params = self._param_values.copy()
-        params[self._rate_mask] = 10**Y
-        sim = self._model_solver.run(param_values=[params]).all
-        logl = 0.0
-        for observable in self._like_data.keys():
-            sim_vals = sim[observable][self._data_mask[observable]]
-            logl -= np.sum((self._data[observable]-sim_vals)**2)
+        return self._flat_loglikelihood(position, 'sse')
+
+    def _flat_loglikelihood(self, position, ll_type):
+        data, weights, logl = self._estimator_terms(ll_type)
+        residuals = self._simulate_flat(position) - data
+        logl -= np.dot(weights, residuals**2)
         if np.isnan(logl):
             return -np.inf
         return logl
@@ -349,19 +1215,93 @@ class NestedSampleIt(object):
             float: The natural logarithm of the likelihood estimate.
 
         """
-        Y = np.copy(position)
-        params = self._param_values.copy()
-        params[self._rate_mask] = 10.**Y
-        sim = self._model_solver.run(param_values=[params]).all
+        solver = self._model_solver
+        condition_params = self._condition_params(self._set_position(position))
+        # Custom loglikelihoods get the simulations over the full timespan.
+        sim = solver.run(tspan=self.timespan, param_values=condition_params,
+                         initials=self._initial_states(condition_params)).all
         logl = self._custom_loglikelihood(self.model, sim)
         if np.isnan(logl):
             return -np.inf
         return logl
 
+    def batch_loglikelihood(self, positions, num_processors=None):
+        """Compute the loglikelihoods of a set of parameter vectors at once.
+        All of the parameter vectors are simulated in a single (batched)
+        solver run and the loglikelihoods are computed together. The
+        loglikelihood estimator is the one set by the last call of the
+        instance; i.e., the log_likelihood_type or custom_loglikelihood,
+        and defaults to 'snlpdf'.
+
+        Args:
+            positions (numpy.array): The (n, ndim) array of parameter
+                vectors to compute the loglikelihoods of.
+            num_processors (int): The number of processes the solver can use
+                to run the simulations. Defaults to None, which uses the
+                num_processors of the instance.
+
+        Returns:
+            numpy.array: The natural logarithms of the n likelihood
+                estimates.
+
+        """
+        if num_processors is None:
+            num_processors = self.num_processors
+        positions = np.atleast_2d(positions)
+        n_positions = len(positions)
+        n_conditions = len(self._conditions)
+        params = np.tile(self._param_values, (n_positions, 1))
+        if self._position_map is None:
+            params[:, self._rate_idx] = np.power(10., positions)
+        else:
+            params[:, self._target_idx] = np.power(10., np.dot(positions, self._position_map)
+                                                       + self._position_offset)
+        solver = self._model_solver
+        ll_type = self._log_likelihood_type
+        if self._lean_sim and (len(self._tiers) > 1) and (ll_type != 'custom'):
+            # The batched solver run doesn't go through the integrator tiers.
+            estimator = getattr(self, _loglikelihood_methods[ll_type])
+            return np.array([estimator(position) for position in positions])
+        # Stack the conditions of all the positions for one batched run.
+        condition_params = [self._condition_params(p) for p in params]
+        initials = None
+        if self._eq_cache is not None:
+            initials = np.concatenate([self._initial_states(p) for p in condition_params])
+        params = np.concatenate(condition_params)
+        tspan = None
+        if self._log_likelihood_type == 'custom':
+            tspan = self.timespan
+        result = solver.run(tspan=tspan, param_values=params, initials=initials,
+                            num_processors=num_processors)
+        if self._log_likelihood_type == 'custom':
+            sims = result.all
+            if len(params) == 1:
+                sims = [sims]
+            if n_conditions > 1:
+                sims = [sims[i:i+n_conditions] for i in range(0, len(sims), n_conditions)]
+            logls = np.array([self._custom_loglikelihood(self.model, sim) for sim in sims])
+        else:
+            if self._lean_sim:
+                species = np.reshape(result.species, (n_positions, n_conditions,
+                                                      len(self._sim_timespan), -1))
+                observables = np.dot(species, self._obs_coeffs)
+                sim_vals = observables[:, self._flat_cond_idx, self._flat_time_idx, self._flat_key_idx]
+            else:
+                sims = result.all
+                if len(params) == 1:
+                    sims = [sims]
+                sim_vals = np.array([self._flat_simulation(sims[i:i+n_conditions])
+                                     for i in range(0, len(sims), n_conditions)])
+            data, weights, logl = self._estimator_terms(self._log_likelihood_type)
+            logls = logl - np.dot((sim_vals - data)**2, weights)
+        logls[np.isnan(logls)] = -np.inf
+        return logls
+
     def __call__(self, ns_version='built-in',
                  ns_population_size=1000, ns_kwargs=None,
                  log_likelihood_type='snlpdf',
-                 custom_loglikelihood=None):
+                 custom_loglikelihood=None, evaluation_pool=None,
+                 evaluation_timeout=None, bounded=False):
         """Call the NestedSampleIt instance to construct to instance of the NestedSampling object.
 
         Args:
@@ -387,6 +1327,28 @@ class NestedSampleIt(object):
                     function for the NS run, rather than one of the built-in
                     loglikelihood types. Defaults to None. Takes precedence
                     over (i.e., overrides) the log_likelihood_type setting.
+                evaluation_pool (:obj:gleipnir.pysb_utilities.EvaluationPool):
+                    A pool of worker processes to evaluate the loglikelihood
+                    with. If given, the pool is used as the loglikelihood
+                    function; its estimator has to match the
+                    log_likelihood_type (or custom_loglikelihood) setting.
+                    Defaults to None.
+                evaluation_timeout (float): A wall-time limit in seconds for
+                    each loglikelihood evaluation. If given, the
+                    loglikelihood is evaluated in a watchdog-managed worker
+                    process (see gleipnir.timeout_loglikelihood) and
+                    evaluations running over the limit are assigned a
+                    loglikelihood of -inf. The wrapped function is kept as
+                    the timeout_loglikelihood attribute, whose stats()
+                    reports the number of timeouts. Can't be combined with
+                    an evaluation_pool. Defaults to None.
+                bounded (bool): Give the built-in Nested Sampler the
+                    bounded_loglikelihood function, so that the evaluation
+                    of proposals can stop early once they are below the
+                    likelihood boundary (and, with loose_solver_opts, be
+                    screened at looser integrator tolerances). Otherwise, the
+                    full loglikelihood is evaluated for every proposal.
+                    Defaults to False.
 
         Returns:
             type: Description of returned object.
@@ -400,13 +1362,44 @@ class NestedSampleIt(object):
         if custom_loglikelihood is not None:
             loglikelihood = self.custom_loglikelihood
             self._custom_loglikelihood = custom_loglikelihood
+            self._log_likelihood_type = 'custom'
         else:
+            self._log_likelihood_type = log_likelihood_type
             if log_likelihood_type == 'mse':
                 loglikelihood = self.mse_loglikelihood
             elif log_likelihood_type == 'sse':
                 loglikelihood = self.sse_loglikelihood
             else:
                 loglikelihood = self.sum_norm_logpdfs_loglikelihood
+        batch_loglikelihood = self.batch_loglikelihood
+        bounded_loglikelihood = None
+        if bounded:
+            bounded_loglikelihood = self.bounded_loglikelihood
+        if (evaluation_pool is not None) and (evaluation_timeout is not None):
+            # The watchdog process can't drive the pool's workers.
+            raise ValueError("evaluation_timeout can't be combined with an "
+                             "evaluation_pool.")
+        if evaluation_pool is not None:
+            # The workers' estimator is fixed when the pool is built.
+            if evaluation_pool.log_likelihood_type != self._log_likelihood_type:
+                raise ValueError("The evaluation_pool estimator ({}) does not "
+                                 "match the log_likelihood_type ({}).".format(evaluation_pool.log_likelihood_type,
+                                                                              self._log_likelihood_type))
+            if evaluation_pool.custom_loglikelihood is not custom_loglikelihood:
+                raise ValueError("The evaluation_pool was built with a "
+                                 "different custom_loglikelihood.")
+            loglikelihood = evaluation_pool
+            batch_loglikelihood = evaluation_pool.batch_loglikelihood
+            if bounded:
+                bounded_loglikelihood = evaluation_pool.bounded_loglikelihood
+        if evaluation_timeout is not None:
+            from gleipnir.timeout_loglikelihood import TimeoutLoglikelihood
+            loglikelihood = TimeoutLoglikelihood(loglikelihood,
+                                                 evaluation_timeout)
+            self.timeout_loglikelihood = loglikelihood
+            # Every evaluation has to go through the watchdog.
+            batch_loglikelihood = None
+            bounded_loglikelihood = None
         if ns_version == 'built-in':
             from gleipnir.nestedsampling import NestedSampling
             from gleipnir.nestedsampling.samplers import MetropolisComponentWiseHardNSRejection
@@ -424,7 +1417,9 @@ class NestedSampleIt(object):
                                 loglikelihood=loglikelihood,
                                 sampler=sampler,
                                 population_size=population_size,
-                                stopping_criterion=stopping_criterion)
+                                stopping_criterion=stopping_criterion,
+                                batch_loglikelihood=batch_loglikelihood,
+                                bounded_loglikelihood=bounded_loglikelihood)
             # self._nested_sampler = NS
         elif ns_version == 'multinest':
             from gleipnir.multinest import MultiNestNestedSampling
@@ -444,7 +1439,7 @@ class NestedSampleIt(object):
             if not ('num_steps' in list(self._ns_kwargs.keys())):
                 self._ns_kwargs['num_steps'] = 100*population_size
                 # num_steps = 100*population_size
-            nested_sampler = DNest4NestedSampling(sampled_parameters=sampled_parameters,
+            nested_sampler = DNest4NestedSampling(sampled_parameters=self._sampled_parameters,
                                            loglikelihood=loglikelihood,
                                            population_size=population_size,
                                            **self._ns_kwargs)
@@ -536,10 +1531,10 @@ if __name__ == '__main__':
     out_file.write("from pysb.simulator import ScipyOdeSimulator\n")
     out_file.write("import numpy as np\n")
     out_file.write("from scipy.stats import norm,uniform\n")
-    out_file.write("from gleipnir.nested_sampling import NestedSampling\n")
-    out_file.write("from gleipnir.samplers import MetropolisComponentWiseHardNSRejection\n")
+    out_file.write("from gleipnir.nestedsampling import NestedSampling\n")
+    out_file.write("from gleipnir.nestedsampling.samplers import MetropolisComponentWiseHardNSRejection\n")
     out_file.write("from gleipnir.sampled_parameter import SampledParameter\n")
-    out_file.write("from gleipnir.stopping_criterion import NumberOfIterations\n")
+    out_file.write("from gleipnir.nestedsampling.stopping_criterion import NumberOfIterations\n")
 
     #out_file.write("import inspect\n")
     #out_file.write("import os.path\n")
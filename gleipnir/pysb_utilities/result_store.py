@@ -0,0 +1,300 @@
+"""Defines the ResultStore class for persisting model selection results.
+
+A ResultStore keeps the outcome of each model's Nested Sampling run on disk,
+so that model selection campaigns (e.g., with HypSelector or ModelSelector)
+can skip models that were already run and resume ones that were interrupted.
+Summary values are kept in an SQLite database and larger per-model artifacts
+(e.g., the dead points) are saved as numpy .npz files.
+
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+_columns = [('key', 'TEXT PRIMARY KEY'),
+            ('model_name', 'TEXT'),
+            ('model_hash', 'TEXT'),
+            ('data_hash', 'TEXT'),
+            ('config_hash', 'TEXT'),
+            ('status', 'TEXT'),
+            ('log_evidence', 'REAL'),
+            ('log_evidence_error', 'REAL'),
+            ('max_loglikelihood', 'REAL'),
+            ('n_params', 'INTEGER'),
+            ('n_data', 'INTEGER'),
+            ('aic', 'REAL'),
+            ('bic', 'REAL'),
+            ('dic', 'REAL'),
+            ('run_time', 'REAL'),
+            ('n_iterations', 'INTEGER'),
+            ('updated', 'REAL')]
+_column_names = [column[0] for column in _columns]
+
+def hash_file(filename):
+    """SHA1 hash of a file's contents."""
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def hash_model(model):
+    """SHA1 hash of a PySB model's definition.
+    The hash is computed from the flat PySB export of the model, ignoring
+    comment lines, so that it doesn't depend on the model's name.
+    """
+    from pysb.export import export
+    flat = export(model, 'pysb_flat')
+    lines = [line for line in flat.splitlines() if not line.startswith('#')]
+    return hashlib.sha1('\n'.join(lines).encode()).hexdigest()
+
+def hash_data(observable_data, timespan):
+    """SHA1 hash of the observable data and timespan used for fitting."""
+    sha = hashlib.sha1()
+    sha.update(np.ascontiguousarray(timespan, dtype=float).tobytes())
+    for key in sorted(observable_data.keys()):
+        sha.update(str(key).encode())
+        for item in observable_data[key]:
+            if item is None:
+                sha.update(b'None')
+            elif isinstance(item, str):
+                # Data given as .npy file names.
+                sha.update(hash_file(item).encode())
+            else:
+                sha.update(np.ascontiguousarray(item).tobytes())
+    return sha.hexdigest()
+
+def hash_config(config):
+    """SHA1 hash of a dict of Nested Sampling settings."""
+    encoded = json.dumps(config, sort_keys=True, default=repr)
+    return hashlib.sha1(encoded.encode()).hexdigest()
+
+def summarize_run(nested_sampler, n_data):
+    """Get the evidence, information criteria, and run stats of a finished
+    Nested Sampling run, as stored in a ResultStore record.
+
+    Args:
+        nested_sampler (:obj:): The Nested Sampler after its run.
+        n_data (int): The number of data points the model was fit to.
+
+    Returns:
+        dict: The record values of the run.
+    """
+    summary = dict()
+    summary['log_evidence'] = nested_sampler.log_evidence
+    summary['log_evidence_error'] = nested_sampler.log_evidence_error
+    summary['max_loglikelihood'] = nested_sampler.max_loglikelihood()
+    summary['n_params'] = len(nested_sampler.sampled_parameters)
+    summary['n_data'] = n_data
+    summary['aic'] = nested_sampler.akaike_ic()
+    summary['bic'] = nested_sampler.bayesian_ic(n_data)
+    summary['dic'] = nested_sampler.deviance_ic()
+    summary['n_iterations'] = getattr(nested_sampler, '_n_iterations', None)
+    return summary
+
+
+class ResultStore(object):
+    """Persistent on-disk store for the Nested Sampling results of models.
+
+    Each record is keyed by a combination of the model hash, data hash, and
+    the Nested Sampling configuration hash; see the hash_model, hash_file,
+    hash_data, and hash_config functions.
+
+    Args:
+        path (str): The directory to keep the store in. It is created if it
+            doesn't exist.
+
+    Attributes:
+        path (str): The absolute path of the store directory.
+
+    """
+
+    def __init__(self, path):
+        """Inits ResultStore."""
+        self.path = os.path.abspath(path)
+        try:
+            os.makedirs(os.path.join(self.path, 'artifacts'))
+        except OSError:
+            pass
+        self._db_file = os.path.join(self.path, 'results.db')
+        table = ", ".join(["{} {}".format(*column) for column in _columns])
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS runs ({})".format(table))
+        return
+
+    @contextlib.contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self._db_file, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def run_key(model_hash, data_hash, config_hash):
+        """The record key for a model, dataset and configuration."""
+        key = "{}:{}:{}".format(model_hash, data_hash, config_hash)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Get a record.
+
+        Returns:
+            dict or None: The record, or None if there isn't one for the key.
+        """
+        with self._connect() as con:
+            row = con.execute("SELECT * FROM runs WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(_column_names, row))
+
+    def status(self, key):
+        """str or None: The status ('running' or 'complete') of a record."""
+        record = self.get(key)
+        if record is None:
+            return None
+        return record['status']
+
+    def mark_running(self, key, model_name, model_hash, data_hash, config_hash):
+        """Flag the start of a model's run."""
+        with self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO runs (key, model_name, "
+                        "model_hash, data_hash, config_hash, status, updated) "
+                        "VALUES (?, ?, ?, ?, ?, 'running', ?)",
+                        (key, model_name, model_hash, data_hash, config_hash,
+                         time.time()))
+        return
+
+    def record(self, key, summary, dead_points=None):
+        """Record the results of a finished run.
+
+        Args:
+            key (str): The record key.
+            summary (dict): The values to store, keyed by column name; e.g.
+                log_evidence, log_evidence_error, max_loglikelihood, aic, bic,
+                dic, run_time, or n_iterations.
+            dead_points (pandas.DataFrame): The dead points of the run, which
+                are saved in the run's .npz artifact. Defaults to None.
+        """
+        values = {name: summary[name] for name in _column_names[1:] if name in summary}
+        values['status'] = 'complete'
+        values['updated'] = time.time()
+        for name in values:
+            if isinstance(values[name], np.generic):
+                values[name] = values[name].item()
+        assignments = ", ".join(["{}=?".format(name) for name in values])
+        with self._connect() as con:
+            con.execute("UPDATE runs SET {} WHERE key=?".format(assignments),
+                        list(values.values()) + [key])
+        if dead_points is not None:
+            np.savez(self.artifact_file(key),
+                     columns=np.array([str(c) for c in dead_points.columns]),
+                     values=dead_points.to_numpy())
+        checkpoint = self.checkpoint_file(key)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        return
+
+    def artifact_file(self, key):
+        """str: The .npz artifact file of a record."""
+        return os.path.join(self.path, 'artifacts', "{}.npz".format(key))
+
+    def checkpoint_file(self, key):
+        """str: The checkpoint file of a record's unfinished run."""
+        return os.path.join(self.path, 'artifacts', "{}.pkl".format(key))
+
+    def run_dir(self, key):
+        """str: The directory for any output files of a record's run."""
+        return os.path.join(self.path, 'runs', key)
+
+    def save_checkpoint(self, key, nested_sampler):
+        """Pickle an unfinished Nested Sampler so its run can be resumed."""
+        checkpoint = self.checkpoint_file(key)
+        with open(checkpoint + '.tmp', 'wb') as f:
+            pickle.dump(nested_sampler, f)
+        os.replace(checkpoint + '.tmp', checkpoint)
+        return
+
+    def run_checkpointed(self, key, nested_sampler, checkpoint_interval=None):
+        """Run a Nested Sampler to completion, checkpointing it every
+        checkpoint_interval iterations. Only Nested Samplers that can be
+        advanced in steps (i.e., the built-in one) are checkpointed.
+
+        Returns:
+            :obj: The Nested Sampler after its run.
+        """
+        if (checkpoint_interval is not None) and hasattr(nested_sampler, 'advance'):
+            while not nested_sampler.advance(checkpoint_interval):
+                self.save_checkpoint(key, nested_sampler)
+        nested_sampler.run()
+        return nested_sampler
+
+    def load_checkpoint(self, key):
+        """Load the checkpointed Nested Sampler of a record.
+
+        Returns:
+            :obj: or None: The Nested Sampler, or None if there is no
+                checkpoint for the key.
+        """
+        checkpoint = self.checkpoint_file(key)
+        if not os.path.exists(checkpoint):
+            return None
+        with open(checkpoint, 'rb') as f:
+            return pickle.load(f)
+
+    def dead_points(self, key):
+        """pandas.DataFrame or None: The saved dead points of a record."""
+        artifact = self.artifact_file(key)
+        if not os.path.exists(artifact):
+            return None
+        with np.load(artifact) as npz:
+            return pd.DataFrame(npz['values'], columns=list(npz['columns']))
+
+    def query(self, data_hash=None, config_hash=None, status='complete'):
+        """Query the stored records.
+
+        Args:
+            data_hash (str): Only return records for this dataset.
+                Defaults to None.
+            config_hash (str): Only return records for this configuration.
+                Defaults to None.
+            status (str): Only return records with this status. If None, all
+                records are returned. Defaults to 'complete'.
+
+        Returns:
+            pandas.DataFrame: The matching records sorted in descending order
+                by the log_evidence.
+        """
+        conditions = list()
+        args = list()
+        for name, value in (('data_hash', data_hash),
+                            ('config_hash', config_hash),
+                            ('status', status)):
+            if value is not None:
+                conditions.append("{}=?".format(name))
+                args.append(value)
+        sql = "SELECT * FROM runs"
+        if len(conditions) > 0:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY log_evidence DESC"
+        with self._connect() as con:
+            rows = con.execute(sql, args).fetchall()
+        return pd.DataFrame(rows, columns=_column_names)
+
+    def best_model(self, data_hash, config_hash=None):
+        """Get the record with the largest log_evidence for a dataset.
+
+        Returns:
+            dict or None: The record, or None if there are no complete
+                records for the dataset.
+        """
+        frame = self.query(data_hash=data_hash, config_hash=config_hash)
+        if len(frame) == 0:
+            return None
+        return frame.iloc[0].to_dict()
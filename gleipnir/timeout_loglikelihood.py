@@ -0,0 +1,167 @@
+"""Wall-time limited log-likelihood evaluation.
+
+This module defines the TimeoutLoglikelihood class, which wraps a
+log-likelihood function so that each evaluation is run in a watchdog-managed
+worker process with a wall-time limit. Evaluations that run over the limit
+(e.g., stuck ODE solves for stiff parameter combinations) are abandoned and
+assigned a log-likelihood of -inf, and the worker process is replaced.
+
+
+"""
+
+import multiprocessing
+import time
+
+import numpy as np
+
+def _worker_loop(loglikelihood, connection):
+    """Evaluate the positions sent over the connection until it is closed."""
+    while True:
+        try:
+            position = connection.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            logl = loglikelihood(position)
+        except Exception:
+            logl = -np.inf
+        connection.send(logl)
+    return
+
+
+class TimeoutLoglikelihood(object):
+    """A log-likelihood function with a wall-time limit on each evaluation.
+    The wrapped function is evaluated in a separate worker process. If an
+    evaluation doesn't finish within the timeout, the worker is terminated
+    and replaced by a new one, and -inf is returned for the evaluation.
+    Evaluations that raise an exception also return -inf. Instances can be
+    used in place of the log-likelihood function for any of the Nested
+    Sampling backends.
+
+    Args:
+        loglikelihood (function): The log-likelihood function to wrap. It
+            has to be picklable if the 'spawn' start method is used.
+        timeout (float): The wall-time limit in seconds for each evaluation.
+        start_method (str): The multiprocessing start method for the worker
+            processes. Defaults to None, which uses the default start method.
+
+    Attributes:
+        loglikelihood
+        timeout
+        n_calls (int): The number of evaluations.
+        n_timeouts (int): The number of evaluations that timed out.
+        n_errors (int): The number of evaluations whose worker process died.
+        n_restarts (int): The number of times the worker process was
+            replaced.
+        timeout_positions (list of numpy.array): The positions whose
+            evaluations timed out.
+
+    """
+
+    def __init__(self, loglikelihood, timeout, start_method=None):
+        """Inits TimeoutLoglikelihood."""
+        self.loglikelihood = loglikelihood
+        self.timeout = timeout
+        self.start_method = start_method
+        self.n_calls = 0
+        self.n_timeouts = 0
+        self.n_errors = 0
+        self.n_restarts = 0
+        self.timeout_positions = list()
+        self._total_time = 0.
+        self._max_time = 0.
+        self._process = None
+        self._connection = None
+        return
+
+    def _start(self):
+        context = multiprocessing.get_context(self.start_method)
+        parent_connection, child_connection = context.Pipe()
+        self._process = context.Process(target=_worker_loop,
+                                        args=(self.loglikelihood, child_connection),
+                                        daemon=True)
+        self._process.start()
+        child_connection.close()
+        self._connection = parent_connection
+        return
+
+    def _restart(self):
+        self.close()
+        self.n_restarts += 1
+        self._start()
+        return
+
+    def __call__(self, position):
+        """Compute the log-likelihood of a position within the time limit.
+
+        Args:
+            position (numpy.array): The parameter vector.
+
+        Returns:
+            float: The log-likelihood, or -inf if the evaluation timed out
+                or failed.
+        """
+        if self._process is None:
+            self._start()
+        self.n_calls += 1
+        start_time = time.time()
+        try:
+            self._connection.send(position)
+            if self._connection.poll(self.timeout):
+                logl = self._connection.recv()
+            else:
+                self.n_timeouts += 1
+                self.timeout_positions.append(np.array(position, copy=True))
+                logl = -np.inf
+                self._restart()
+        except (EOFError, OSError):
+            # The worker died during the evaluation.
+            self.n_errors += 1
+            logl = -np.inf
+            self._restart()
+        run_time = time.time() - start_time
+        self._total_time += run_time
+        self._max_time = max(self._max_time, run_time)
+        return logl
+
+    def stats(self):
+        """Statistics of the evaluations.
+
+        Returns:
+            dict: The n_calls, n_timeouts, n_errors, n_restarts, the
+                timeout_fraction, and the mean_time and max_time (in seconds)
+                of the evaluations.
+        """
+        return {'n_calls': self.n_calls,
+                'n_timeouts': self.n_timeouts,
+                'n_errors': self.n_errors,
+                'n_restarts': self.n_restarts,
+                'timeout_fraction': self.n_timeouts/max(self.n_calls, 1),
+                'mean_time': self._total_time/max(self.n_calls, 1),
+                'max_time': self._max_time}
+
+    def close(self):
+        """Stop the worker process."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process.join()
+            self._process = None
+        return
+
+    def __getstate__(self):
+        # The worker process stays with this instance; copies (e.g., in other
+        # processes) start their own.
+        state = self.__dict__.copy()
+        state['_process'] = None
+        state['_connection'] = None
+        return state
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,114 @@
+"""
+Tests for the HypSelector model selection summaries and runs.
+"""
+
+import gc
+import hashlib
+import sys
+import weakref
+import pytest
+import numpy as np
+
+pytest.importorskip('HypBuilder')
+from gleipnir.pysb_utilities.hyp_selector import HypSelector
+
+_model_template = """from pysb import *
+
+Model()
+Monomer('A')
+Monomer('B')
+Parameter('A_0', 100.)
+Parameter('k_f', {k_f})
+Parameter('k_r', 0.05)
+Initial(A(), A_0)
+Rule('conv', A() | B(), k_f, k_r)
+Observable('A_obs', A())
+Observable('B_obs', B())
+"""
+
+@pytest.fixture
+def selector(tmpdir, monkeypatch):
+    """A HypSelector with three cached A <-> B model variants."""
+    monkeypatch.chdir(tmpdir)
+    # The models are imported from the hb_models package in the working dir.
+    monkeypatch.syspath_prepend(str(tmpdir))
+    for name in ['models.csv', 'library.txt']:
+        tmpdir.join(name).write(name)
+    sha = hashlib.sha1()
+    for name in ['models.csv', 'library.txt']:
+        sha.update(tmpdir.join(name).read_binary())
+    assembly_dir = tmpdir.mkdir('cache').mkdir('hypbuilder').mkdir(sha.hexdigest())
+    for i, k_f in enumerate([0.01, 0.1, 1.]):
+        assembly_dir.join("model_{}.py".format(i)).write(_model_template.format(k_f=k_f))
+    yield HypSelector('models.csv', hb_library='library.txt',
+                      cache_dir=str(tmpdir.join('cache')))
+    # The next selector has its own hb_models package.
+    for name in list(sys.modules.keys()):
+        if name.split('.')[0] == 'hb_models':
+            del sys.modules[name]
+
+def _summary(log_evidence, max_loglikelihood):
+    return {'log_evidence': log_evidence, 'log_evidence_error': 0.1,
+            'max_loglikelihood': max_loglikelihood, 'n_params': 2,
+            'n_data': 10, 'dic': -2.*max_loglikelihood + 2.}
+
+def test_summaries_skip_missing_models(selector):
+    assert selector.number_of_models() == 3
+    selector._update_selection(0, _summary(-10., -5.))
+    selector._update_selection(2, _summary(-12., -6.))
+    with pytest.warns(UserWarning):
+        log_bf = selector.log_bayes_factors()
+    assert list(log_bf.columns) == ['model_0', 'model_2']
+    assert np.isclose(log_bf.loc['model_2', 'model_0'], 2.)
+    with pytest.warns(UserWarning):
+        probabilities = selector.model_probabilities()
+    assert list(probabilities['model']) == ['model_0', 'model_2']
+    assert np.isclose(probabilities['probability'].sum(), 1.)
+    with pytest.warns(UserWarning):
+        aic = selector.akaike_ic()
+    assert list(aic['model']) == ['model_0', 'model_2']
+    assert np.allclose(aic['AIC'], [14., 16.])
+    with pytest.warns(UserWarning):
+        summary = selector.summary()
+    assert 'AIC' not in summary.columns
+    assert list(summary['model']) == ['model_0', 'model_2']
+
+def test_streaming_releases_models(selector, monkeypatch):
+    load_model = HypSelector._load_model
+    run_batch = HypSelector._run_batch
+    model_refs = list()
+    released = list()
+    def tracked_load_model(self, i):
+        model = load_model(self, i)
+        model_refs.append(weakref.ref(model))
+        return model
+    def tracked_run_batch(self, batch, *args):
+        # The models of the earlier batches should already be unreachable.
+        gc.collect()
+        released.append([ref() is None for ref in model_refs[:-len(batch)]])
+        return run_batch(self, batch, *args)
+    monkeypatch.setattr(HypSelector, '_load_model', tracked_load_model)
+    monkeypatch.setattr(HypSelector, '_run_batch', tracked_run_batch)
+    timespan = np.linspace(0., 10., 11)
+    data = np.array([100.*np.exp(-0.15*t) + 33.3 for t in timespan])
+    selection = selector.run_nested_sampling_streaming(timespan,
+                                                       {'A_obs': (data, np.ones(11), None)},
+                                                       batch_size=1,
+                                                       solver_kwargs={'compiler': 'python'},
+                                                       ns_population_size=4)
+    assert len(selection) == 3
+    assert released == [[], [True], [True, True]]
+    gc.collect()
+    assert all(ref() is None for ref in model_refs)
+    assert 'hb_models.model_0' not in sys.modules
+    assert not hasattr(sys.modules['hb_models'], 'model_0')
+
+def test_n_data_counts_npy_file_data(selector, tmpdir):
+    data = np.linspace(100., 50., 11)
+    data_file = str(tmpdir.join('A_obs.npy'))
+    np.save(data_file, data)
+    selector._set_ns_settings(np.linspace(0., 10., 11),
+                              {'A_obs': (data_file, np.ones(11), None),
+                               'B_obs': (list(100. - data), np.ones(11), None)},
+                              None, None, 'built-in', 4, None, 'snlpdf')
+    assert selector._n_data() == 22
@@ -0,0 +1,94 @@
+"""
+Tests for the configuration handling and command line runs of the job runner.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import gleipnir
+from gleipnir.pysb_utilities.job_runner import load_config, expand_jobs, load_data
+from gleipnir.pysb_utilities.result_store import ResultStore
+
+_model_file = """from pysb import *
+
+Model()
+Monomer('A')
+Monomer('B')
+Parameter('A_0', 100.)
+Parameter('k_f', 0.1)
+Parameter('k_r', 0.05)
+Initial(A(), A_0)
+Rule('conv', A() | B(), k_f, k_r)
+Observable('A_obs', A())
+"""
+
+
+def test_expand_jobs(tmpdir):
+    config = {'population_size': 100, 'data': 'data.csv',
+              'jobs': [{'model': 'model_a.py'},
+                       {'model': 'model_b.py', 'population_size': 200}]}
+    config_file = str(tmpdir.join('config.json'))
+    with open(config_file, 'w') as f:
+        json.dump(config, f)
+    jobs = expand_jobs(load_config(config_file), base_dir=str(tmpdir))
+    assert [job['name'] for job in jobs] == ['model_a', 'model_b']
+    assert [job['population_size'] for job in jobs] == [100, 200]
+    assert jobs[0]['data'] == str(tmpdir.join('data.csv'))
+
+def test_load_data(tmpdir):
+    data_file = str(tmpdir.join('data.csv'))
+    pd.DataFrame({'time': [1., 2., 3.],
+                  'obs': [1., np.nan, 3.],
+                  'obs_sd': [0.1, 0.1, 0.1]}).to_csv(data_file, index=False)
+    timespan, observable_data = load_data(data_file)
+    assert np.allclose(timespan, [0., 1., 2., 3.])
+    data, sigma, time_idx = observable_data['obs']
+    assert np.allclose(data, [1., 3.])
+    assert np.allclose(sigma, [0.1, 0.1])
+    assert list(time_idx) == [1, 3]
+    timespan, observable_data = load_data(data_file, {'start': 0., 'stop': 3., 'num': 7})
+    assert list(observable_data['obs'][2]) == [2, 6]
+
+def _run_cli(config_file):
+    env = dict(os.environ)
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(gleipnir.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([package_dir, env.get('PYTHONPATH', '')])
+    return subprocess.run([sys.executable, '-m', 'gleipnir', 'run', config_file],
+                          env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, universal_newlines=True)
+
+def test_cli_rerun_skips_complete_jobs(tmpdir):
+    tmpdir.join('model_a.py').write(_model_file)
+    tmpdir.join('model_b.py').write(_model_file.replace("0.05", "0.5"))
+    times = np.linspace(1., 10., 10)
+    pd.DataFrame({'time': times, 'A_obs': 33. + 67.*np.exp(-0.15*times),
+                  'A_obs_sd': np.ones(10)}).to_csv(str(tmpdir.join('data.csv')), index=False)
+    config = {'data': 'data.csv', 'population_size': 5,
+              'stopping': {'n_iterations': 20}, 'checkpoint_interval': 5,
+              'solver_kwargs': {'compiler': 'python'}, 'seed': 1,
+              'jobs': [{'model': 'model_a.py'}]}
+    config_file = str(tmpdir.join('config.json'))
+    with open(config_file, 'w') as f:
+        json.dump(config, f)
+    first = _run_cli(config_file)
+    assert first.returncode == 0, first.stdout
+    assert "Finished job model_a" in first.stdout
+    store = ResultStore(str(tmpdir.join('gleipnir_runs')))
+    record = store.query(status='complete').iloc[0]
+    # Rerun with a new job; only the new one is run.
+    config['jobs'].append({'model': 'model_b.py'})
+    with open(config_file, 'w') as f:
+        json.dump(config, f)
+    second = _run_cli(config_file)
+    assert second.returncode == 0, second.stdout
+    assert "Skipping complete job model_a." in second.stdout
+    assert "Finished job model_a" not in second.stdout
+    assert "Finished job model_b" in second.stdout
+    records = store.query(status='complete')
+    assert sorted(records['model_name']) == ['model_a', 'model_b']
+    rerun = records[records['model_name'] == 'model_a'].iloc[0]
+    assert rerun['updated'] == record['updated']
+    assert rerun['log_evidence'] == record['log_evidence']
@@ -91,6 +91,44 @@ def test_func_deviance_ic():
     MNNS = shared['MNNS']
     dic = MNNS.deviance_ic()
 
+def test_func_cached_output():
+    MNNS = shared['MNNS']
+    result = MNNS.result
+    assert result is MNNS.result
+    assert os.path.exists(MNNS.multinest_file_root + 'data.npy')
+    assert np.isclose(MNNS.max_loglikelihood(), result.max_loglikelihood())
+    mode_stats = MNNS.mode_stats
+    assert len(mode_stats) >= 1
+    assert MNNS.mode_stats is mode_stats
+
+def test_func_run_in_memory():
+    MNNS = MultiNestNestedSampling(sampled_parameters=sampled_parameters,
+                                   loglikelihood=loglikelihood,
+                                   population_size=population_size,
+                                   in_memory=True)
+    MNNS.multinest_file_root = 'multinest_in_memory_'
+    log_evidence, log_evidence_error = MNNS.run(verbose=False)
+    analytic = analytic_log_evidence(ndim, width)
+    assert np.isclose(log_evidence, analytic, rtol=1.e-1)
+    assert len(glob.glob("./multinest_in_memory_*")) == 0
+    posteriors = MNNS.posteriors()
+    assert len(posteriors) == len(sampled_parameters)
+    assert np.isfinite(MNNS.max_loglikelihood())
+
+def test_func_in_memory_matches_file_mode():
+    runs = list()
+    for in_memory in [False, True]:
+        MNNS = MultiNestNestedSampling(sampled_parameters=sampled_parameters,
+                                       loglikelihood=loglikelihood,
+                                       population_size=population_size,
+                                       in_memory=in_memory, seed=11)
+        MNNS.multinest_file_root = 'multinest_run_seeded_'
+        MNNS.run(verbose=False)
+        runs.append(MNNS)
+    file_mode, in_memory = runs
+    assert np.isclose(in_memory.evidence, file_mode.evidence)
+    assert np.isclose(in_memory.evidence_error, file_mode.evidence_error)
+
 def test_cleanup():
     # Clean-up the MultiNest output files
     for f in glob.glob("./multinest_run*"):
@@ -105,4 +143,7 @@ if __name__ == '__main__':
     test_func_akaike_ic()
     test_func_bayesian_ic()
     test_func_deviance_ic()
+    test_func_cached_output()
+    test_func_run_in_memory()
+    test_func_in_memory_matches_file_mode()
     test_cleanup()
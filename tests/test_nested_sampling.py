@@ -85,6 +85,16 @@ def test_func_posteriors():
     keys = list(posteriors.keys())
     assert len(keys) == len(sampled_parameters)
 
+def test_func_posterior_moments():
+    NS = shared['NS']
+    moments = NS.posterior_moments()
+    assert len(moments) == len(sampled_parameters)
+    dead_points = NS.dead_points
+    weights = dead_points['weight']*np.exp(dead_points['log_l'])
+    mean = np.average(dead_points[0], weights=weights)
+    assert np.isclose(moments[0][0], mean)
+    assert NS.posterior_moments() is moments
+
 def test_func_akaike_ic():
     NS = shared['NS']
     aic = NS.akaike_ic()
@@ -97,6 +107,59 @@ def test_func_deviance_ic():
     NS = shared['NS']
     dic = NS.deviance_ic()
 
+def test_func_advance():
+    NS = NestedSampling(sampled_parameters=sampled_parameters,
+                        loglikelihood=loglikelihood,
+                        sampler = sampler,
+                        population_size=population_size,
+                        stopping_criterion=stopping_criterion)
+    finished = NS.advance(10)
+    assert not finished
+    lower, upper = NS.log_evidence_bounds()
+    assert lower <= upper
+    finished = NS.advance(1000)
+    assert finished
+    log_evidence, log_evidence_error = NS.run()
+    analytic = analytic_log_evidence(ndim, width)
+    assert np.isclose(log_evidence, analytic, rtol=1.)
+    assert NS.log_evidence_bounds() == (log_evidence, log_evidence)
+
+def test_func_run_batch_loglikelihood():
+    calls = list()
+    def batch_loglikelihood(sampled_parameter_vectors):
+        calls.append(len(sampled_parameter_vectors))
+        return np.array([loglikelihood(spv) for spv in sampled_parameter_vectors])
+    NS = NestedSampling(sampled_parameters=sampled_parameters,
+                        loglikelihood=loglikelihood,
+                        sampler = sampler,
+                        population_size=population_size,
+                        stopping_criterion=NumberOfIterations(120),
+                        batch_loglikelihood=batch_loglikelihood)
+    log_evidence, log_evidence_error = NS.run()
+    assert calls == [population_size]
+    analytic = analytic_log_evidence(ndim, width)
+    assert np.isclose(log_evidence, analytic, rtol=1.)
+
+def test_func_run_bounded_loglikelihood():
+    boundaries = list()
+    def bounded_loglikelihood(sampled_parameter_vector, ns_boundary):
+        boundaries.append(ns_boundary)
+        logl = loglikelihood(sampled_parameter_vector)
+        if logl <= ns_boundary:
+            return -np.inf
+        return logl
+    NS = NestedSampling(sampled_parameters=sampled_parameters,
+                        loglikelihood=loglikelihood,
+                        sampler = sampler,
+                        population_size=population_size,
+                        stopping_criterion=NumberOfIterations(120),
+                        bounded_loglikelihood=bounded_loglikelihood)
+    log_evidence, log_evidence_error = NS.run()
+    assert len(boundaries) > 0
+    assert np.all(np.isfinite(NS.dead_points['log_l'].values))
+    analytic = analytic_log_evidence(ndim, width)
+    assert np.isclose(log_evidence, analytic, rtol=1.)
+
 
 if __name__ == '__main__':
     test_initialization()
@@ -104,6 +167,10 @@ if __name__ == '__main__':
     test_func_run()
     test_properties()
     test_func_posteriors()
+    test_func_posterior_moments()
     test_func_akaike_ic()
     test_func_bayesian_ic()
     test_func_deviance_ic()
+    test_func_advance()
+    test_func_run_batch_loglikelihood()
+    test_func_run_bounded_loglikelihood()
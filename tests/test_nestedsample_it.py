@@ -0,0 +1,420 @@
+"""
+Tests for the NestedSampleIt likelihood machinery, using a two-species
+reversible conversion model, A <-> B.
+"""
+
+import numpy as np
+import pytest
+from scipy.stats import norm, uniform
+from pysb.builder import Builder
+from pysb.bng import generate_equations
+from pysb.simulator import BngSimulator, ScipyOdeSimulator
+from gleipnir.pysb_utilities.nestedsample_it import NestedSampleIt, NestIt, generate_equations_cached, reduce_observations
+from gleipnir.pysb_utilities.evaluation_pool import EvaluationPool
+
+
+def two_species_model():
+    """A fresh A <-> B model, with A(0) = 100 and the fraction of A as an
+    expression."""
+    builder = Builder()
+    A = builder.monomer('A')
+    B = builder.monomer('B')
+    A_0 = builder.parameter('A_0', 100.)
+    k_f = builder.parameter('k_f', 0.1)
+    k_r = builder.parameter('k_r', 0.05)
+    builder.initial(A(), A_0)
+    builder.rule('conv', A() | B(), k_f, k_r)
+    A_obs = builder.observable('A_obs', A())
+    builder.observable('B_obs', B())
+    builder.expression('A_fraction', A_obs/A_0)
+    return builder.model
+
+timespan = np.linspace(0., 20., 21)
+data_sd = np.full(len(timespan), 2.)
+
+def two_species_data(model):
+    """Noisy A_obs data from the model at its nominal rates."""
+    solver = ScipyOdeSimulator(model, tspan=timespan, compiler='python')
+    data = solver.run().observables['A_obs']
+    data = data + np.random.RandomState(0).normal(scale=data_sd)
+    return {'A_obs': (data, data_sd, None)}
+
+def rate_nest_it(model):
+    """Samples log10(k_f) and log10(k_r), in that order."""
+    nest_it = NestIt()
+    nest_it(model.parameters['k_f'], uniform(loc=-3., scale=3.))
+    nest_it(model.parameters['k_r'], uniform(loc=-3., scale=3.))
+    return nest_it
+
+def reference_loglikelihood(model, observable_data, parameters, integrator='vode'):
+    """The snlpdf loglikelihood from a full ScipyOdeSimulator run with the
+    parameter values keyed to their names in parameters."""
+    solver = ScipyOdeSimulator(model, tspan=timespan, compiler='python',
+                               integrator=integrator)
+    param_values = [parameters.get(param.name, param.value) for param in model.parameters]
+    simulated = solver.run(param_values=[param_values]).observables['A_obs']
+    data, sd, _ = observable_data['A_obs']
+    return np.sum(norm.logpdf(data, loc=simulated, scale=sd))
+
+
+def _network(model):
+    species = [str(species) for species in model.species]
+    reactions = [(reaction['reactants'], reaction['products'], str(reaction['rate']))
+                 for reaction in model.reactions]
+    return species, reactions
+
+def test_generate_equations_cached(tmpdir):
+    reference = two_species_model()
+    generate_equations(reference)
+    # The first call runs BioNetGen and the second loads the cached network.
+    for i in range(2):
+        model = two_species_model()
+        generate_equations_cached(model, str(tmpdir))
+        assert len(tmpdir.join('networks').listdir()) == 1
+        assert _network(model) == _network(reference)
+        assert len(model.reactions_bidirectional) == len(reference.reactions_bidirectional)
+
+def test_lean_loglikelihood_matches_simulator():
+    model = two_species_model()
+    observable_data = two_species_data(model)
+    for integrator in ['vode', 'lsoda']:
+        sample_it = NestedSampleIt(model, observable_data, timespan,
+                                   solver_kwargs={'compiler': 'python',
+                                                  'integrator': integrator},
+                                   nest_it=rate_nest_it(model))
+        for position in [[-1., -1.3], [-0.3, -2.], [-1.7, -0.7]]:
+            logl = sample_it.sum_norm_logpdfs_loglikelihood(np.array(position))
+            # The species are integrated directly rather than through run.
+            assert sample_it._lean_sim
+            k_f, k_r = 10.**np.array(position)
+            parameters = {'k_f': k_f, 'k_r': k_r}
+            assert np.isclose(logl, reference_loglikelihood(model, observable_data,
+                                                            parameters, integrator),
+                              rtol=1e-10)
+
+def test_batch_loglikelihood_matches_per_point():
+    model = two_species_model()
+    observable_data = two_species_data(model)
+    positions = np.array([[-1., -1.3], [-0.3, -2.], [-1.7, -0.7], [-2.5, -0.1]])
+    data, data_sd, _ = observable_data['A_obs']
+    # Data for an expression need the full simulation results, rather than
+    # the direct integration path.
+    expression_data = dict(observable_data)
+    expression_data['A_fraction'] = (data/100., data_sd/100., None)
+    for data_sets in [observable_data, expression_data]:
+        sample_it = NestedSampleIt(model, data_sets, timespan,
+                                   solver_kwargs={'compiler': 'python'},
+                                   nest_it=rate_nest_it(model))
+        for log_likelihood_type in ['snlpdf', 'mse', 'sse']:
+            sample_it(ns_population_size=10, log_likelihood_type=log_likelihood_type)
+            estimator = {'snlpdf': sample_it.sum_norm_logpdfs_loglikelihood,
+                         'mse': sample_it.mse_loglikelihood,
+                         'sse': sample_it.sse_loglikelihood}[log_likelihood_type]
+            per_point = [estimator(position) for position in positions]
+            assert sample_it._lean_sim == (data_sets is observable_data)
+            assert np.allclose(sample_it.batch_loglikelihood(positions), per_point,
+                               rtol=1e-10)
+
+def test_bounded_loglikelihood_is_opt_in():
+    model = two_species_model()
+    sample_it = NestedSampleIt(model, two_species_data(model), timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=rate_nest_it(model))
+    nested_sampler = sample_it(ns_population_size=10)
+    assert nested_sampler.bounded_loglikelihood is None
+    nested_sampler = sample_it(ns_population_size=10, bounded=True)
+    assert nested_sampler.bounded_loglikelihood == sample_it.bounded_loglikelihood
+
+def _final_A_loglikelihood(model, sim):
+    return -sim.observables['A_obs'][-1]
+
+def test_evaluation_pool_matches_serial():
+    model = two_species_model()
+    sample_it = NestedSampleIt(model, two_species_data(model), timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=rate_nest_it(model))
+    positions = np.array([[-1., -1.3], [-0.3, -2.], [-1.7, -0.7], [-2.5, -0.1]])
+    for log_likelihood_type in ['snlpdf', 'sse']:
+        sample_it(ns_population_size=10, log_likelihood_type=log_likelihood_type)
+        estimator = {'snlpdf': sample_it.sum_norm_logpdfs_loglikelihood,
+                     'sse': sample_it.sse_loglikelihood}[log_likelihood_type]
+        serial = [estimator(position) for position in positions]
+        with EvaluationPool(sample_it, n_workers=2) as pool:
+            assert pool.log_likelihood_type == log_likelihood_type
+            assert np.allclose([pool(position) for position in positions],
+                               serial, rtol=1e-10)
+            assert np.allclose(pool.map(positions), serial, rtol=1e-10)
+            assert np.allclose(pool.batch_loglikelihood(positions), serial,
+                               rtol=1e-10)
+            assert np.allclose([pool.bounded_loglikelihood(position, -np.inf)
+                                for position in positions], serial, rtol=1e-10)
+
+def test_evaluation_pool_estimator_must_match():
+    model = two_species_model()
+    sample_it = NestedSampleIt(model, two_species_data(model), timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=rate_nest_it(model))
+    with EvaluationPool(sample_it, n_workers=1) as pool:
+        nested_sampler = sample_it(ns_population_size=10, evaluation_pool=pool)
+        assert nested_sampler.loglikelihood is pool
+        with pytest.raises(ValueError):
+            sample_it(ns_population_size=10, log_likelihood_type='sse',
+                      evaluation_pool=pool)
+        with pytest.raises(ValueError):
+            sample_it(ns_population_size=10, evaluation_pool=pool,
+                      custom_loglikelihood=_final_A_loglikelihood)
+    sample_it(ns_population_size=10, custom_loglikelihood=_final_A_loglikelihood)
+    with EvaluationPool(sample_it, n_workers=1) as pool:
+        assert pool.log_likelihood_type == 'custom'
+        sample_it(ns_population_size=10, evaluation_pool=pool,
+                  custom_loglikelihood=_final_A_loglikelihood)
+        with pytest.raises(ValueError):
+            sample_it(ns_population_size=10, evaluation_pool=pool,
+                      custom_loglikelihood=lambda model, sim: 0.)
+
+def test_evaluation_timeout_rejects_pool():
+    model = two_species_model()
+    sample_it = NestedSampleIt(model, two_species_data(model), timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=rate_nest_it(model))
+    with EvaluationPool(sample_it, n_workers=1) as pool:
+        with pytest.raises(ValueError):
+            sample_it(ns_population_size=10, evaluation_pool=pool,
+                      evaluation_timeout=10.)
+
+def test_screening_keeps_points_above_boundary():
+    model = two_species_model()
+    sample_it = NestedSampleIt(model, two_species_data(model), timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=rate_nest_it(model),
+                               loose_solver_opts={'rtol': 1e-3, 'atol': 1e-6},
+                               fidelity_margin=1.)
+    sample_it(ns_population_size=10, bounded=True)
+    positions = np.random.RandomState(1).uniform(-3., 0., size=(50, 2))
+    for position in positions:
+        logl = sample_it.sum_norm_logpdfs_loglikelihood(position)
+        # Any point the full accuracy loglikelihood puts above the boundary
+        # gets its full accuracy loglikelihood back...
+        for boundary in [logl - 10., logl - 0.1]:
+            assert np.isclose(sample_it.bounded_loglikelihood(position, boundary),
+                              logl, rtol=1e-8)
+        # ...and any other is rejected.
+        for boundary in [logl + 0.1, logl + 10.]:
+            assert sample_it.bounded_loglikelihood(position, boundary) <= boundary
+
+def test_pre_equilibration_cache_hit_matches_miss():
+    model = two_species_model()
+    observable_data = two_species_data(model)
+    # With k_r switched off, the equilibrium state only depends on k_f.
+    settings = {'solver_kwargs': {'compiler': 'python'},
+                'nest_it': rate_nest_it(model),
+                'equilibration_timespan': np.linspace(0., 5., 6),
+                'equilibration_overrides': {'k_r': 0.}}
+    positions = np.array([[-1., -1.3], [-1., -2.], [-0.5, -1.3]])
+    sample_it = NestedSampleIt(model, observable_data, timespan, **settings)
+    cached = [sample_it.sum_norm_logpdfs_loglikelihood(position) for position in positions]
+    # The second position reuses the first one's equilibrium state.
+    assert len(sample_it._eq_cache) == 2
+    for position, logl in zip(positions, cached):
+        # Cache misses on new instances.
+        fresh = NestedSampleIt(model, observable_data, timespan, **settings)
+        assert fresh.sum_norm_logpdfs_loglikelihood(position) == logl
+        # Cache hits.
+        assert sample_it.sum_norm_logpdfs_loglikelihood(position) == logl
+    assert len(sample_it._eq_cache) == 2
+
+def test_pre_equilibration_follows_condition_overrides():
+    # A + L <-> C and A >> None, with no L in the base model.
+    builder = Builder()
+    A = builder.monomer('A')
+    L = builder.monomer('L')
+    C = builder.monomer('C')
+    builder.initial(A(), builder.parameter('A_0', 100.))
+    builder.initial(L(), builder.parameter('L_0', 0.))
+    k_f = builder.parameter('k_f', 0.01)
+    k_r = builder.parameter('k_r', 0.1)
+    builder.rule('bind', A() + L() | C(), k_f, k_r)
+    k_deg = builder.parameter('k_deg', 0.05)
+    builder.rule('degrade', A() >> None, k_deg)
+    builder.observable('A_obs', A())
+    model = builder.model
+    observable_data = two_species_data(model)
+    # Adding L switches on the binding in the second condition.
+    conditions = [{'observable_data': observable_data, 'parameters': {'L_0': 50.}}]
+    nest_it = NestIt()
+    for param in [k_f, k_r, k_deg]:
+        nest_it(param, uniform(loc=-3., scale=3.))
+    settings = {'solver_kwargs': {'compiler': 'python'},
+                'nest_it': nest_it,
+                'conditions': conditions,
+                'equilibration_timespan': np.linspace(0., 5., 6)}
+    sample_it = NestedSampleIt(model, observable_data, timespan, **settings)
+    sample_it.sum_norm_logpdfs_loglikelihood(np.array([-2., -1., -1.3]))
+    # Only k_f changes.
+    position = np.array([-1., -1., -1.3])
+    fresh = NestedSampleIt(model, observable_data, timespan, **settings)
+    assert (sample_it.sum_norm_logpdfs_loglikelihood(position)
+            == fresh.sum_norm_logpdfs_loglikelihood(position))
+    # The base condition has no binding, so it reuses its equilibrium state.
+    assert len(sample_it._eq_cache) == 3
+
+def test_conditions_add_their_loglikelihoods():
+    model = two_species_model()
+    observable_data = two_species_data(model)
+    half_data = dict()
+    for key, (data, data_sd, time_idxs) in observable_data.items():
+        half_data[key] = (0.5*data, data_sd, time_idxs)
+    conditions = [{'observable_data': half_data, 'parameters': {'A_0': 50.}}]
+    sample_it = NestedSampleIt(model, observable_data, timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=rate_nest_it(model),
+                               conditions=conditions)
+    sample_it(ns_population_size=10, bounded=True)
+    positions = np.array([[-1., -1.3], [-0.3, -2.]])
+    batch = sample_it.batch_loglikelihood(positions)
+    for position, batch_logl in zip(positions, batch):
+        k_f, k_r = 10.**position
+        expected = (reference_loglikelihood(model, observable_data,
+                                            {'k_f': k_f, 'k_r': k_r})
+                    + reference_loglikelihood(model, half_data,
+                                              {'k_f': k_f, 'k_r': k_r, 'A_0': 50.}))
+        assert np.isclose(sample_it.sum_norm_logpdfs_loglikelihood(position),
+                          expected, rtol=1e-10)
+        assert np.isclose(batch_logl, expected, rtol=1e-10)
+        assert np.isclose(sample_it.bounded_loglikelihood(position, -np.inf),
+                          expected, rtol=1e-10)
+
+def test_integrator_tiers_fall_back():
+    model = two_species_model()
+    observable_data = two_species_data(model)
+    # A one step budget always fails, so every solve moves up to lsoda.
+    sample_it = NestedSampleIt(model, observable_data, timespan,
+                               solver_kwargs={'compiler': 'python',
+                                              'integrator': 'lsoda'},
+                               nest_it=rate_nest_it(model),
+                               integrator_tiers=[('dopri5', {'nsteps': 1})])
+    positions = np.array([[-1., -1.3], [-0.3, -2.], [-1.7, -0.7]])
+    for position in positions:
+        k_f, k_r = 10.**position
+        assert np.isclose(sample_it.sum_norm_logpdfs_loglikelihood(position),
+                          reference_loglikelihood(model, observable_data,
+                                                  {'k_f': k_f, 'k_r': k_r}, 'lsoda'),
+                          rtol=1e-10)
+    assert sample_it.integrator_stats() == [{'integrator': 'dopri5', 'attempted': 3, 'completed': 0},
+                                            {'integrator': 'lsoda', 'attempted': 3, 'completed': 3}]
+
+class _BngOdeSimulator(BngSimulator):
+    """BngSimulator running BioNetGen's ODE integrator rather than SSA."""
+
+    def run(self, **kwargs):
+        kwargs.setdefault('method', 'ode')
+        return super(_BngOdeSimulator, self).run(**kwargs)
+
+def test_non_scipy_solver_runs_without_tiers():
+    model = two_species_model()
+    observable_data = two_species_data(model)
+    sample_it = NestedSampleIt(model, observable_data, timespan,
+                               solver=_BngOdeSimulator,
+                               nest_it=rate_nest_it(model))
+    for position in [[-1., -1.3], [-0.3, -2.]]:
+        k_f, k_r = 10.**np.array(position)
+        assert np.isclose(sample_it.sum_norm_logpdfs_loglikelihood(np.array(position)),
+                          reference_loglikelihood(model, observable_data,
+                                                  {'k_f': k_f, 'k_r': k_r}),
+                          rtol=1e-4)
+    assert not sample_it._lean_sim
+    assert sample_it.integrator_stats() == []
+
+def test_Keq_derives_reverse_rate():
+    model = two_species_model()
+    observable_data = two_species_data(model)
+    nest_it = NestIt()
+    nest_it(model.parameters['k_f'], uniform(loc=-3., scale=3.))
+    nest_it.add_Keq(model.parameters['k_f'], model.parameters['k_r'], 'K_eq',
+                    uniform(loc=-1., scale=2.))
+    assert list(nest_it.keys()) == ['k_f', 'K_eq']
+    sample_it = NestedSampleIt(model, observable_data, timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=nest_it)
+    for position in [[-1., 0.8], [-0.3, -0.5]]:
+        k_f, K_eq = 10.**np.array(position)
+        assert np.isclose(sample_it.sum_norm_logpdfs_loglikelihood(np.array(position)),
+                          reference_loglikelihood(model, observable_data,
+                                                  {'k_f': k_f, 'k_r': k_f/K_eq}),
+                          rtol=1e-8)
+
+def test_cycle_derives_dependent_rate():
+    # A <-> B <-> C <-> A
+    builder = Builder()
+    A = builder.monomer('A')
+    B = builder.monomer('B')
+    C = builder.monomer('C')
+    builder.initial(A(), builder.parameter('A_0', 100.))
+    rates = dict()
+    for i, (reactant, product) in enumerate([(A, B), (B, C), (C, A)]):
+        rates['k{}f'.format(i)] = builder.parameter('k{}f'.format(i), 0.1)
+        rates['k{}r'.format(i)] = builder.parameter('k{}r'.format(i), 0.1)
+        builder.rule('conv{}'.format(i), reactant() | product(),
+                     rates['k{}f'.format(i)], rates['k{}r'.format(i)])
+    builder.observable('A_obs', A())
+    model = builder.model
+    observable_data = two_species_data(model)
+    nest_it = NestIt()
+    for name in sorted(rates.keys()):
+        nest_it(rates[name], uniform(loc=-3., scale=3.))
+    nest_it.add_cycle([rates['k0f'], rates['k1f'], rates['k2f']],
+                      [rates['k0r'], rates['k1r'], rates['k2r']])
+    assert list(nest_it.keys()) == ['k0f', 'k0r', 'k1f', 'k1r', 'k2f']
+    sample_it = NestedSampleIt(model, observable_data, timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=nest_it)
+    position = np.array([-1., -1.5, -0.5, -2., -1.2])
+    values = dict(zip(['k0f', 'k0r', 'k1f', 'k1r', 'k2f'], 10.**position))
+    # Detailed balance: k0f*k1f*k2f = k0r*k1r*k2r
+    values['k2r'] = values['k0f']*values['k1f']*values['k2f']/(values['k0r']*values['k1r'])
+    assert np.isclose(sample_it.sum_norm_logpdfs_loglikelihood(position),
+                      reference_loglikelihood(model, observable_data, values),
+                      rtol=1e-8)
+
+def test_reduce_observations_matches_full_sums():
+    random_state = np.random.RandomState(2)
+    time_idx = random_state.randint(0, 5, size=50)
+    data = random_state.normal(size=50)
+    sigma = random_state.uniform(0.5, 2., size=50)
+    simulated = random_state.normal(size=5)
+    for chunk_size in [7, 50]:
+        stats = reduce_observations(data, sigma, time_idx, 5, chunk_size=chunk_size)
+        s = simulated[stats['times']]
+        assert np.isclose(np.sum(stats['counts']*(s - stats['mean'])**2 + stats['sum_sq']),
+                          np.sum((data - simulated[time_idx])**2))
+        assert np.isclose(np.sum(stats['inv_var_sum']*(s - stats['weighted_mean'])**2
+                                 + stats['weighted_sum_sq']),
+                          np.sum(((data - simulated[time_idx])/sigma)**2))
+        assert np.isclose(np.sum(stats['log_sigma_sum']), np.sum(np.log(sigma)))
+
+def test_replicate_loglikelihoods_match_full_sums(tmpdir):
+    model = two_species_model()
+    # Three replicates of every other time point, with the A_obs data in a
+    # .npy file.
+    random_state = np.random.RandomState(3)
+    time_idx = np.repeat(np.arange(0, len(timespan), 2), 3)
+    solver = ScipyOdeSimulator(model, tspan=timespan, compiler='python')
+    data = solver.run().observables['A_obs'][time_idx] + random_state.normal(scale=2., size=len(time_idx))
+    data_sd = random_state.uniform(1., 3., size=len(time_idx))
+    data_file = str(tmpdir.join('A_obs.npy'))
+    np.save(data_file, data)
+    sample_it = NestedSampleIt(model, {'A_obs': (data_file, data_sd, time_idx)}, timespan,
+                               solver_kwargs={'compiler': 'python'},
+                               nest_it=rate_nest_it(model))
+    for position in [[-1., -1.3], [-0.3, -2.]]:
+        param_values = [model.parameters['A_0'].value] + list(10.**np.array(position))
+        # The model is only simulated at the observed time points.
+        simulated = solver.run(tspan=timespan[::2],
+                               param_values=[param_values]).observables['A_obs'][time_idx//2]
+        assert np.isclose(sample_it.sum_norm_logpdfs_loglikelihood(np.array(position)),
+                          np.sum(norm.logpdf(data, loc=simulated, scale=data_sd)),
+                          rtol=1e-10)
+        assert np.isclose(sample_it.mse_loglikelihood(np.array(position)),
+                          -np.mean((data - simulated)**2), rtol=1e-10)
+        assert np.isclose(sample_it.sse_loglikelihood(np.array(position)),
+                          -np.sum((data - simulated)**2), rtol=1e-10)
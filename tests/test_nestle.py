@@ -13,6 +13,7 @@ from scipy.stats import uniform
 from scipy.special import erf
 from gleipnir.sampled_parameter import SampledParameter
 from gleipnir.nestle import NestleNestedSampling
+from concurrent.futures import ThreadPoolExecutor
 import os
 import glob
 
@@ -91,6 +92,34 @@ def test_func_deviance_ic():
     NNS = shared['NNS']
     dic = NNS.deviance_ic()
 
+def test_func_run_parallel():
+    NNS = NestleNestedSampling(sampled_parameters=sampled_parameters,
+                               loglikelihood=loglikelihood,
+                               population_size=population_size,
+                               n_workers=2)
+    log_evidence, log_evidence_error = NNS.run(verbose=False)
+    analytic = analytic_log_evidence(ndim, width)
+    assert np.isclose(log_evidence, analytic, rtol=1.e-1)
+    stats = NNS.result.stats
+    assert stats['n_workers'] == 2
+    assert stats['queue_size'] == 2
+    assert stats['parallel_efficiency'] > 0.
+
+def test_executor_requires_n_workers():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError):
+            NestleNestedSampling(sampled_parameters=sampled_parameters,
+                                 loglikelihood=loglikelihood,
+                                 population_size=population_size,
+                                 executor=executor)
+
+def test_queue_size_requires_workers():
+    with pytest.raises(ValueError):
+        NestleNestedSampling(sampled_parameters=sampled_parameters,
+                             loglikelihood=loglikelihood,
+                             population_size=population_size,
+                             queue_size=4)
+
 #def test_cleanup():
     # Clean-up the MultiNest output files
 #    for f in glob.glob("./multinest_run*"):
@@ -105,4 +134,7 @@ if __name__ == '__main__':
     test_func_akaike_ic()#
     test_func_bayesian_ic()
     test_func_deviance_ic()
+    test_func_run_parallel()
+    test_executor_requires_n_workers()
+    test_queue_size_requires_workers()
 #    test_cleanup()
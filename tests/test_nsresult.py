@@ -0,0 +1,43 @@
+"""
+Tests for the NSResult container of Nested Sampling run outputs.
+"""
+
+import pytest
+import numpy as np
+from scipy.stats import skew, kurtosis
+from gleipnir.nsresult import NSResult
+
+
+samples = np.array([[0., 1.], [1., 2.], [2., 0.], [3., 5.]])
+log_likelihoods = np.array([-3., -1., -2., -4.])
+log_weights = np.log(np.array([1., 2., 1., 0.]))
+
+def test_weights():
+    result = NSResult(['a', 'b'], samples, log_likelihoods, log_weights)
+    assert np.allclose(result.weights, [0.25, 0.5, 0.25, 0.])
+    assert np.isclose(result.effective_sample_size, 8./3.)
+    equal = NSResult(['a', 'b'], samples)
+    assert np.allclose(equal.weights, 0.25)
+
+def test_estimates():
+    result = NSResult(['a', 'b'], samples, log_likelihoods, log_weights)
+    assert result.max_loglikelihood() == -1.
+    assert np.array_equal(result.best_fit_likelihood(), [1., 2.])
+    assert np.allclose(result.posterior_mean(), [1., 1.25])
+    # The zero weight sample doesn't contribute.
+    assert np.isclose(result.mean_deviance(), 3.5)
+    with pytest.raises(ValueError):
+        NSResult(['a', 'b'], samples).max_loglikelihood()
+
+def test_posteriors_and_moments():
+    result = NSResult(['a', 'b'], samples, log_likelihoods, log_weights)
+    posteriors = result.posteriors(nbins=3)
+    assert list(posteriors.keys()) == ['a', 'b']
+    marginal, edges, centers = posteriors['a']
+    assert np.isclose(np.sum(marginal*np.diff(edges)), 1.)
+    assert result.posteriors(nbins=3) is posteriors
+    moments = result.posterior_moments()
+    # Equivalent equally weighted samples.
+    replicated = np.array([0., 1., 1., 2.])
+    assert np.allclose(moments['a'], (np.mean(replicated), np.var(replicated),
+                                      skew(replicated), kurtosis(replicated)))
@@ -0,0 +1,47 @@
+"""
+Tests for the ResultStore used to persist model selection results.
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+from gleipnir.pysb_utilities.result_store import ResultStore, hash_data, hash_config
+
+
+timespan = np.linspace(0., 10., 11)
+observable_data = {'obs': (np.ones(11), 0.1*np.ones(11), None)}
+config = {'ns_version': 'built-in', 'ns_population_size': 100}
+
+
+def test_hashes():
+    assert hash_data(observable_data, timespan) == hash_data(observable_data, timespan)
+    other_data = {'obs': (2.*np.ones(11), 0.1*np.ones(11), None)}
+    assert hash_data(other_data, timespan) != hash_data(observable_data, timespan)
+    assert hash_config(config) == hash_config(dict(config))
+
+def test_record_and_query(tmpdir):
+    store = ResultStore(str(tmpdir))
+    data_hash = hash_data(observable_data, timespan)
+    config_hash = hash_config(config)
+    for i, log_evidence in enumerate([-10., -2.]):
+        key = store.run_key("model{}".format(i), data_hash, config_hash)
+        store.mark_running(key, "model_{}".format(i), "model{}".format(i),
+                           data_hash, config_hash)
+        assert store.status(key) == 'running'
+        dead_points = pd.DataFrame({'log_l': [-3., -1.], 'weight': [0.5, 0.25]})
+        store.record(key, {'log_evidence': log_evidence,
+                           'log_evidence_error': 0.1},
+                     dead_points=dead_points)
+        assert store.status(key) == 'complete'
+        assert np.allclose(store.dead_points(key).values, dead_points.values)
+    # A fresh instance should see the same records.
+    store = ResultStore(str(tmpdir))
+    assert len(store.query(data_hash=data_hash)) == 2
+    assert store.best_model(data_hash)['model_name'] == 'model_1'
+    assert store.best_model('not-a-dataset') is None
+
+def test_checkpoint(tmpdir):
+    store = ResultStore(str(tmpdir))
+    assert store.load_checkpoint('key') is None
+    store.save_checkpoint('key', {'n_iterations': 10})
+    assert store.load_checkpoint('key') == {'n_iterations': 10}
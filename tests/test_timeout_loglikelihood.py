@@ -0,0 +1,48 @@
+"""
+Tests for the TimeoutLoglikelihood watchdog.
+"""
+
+import time
+import pickle
+import numpy as np
+from gleipnir.timeout_loglikelihood import TimeoutLoglikelihood
+
+
+def loglikelihood(position):
+    # Points with a negative first coordinate get stuck.
+    if position[0] < 0.:
+        time.sleep(30.)
+    return -np.sum(position**2)
+
+def test_initialization():
+    tll = TimeoutLoglikelihood(loglikelihood, 1.)
+    assert tll.timeout == 1.
+    assert tll.stats()['n_calls'] == 0
+
+def test_func_call():
+    tll = TimeoutLoglikelihood(loglikelihood, 1.)
+    assert np.isclose(tll(np.array([1., 2.])), -5.)
+    start_time = time.time()
+    assert tll(np.array([-1., 2.])) == -np.inf
+    assert time.time() - start_time < 10.
+    # The recycled worker keeps going.
+    assert np.isclose(tll(np.array([0., 2.])), -4.)
+    stats = tll.stats()
+    assert stats['n_calls'] == 3
+    assert stats['n_timeouts'] == 1
+    assert stats['n_restarts'] == 1
+    assert np.allclose(tll.timeout_positions[0], [-1., 2.])
+    tll.close()
+
+def test_pickle():
+    tll = TimeoutLoglikelihood(loglikelihood, 1.)
+    tll(np.array([1., 2.]))
+    tll_copy = pickle.loads(pickle.dumps(tll))
+    assert np.isclose(tll_copy(np.array([1., 1.])), -2.)
+    tll.close()
+    tll_copy.close()
+
+if __name__ == '__main__':
+    test_initialization()
+    test_func_call()
+    test_pickle()